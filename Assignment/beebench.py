@@ -0,0 +1,247 @@
+#
+# beebench.py - reproducible benchmarks of the bee world at different numbers of bees, flowers, map and hive sizes
+#
+# Every case is a seeded synthetic scenario (random obstacles and water on the property, flowers on free cells,
+# a hive of the given size), so the same case is the same work on every run. A case is set up, warmed up for a
+# few steps and then stepped until it has run --steps timesteps or --max-seconds have passed. Each case runs in
+# a fresh process, so its peak memory (max RSS) is its own.
+#
+# Reported per case: steps per second, time per phase (scenario generation, setup_world, step_world,
+# collect_metrics and optionally a raster frame), step time percentiles and peak memory. Results are saved as
+# JSON together with the machine and git commit, and two result files can be compared case by case.
+#
+# Usage:  python beebench.py --suite quick -o bench_before.json
+#         python beebench.py --suite bees --engine swarm --max-seconds 20 -o bench_after.json
+#         python beebench.py --compare bench_before.json bench_after.json
+#
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import multiprocessing
+import numpy as np
+
+try:
+    import resource # not on Windows
+except ImportError:
+    resource = None
+
+import beeworld
+from beelog import LOG
+from beerng import SimRNG
+from buzzness import Flower
+
+FLOWER_NAMES = ["Rose", "Tulip", "Daisy", "Lilly", "Orchid", "Poppy", "Sunflower", "Lavender"]
+FLOWER_COLOURS = ['Red', 'Blue', 'Yellow', 'Purple', 'Pink', 'White', 'Orange']
+ENGINES = ('object', 'swarm')
+
+def _case(bees, flowers, map_size, hive_size):
+    return {'bees': bees, 'flowers': flowers, 'map': map_size, 'hive': hive_size}
+
+# Each suite varies one thing at a time around a middle-sized world (1000 bees, 1000 flowers, 1024 map, 32 hive)
+SUITES = {
+    'quick': [_case(10, 10, 32, 10), _case(100, 100, 128, 16), _case(1000, 1000, 512, 32)],
+    'bees': [_case(n, 1000, 1024, 32) for n in (10, 100, 1000, 10000, 100000)],
+    'flowers': [_case(1000, n, 1024, 32) for n in (10, 100, 1000, 10000, 100000)],
+    'map': [_case(1000, 1000, n, 32) for n in (64, 256, 1024, 4096)],
+    'hive': [_case(1000, 1000, 1024, n) for n in (8, 32, 128, 512)],
+}
+SUITES['full'] = SUITES['bees'] + SUITES['flowers'] + SUITES['map'] + SUITES['hive']
+
+def case_name(case, engine):
+    return f"{engine}-b{case['bees']}-f{case['flowers']}-m{case['map']}-h{case['hive']}"
+
+def matches(name, only):
+    """
+    True if every '-'-separated field of `only` is a whole field of the case name, so 'b100' picks b100
+    but not b1000, and 'swarm-b100' picks that engine and size.
+    """
+    fields = name.split('-')
+    return all(token in fields for token in only.split('-'))
+
+def synthetic_scenario(bees, flowers, map_size, hive_size, seed=0, engine='object'):
+    """
+    Builds a scenario like loadParameters + loadMap would, without files.
+    bees, flowers:   numbers of bees and flowers (flowers are capped at the number of free cells)
+    map_size:   property width and height
+    hive_size:   hive width and height
+    Returns (sim_params, property_map, flowers, property_config).
+    """
+    gen = np.random.default_rng(seed)
+    terrain = np.zeros((map_size, map_size), dtype=int)
+    hive_pos = (map_size // 2, map_size // 2)
+    for value, count, max_side in ((1, 6, map_size // 8), (2, 3, map_size // 6)): # obstacle blocks, then ponds
+        for _ in range(count):
+            w, h = gen.integers(1, max(1, max_side) + 1, size=2)
+            x, y = gen.integers(0, map_size - w + 1), gen.integers(0, map_size - h + 1)
+            if not (x <= hive_pos[0] < x + w and y <= hive_pos[1] < y + h): # keep the hive entrance free
+                terrain[x:x + w, y:y + h] = value
+    free = np.flatnonzero(terrain.ravel() == 0)
+    free = free[free != hive_pos[0] * map_size + hive_pos[1]]
+    cells = gen.choice(free, size=min(flowers, len(free)), replace=False)
+    names = gen.integers(0, len(FLOWER_NAMES), size=len(cells))
+    colours = gen.integers(0, len(FLOWER_COLOURS), size=len(cells))
+    capacities = gen.integers(3, 8, size=len(cells))
+    dead_time = 15
+    flower_list = [Flower(f"F{i+1}", (int(c // map_size), int(c % map_size)), FLOWER_NAMES[names[i]], FLOWER_COLOURS[colours[i]],
+                          int(capacities[i]), dead_time) for i, c in enumerate(cells)]
+    entry = (hive_size // 2, 0)
+    sim_params = {'num_bees': bees, 'simlength': 10**9, 'hive_width': hive_size, 'hive_height': hive_size,
+                  'comb_stripe_width': 3, 'max_nectar_per_cell': 5, 'bee_max_nectarCarry': 2, 'flower_regen_rate': 1,
+                  'bee_empty_flower_avoiding_duration': 20, 'flower_nectar_capacity_default': 5, 'flower_dead_time': dead_time,
+                  'interactive_pause': 0.0, 'bee_max_clogCount': 5, 'engine': engine, 'seed': seed,
+                  'hive_exit_cell_inside': entry, 'hive_entry_cell_inside': entry}
+    property_config = {'max_x': map_size, 'max_y': map_size, 'hive_position_on_property': hive_pos}
+    return sim_params, terrain, flower_list, property_config
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1) # bytes on macOS, KiB elsewhere
+
+def run_case(case, engine='object', steps=200, warmup=5, max_seconds=30.0, seed=0, render_scale=0):
+    """
+    Times one case in this process.
+    steps:   timesteps to time (fewer if max_seconds runs out first)
+    warmup:   untimed timesteps run first (navigation fields, caches)
+    render_scale:   if > 0 also time one beeraster frame per step at this many pixels per cell
+    Returns a dictionary of results.
+    """
+    LOG.configure(level='off')
+    phases = {}
+    rss_start = _peak_rss_mb()
+    t0 = time.perf_counter()
+    scenario = synthetic_scenario(case['bees'], case['flowers'], case['map'], case['hive'], seed, engine)
+    phases['generate'] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    world = beeworld.setup_world(*scenario, rng=SimRNG(seed))
+    phases['setup'] = time.perf_counter() - t0
+    rasteriser = None
+    if render_scale > 0:
+        import beeraster
+        rasteriser = beeraster.RasterRenderer(world, render_scale)
+    for t in range(warmup):
+        beeworld.step_world(world, t)
+    phases.update(step=0.0, metrics=0.0)
+    if rasteriser is not None:
+        phases['render'] = 0.0
+    step_times = []
+    started = time.perf_counter()
+    t = warmup
+    while len(step_times) < steps and time.perf_counter() - started < max_seconds:
+        t0 = time.perf_counter()
+        beeworld.step_world(world, t)
+        t1 = time.perf_counter()
+        beeworld.collect_metrics(world, t)
+        t2 = time.perf_counter()
+        if rasteriser is not None:
+            rasteriser.render(world)
+            phases['render'] += time.perf_counter() - t2
+        step_times.append(t1 - t0)
+        phases['step'] += t1 - t0
+        phases['metrics'] += t2 - t1
+        t += 1
+    step_ms = np.array(step_times) * 1000
+    return {'name': case_name(case, engine), 'engine': engine, **case, 'flowers_placed': len(scenario[2]),
+            'steps': len(step_times), 'warmup': warmup, 'seed': seed,
+            'steps_per_second': round(len(step_times) / phases['step'], 3) if phases['step'] else None,
+            'step_ms': {'mean': round(float(step_ms.mean()), 3), 'p50': round(float(np.percentile(step_ms, 50)), 3),
+                        'p95': round(float(np.percentile(step_ms, 95)), 3), 'max': round(float(step_ms.max()), 3)} if len(step_ms) else None,
+            'phase_seconds': {name: round(value, 4) for name, value in phases.items()},
+            'rss_start_mb': rss_start, 'peak_rss_mb': _peak_rss_mb()}
+
+def _run_task(task):
+    case, engine, options = task
+    return run_case(case, engine, **options)
+
+def machine_info():
+    """Where the results came from, so only like-for-like runs get compared."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'host': platform.node(), 'platform': platform.platform(), 'processor': platform.processor(),
+            'cpus': os.cpu_count(), 'python': platform.python_version(), 'numpy': np.__version__, 'commit': commit,
+            'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+def run_suite(cases, engines=ENGINES, only=None, isolate=True, **options):
+    """
+    Runs every case with every engine and returns the results dictionary (as saved to JSON).
+    only:   run only the cases whose name (see case_name) has these fields (see matches)
+    isolate:   run each case in a fresh process (separate peak memory); False runs them all in this process
+    options:   passed to run_case
+    """
+    tasks = [(case, engine, options) for case in cases for engine in engines if only is None or matches(case_name(case, engine), only)]
+    results = []
+    if isolate:
+        pool = multiprocessing.Pool(1, maxtasksperchild=1)
+        try:
+            for result in pool.imap(_run_task, tasks):
+                _print_result(result)
+                results.append(result)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for task in tasks:
+            result = _run_task(task)
+            _print_result(result)
+            results.append(result)
+    return {'machine': machine_info(), 'options': options, 'results': results}
+
+def _print_result(r):
+    phases = ', '.join(f"{name} {seconds:.3f}s" for name, seconds in r['phase_seconds'].items())
+    rate = f"{r['steps_per_second']:10.2f}" if r['steps_per_second'] else '         -'
+    print(f"{r['name']:<36} {rate} steps/s  {r['steps']:5d} steps  peak {r['peak_rss_mb']} MB  ({phases})", flush=True)
+
+def compare(old, new):
+    """Prints steps/s and peak memory of the cases in both result dictionaries, new relative to old."""
+    if old['machine'].get('host') != new['machine'].get('host'):
+        print(f"Warning: results come from different machines ({old['machine'].get('host')} / {new['machine'].get('host')})")
+    before = {r['name']: r for r in old['results']}
+    print(f"{'case':<36} {'old steps/s':>12} {'new steps/s':>12} {'speedup':>8} {'old MB':>8} {'new MB':>8}")
+    for r in new['results']:
+        o = before.get(r['name'])
+        if o is None:
+            continue
+        speedup = r['steps_per_second'] / o['steps_per_second'] if r['steps_per_second'] and o['steps_per_second'] else float('nan')
+        print(f"{r['name']:<36} {o['steps_per_second'] or 0:12.2f} {r['steps_per_second'] or 0:12.2f} {speedup:7.2f}x "
+              f"{o['peak_rss_mb'] or 0:8.1f} {r['peak_rss_mb'] or 0:8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bee world at different scales")
+    parser.add_argument("--suite", choices=list(SUITES), default='quick', help="Set of cases to run")
+    parser.add_argument("--case", type=str, default=None, help="Only run cases with these name fields, e.g. b10000 or swarm-b10000 (whole fields: b100 is not b1000)")
+    parser.add_argument("--engine", choices=list(ENGINES) + ['both'], default='both', help="Bee engine(s) to time")
+    parser.add_argument("--steps", type=int, default=200, help="Timesteps to time per case")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed timesteps before timing starts")
+    parser.add_argument("--max-seconds", type=float, default=30.0, help="Stop timing a case after this many seconds of steps")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic scenarios and the runs")
+    parser.add_argument("--render-scale", type=int, default=0, help="Also time a beeraster frame per step at this scale (0 = off)")
+    parser.add_argument("--no-isolate", action="store_true", help="Run all cases in this process (peak memory then only grows)")
+    parser.add_argument("-o", "--output", type=str, default=None, help="Save the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), default=None, help="Compare two saved result files instead of running")
+    args = parser.parse_args()
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        compare(old, new)
+        return
+    engines = ENGINES if args.engine == 'both' else (args.engine,)
+    results = run_suite(SUITES[args.suite], engines, only=args.case, isolate=not args.no_isolate, steps=args.steps, warmup=args.warmup,
+                        max_seconds=args.max_seconds, seed=args.seed, render_scale=args.render_scale)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"Saved benchmark results to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#
+# beecheckpoint.py - save / restore the full simulation state to an .npz file
+#
+# A checkpoint holds everything step_world reads or changes: the hive, the flowers, every bee (object or
+# swarm engine), the comb index (its cell order decides random picks) and every random stream, so a run
+# resumed from a checkpoint continues exactly like the uninterrupted run. Scalar settings go into one JSON
+# string (stored as UTF-8 bytes); per-bee / per-flower values, including each bee's random stream (PCG64
+# state and the floats still waiting in its buffer), are stored as NumPy columns, so the file grows with
+# plain numbers per bee and large swarms load quickly. Derived structures (occupancy grids, flower index,
+# navigation fields, flower scheduler) are rebuilt.
+#
+
+import gc
+import json
+import numpy as np
+
+import beeworld
+from buzzness import Flower, Bee
+from beerng import SimRNG
+
+CHECKPOINT_VERSION = 2
+SWARM_COLUMNS = ('x', 'y', 'inhive', 'state', 'nectar', 'age', 'clog', 'target_x', 'target_y', 'target_flower',
+                 'avoid_flower', 'avoid_time')
+
+def _encode(value):
+    """JSON can't tell tuples from lists; positions must come back as tuples."""
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _decode(value):
+    if isinstance(value, dict):
+        if '__tuple__' in value:
+            return tuple(_decode(v) for v in value['__tuple__'])
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+def _flower_columns(flowers):
+    return {'flower_id': np.array([str(f.ID) for f in flowers]),
+            'flower_name': np.array([str(f.name) for f in flowers]),
+            'flower_colour': np.array([str(f.colour) for f in flowers]),
+            'flower_xy': np.array([f.pos for f in flowers], dtype=np.int64).reshape(len(flowers), 2),
+            'flower_capacity': np.array([f.nectarCapacity for f in flowers], dtype=np.int64),
+            'flower_nectar': np.array([f.currentNectar for f in flowers], dtype=np.int64),
+            'flower_dead': np.array([f.state == 'DEAD' for f in flowers], dtype=bool),
+            'flower_cooldown': np.array([f.regeneration_cooldown for f in flowers], dtype=np.int64),
+            'flower_dead_duration': np.array([f.deadDuration for f in flowers], dtype=np.int64),
+            'flower_refilling': np.array([f.is_refilling for f in flowers], dtype=bool)}
+
+def _restore_flowers(data):
+    flowers = []
+    for i, fid in enumerate(data['flower_id'].tolist()):
+        f = Flower(fid, tuple(int(v) for v in data['flower_xy'][i]), data['flower_name'][i].item(),
+                   data['flower_colour'][i].item(), int(data['flower_capacity'][i]), int(data['flower_dead_duration'][i]))
+        f.currentNectar = int(data['flower_nectar'][i])
+        f.state = 'DEAD' if data['flower_dead'][i] else 'ALIVE'
+        f.regeneration_cooldown = int(data['flower_cooldown'][i])
+        f.is_refilling = bool(data['flower_refilling'][i])
+        flowers.append(f)
+    return flowers
+
+def _comb_columns(comb_index):
+    bags = [comb_index.free] + comb_index.levels
+    return {'comb_bag_sizes': np.array([b.size for b in bags], dtype=np.int64),
+            'comb_bag_x': np.concatenate([b.xs[:b.size] for b in bags]),
+            'comb_bag_y': np.concatenate([b.ys[:b.size] for b in bags])}
+
+def _restore_comb(comb_index, data):
+    """Puts the saved cell order back into the bags (random picks depend on it)."""
+    start = 0
+    for bag, size in zip([comb_index.free] + comb_index.levels, data['comb_bag_sizes'].tolist()):
+        xs, ys = data['comb_bag_x'][start:start + size], data['comb_bag_y'][start:start + size]
+        bag.slot[:] = -1
+        bag.xs[:size], bag.ys[:size] = xs, ys
+        bag.slot[xs, ys] = np.arange(size)
+        bag.size = size
+        start += size
+
+def _split128(values):
+    """128-bit PCG64 numbers as an (n, 2) uint64 array of (high, low) halves."""
+    return np.array([(v >> 64, v & 0xFFFFFFFFFFFFFFFF) for v in values], dtype=np.uint64).reshape(len(values), 2)
+
+def _join128(halves):
+    return [(int(hi) << 64) | int(lo) for hi, lo in halves.tolist()]
+
+def _rng_columns(rngs):
+    """
+    The bee streams as columns. They are all spawned from the run's stream, so they share its entropy and
+    only differ in spawn key, PCG64 state and buffer; the shared part goes into the JSON meta.
+    """
+    seqs = [r.seed_seq for r in rngs]
+    shared = {'entropy': seqs[0].entropy if seqs else None, 'pool_size': seqs[0].pool_size if seqs else 4,
+              'buffer_size': rngs[0].buffer_size if rngs else 0}
+    if any(q.entropy != shared['entropy'] or q.pool_size != shared['pool_size'] for q in seqs):
+        raise ValueError("Bee random streams must all be spawned from the run's stream")
+    states = [r.generator.bit_generator.state for r in rngs]
+    width = max([len(r.buffer) for r in rngs], default=0)
+    buffers = np.zeros((len(rngs), width))
+    for i, r in enumerate(rngs):
+        buffers[i, :len(r.buffer)] = r.buffer
+    columns = {'bee_rng_spawn_key': np.array([q.spawn_key for q in seqs], dtype=np.uint64).reshape(len(seqs), -1),
+               'bee_rng_children': np.array([q.n_children_spawned for q in seqs], dtype=np.int64),
+               'bee_rng_state': _split128([s['state']['state'] for s in states]),
+               'bee_rng_inc': _split128([s['state']['inc'] for s in states]),
+               'bee_rng_has_uint32': np.array([s['has_uint32'] for s in states], dtype=np.int64),
+               'bee_rng_uinteger': np.array([s['uinteger'] for s in states], dtype=np.uint64),
+               'bee_rng_buffer': buffers,
+               'bee_rng_buffer_len': np.array([len(r.buffer) for r in rngs], dtype=np.int64),
+               'bee_rng_next': np.array([r.next for r in rngs], dtype=np.int64)}
+    return shared, columns
+
+def _restore_rngs(shared, data):
+    """Rebuilds the bee streams saved by _rng_columns, in bee order."""
+    rngs = []
+    states, incs = _join128(data['bee_rng_state']), _join128(data['bee_rng_inc'])
+    spawn_keys = data['bee_rng_spawn_key'].tolist()
+    children, has_uint32 = data['bee_rng_children'].tolist(), data['bee_rng_has_uint32'].tolist()
+    uintegers, lengths, nexts = data['bee_rng_uinteger'].tolist(), data['bee_rng_buffer_len'].tolist(), data['bee_rng_next'].tolist()
+    for i in range(len(states)):
+        seq = np.random.SeedSequence(shared['entropy'], spawn_key=tuple(spawn_keys[i]), pool_size=shared['pool_size'],
+                                     n_children_spawned=children[i])
+        rng = SimRNG(seq, shared['buffer_size'])
+        rng.generator.bit_generator.state = {'bit_generator': 'PCG64', 'state': {'state': states[i], 'inc': incs[i]},
+                                             'has_uint32': has_uint32[i], 'uinteger': uintegers[i]}
+        rng.buffer = data['bee_rng_buffer'][i, nexts[i]:lengths[i]].tolist() # only the floats not used yet (next becomes 0)
+        rngs.append(rng)
+    return rngs
+
+def save_checkpoint(world, next_t, filename, metrics_rows=None):
+    """
+    Writes the state of the world before timestep next_t (i.e. after next_t steps) to filename (.npz).
+    metrics_rows:   metrics collected so far, saved so a resumed run can write a complete metrics.csv
+    """
+    flower_pos = {f.ID: i for i, f in enumerate(world['flowers'])}
+    if 'swarm' in world:
+        world['flower_arrays'].write_back() # also brings the dead flowers' cooldowns up to date
+    else:
+        world['flower_scheduler'].sync()
+    meta = {'version': CHECKPOINT_VERSION, 'next_t': next_t, 'params': world['params'],
+            'property_config': world['property_config'], 'rng': world['rng'].get_state(),
+            'nav_max_bytes': world['nav'].max_bytes}
+    arrays = {'property_map': world['property_map'], 'hive_data': world['hive_data']}
+    arrays.update(_flower_columns(world['flowers']))
+    arrays.update(_comb_columns(world['hive_layout']['comb_index']))
+    arrays['metrics'] = np.array([[row[c] for c in beeworld.METRIC_COLUMNS] for row in (metrics_rows or [])],
+                                 dtype=np.int64).reshape(-1, len(beeworld.METRIC_COLUMNS))
+    if 'swarm' in world:
+        swarm = world['swarm']
+        meta['engine'] = 'swarm'
+        for name in SWARM_COLUMNS:
+            arrays['swarm_' + name] = getattr(swarm, name)
+        default_ids = swarm.ids == [f"B{i+1}" for i in range(swarm.n)]
+        arrays['swarm_ids'] = np.array([] if default_ids else swarm.ids, dtype=str) # empty = B1, B2, ...
+    else:
+        bees = world['bees']
+        meta['engine'] = 'object'
+        meta['bee_rng_seed'], rng_columns = _rng_columns([b.rng for b in bees])
+        arrays.update(rng_columns)
+        arrays['bee_id'] = np.array([str(b.ID) for b in bees])
+        arrays['bee_xy'] = np.array([b.pos for b in bees], dtype=np.int64).reshape(len(bees), 2)
+        arrays['bee_entrance'] = np.array([b.hive_entrance_pos for b in bees], dtype=np.int64).reshape(len(bees), 2)
+        arrays['bee_max_carry'] = np.array([b.max_nectarCarry for b in bees], dtype=np.int64)
+        arrays['bee_avoid_duration'] = np.array([b.empty_flower_avoiding_duration for b in bees], dtype=np.int64)
+        arrays['bee_max_clog'] = np.array([b.max_clogCount for b in bees], dtype=np.int64)
+        arrays['bee_inhive'] = np.array([b.inhive for b in bees], dtype=bool)
+        arrays['bee_state'] = np.array([b.state for b in bees])
+        arrays['bee_age'] = np.array([b.age for b in bees], dtype=np.int64)
+        arrays['bee_nectar'] = np.array([b.nectarCarried for b in bees], dtype=np.int64)
+        arrays['bee_clog'] = np.array([b.clogCount for b in bees], dtype=np.int64)
+        arrays['bee_target'] = np.array([b.current_move_pos if b.current_move_pos is not None else (-1, -1) for b in bees],
+                                        dtype=np.int64).reshape(len(bees), 2)
+        arrays['bee_has_target'] = np.array([b.current_move_pos is not None for b in bees], dtype=bool)
+        arrays['bee_flower'] = np.array([flower_pos[b.current_move_object.ID] if b.current_move_object is not None else -1
+                                         for b in bees], dtype=np.int64)
+        # recently_emptied_flowers as one flat list (bee_avoid_start[i]:bee_avoid_start[i+1] belongs to bee i)
+        counts = [len(b.recently_emptied_flowers) for b in bees]
+        arrays['bee_avoid_start'] = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        arrays['bee_avoid_flower'] = np.array([flower_pos[fid] for b in bees for fid in b.recently_emptied_flowers], dtype=np.int64)
+        arrays['bee_avoid_time'] = np.array([ts for b in bees for ts in b.recently_emptied_flowers.values()], dtype=np.int64)
+    arrays['meta'] = np.frombuffer(json.dumps(_encode(meta)).encode('utf-8'), dtype=np.uint8)
+    np.savez(filename, **arrays) # uncompressed: loading is a plain read
+
+def load_checkpoint(filename):
+    """
+    Rebuilds a world saved by save_checkpoint.
+    Returns (world, next_t, metrics_rows): run step_world from timestep next_t onwards.
+    """
+    with np.load(filename) as npz:
+        data = {key: npz[key] for key in npz.files}
+    if data['meta'].dtype != np.uint8: # version 1 kept the meta as a str
+        raise ValueError(f"Checkpoint '{filename}' is from an older version, expected version {CHECKPOINT_VERSION}")
+    meta = _decode(json.loads(data['meta'].tobytes().decode('utf-8')))
+    if meta['version'] != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint '{filename}' has version {meta['version']}, expected {CHECKPOINT_VERSION}")
+    next_t = meta['next_t']
+    sim_params = meta['params']
+    flowers = _restore_flowers(data)
+    rng = SimRNG.from_state(meta['rng'])
+    # num_bees 0: the saved bees replace the ones setup_world would make, and no bee streams get spawned from rng
+    world = beeworld.setup_world(dict(sim_params, num_bees=0), data['property_map'], flowers, meta['property_config'], rng,
+                                 start_step=next_t)
+    world['params'] = sim_params
+    world['nav'].max_bytes = meta['nav_max_bytes']
+    world['hive_data'][...] = data['hive_data']
+    _restore_comb(world['hive_layout']['comb_index'], data)
+    if meta['engine'] == 'swarm':
+        world['swarm_rng'] = rng.generator
+        swarm = world['swarm']
+        for name in SWARM_COLUMNS:
+            setattr(swarm, name, data['swarm_' + name])
+        swarm.n = len(swarm.x)
+        if len(data['swarm_ids']):
+            swarm.ids = data['swarm_ids'].tolist()
+    else:
+        # Building 100k bees and streams with the cyclic garbage collector on makes it re-scan them over and
+        # over (none of them can be garbage yet), which doubles the load time.
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            bees = []
+            rngs = _restore_rngs(meta['bee_rng_seed'], data)
+            col = {name: data[name].tolist() for name in ('bee_id', 'bee_xy', 'bee_entrance', 'bee_max_carry', 'bee_avoid_duration',
+                   'bee_max_clog', 'bee_inhive', 'bee_state', 'bee_age', 'bee_nectar', 'bee_clog', 'bee_target', 'bee_has_target',
+                   'bee_flower', 'bee_avoid_start', 'bee_avoid_flower', 'bee_avoid_time')} # plain Python values, one conversion per column
+            avoid_start, avoid_flower, avoid_time = col['bee_avoid_start'], col['bee_avoid_flower'], col['bee_avoid_time']
+            for i, bid in enumerate(col['bee_id']):
+                b = Bee(bid, tuple(col['bee_xy'][i]), tuple(col['bee_entrance'][i]), col['bee_max_carry'][i],
+                        col['bee_avoid_duration'][i], col['bee_max_clog'][i], rngs[i])
+                b.inhive = col['bee_inhive'][i]
+                b.state = col['bee_state'][i]
+                b.age = col['bee_age'][i]
+                b.nectarCarried = col['bee_nectar'][i]
+                b.clogCount = col['bee_clog'][i]
+                b.current_move_pos = tuple(col['bee_target'][i]) if col['bee_has_target'][i] else None
+                b.current_move_object = flowers[col['bee_flower'][i]] if col['bee_flower'][i] >= 0 else None
+                lo, hi = avoid_start[i], avoid_start[i + 1]
+                b.recently_emptied_flowers = {flowers[f].ID: ts for f, ts in zip(avoid_flower[lo:hi], avoid_time[lo:hi])}
+                bees.append(b)
+        finally:
+            if collecting:
+                gc.enable()
+        world['bees'] = bees
+        for b in bees:
+            world['occupancy'].add_bee(b) # empty: setup_world made no bees
+    metrics_rows = [dict(zip(beeworld.METRIC_COLUMNS, row)) for row in data['metrics'].tolist()]
+    return world, next_t, metrics_rows
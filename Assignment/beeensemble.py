@@ -0,0 +1,145 @@
+#
+# beeensemble.py - run many seeded replicas of one beeworld scenario across a process pool
+#
+# Each worker process loads the map and parameter files once, then runs whole replicas headless
+# (no plotting, logging off) and sends back its per-timestep metrics. The replicas' seeds are spawned
+# from one root seed, so the ensemble as a whole is reproducible and the replicas are independent.
+# Replicas never talk to each other, so the run time drops linearly with the number of worker processes.
+#
+# Usage:  python beeensemble.py -n 32 -j 4 --seed 1 -o ensemble_out
+#
+
+import os
+import io
+import csv
+import copy
+import argparse
+import contextlib
+import multiprocessing
+import numpy as np
+
+import beeworld
+from beelog import LOG
+from beerng import SimRNG
+
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+_scenario = None # (sim_params, property_map, flowers, property_config) loaded once per worker process
+
+def load_scenario(mapfile, paramfile, overrides=None):
+    """Loads the parameter and map files quietly (their messages would be repeated by every worker)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim_params = beeworld.loadParameters(paramfile)
+        sim_params.update(overrides or {})
+        property_map, flowers, property_config = beeworld.loadMap(mapfile, sim_params)
+    return sim_params, property_map, flowers, property_config
+
+def _init_worker(mapfile, paramfile, overrides):
+    global _scenario
+    LOG.configure(level='off')
+    _scenario = load_scenario(mapfile, paramfile, overrides)
+
+def run_replica(scenario, seed_seq, simlength=None):
+    """
+    Runs one headless replica of a loaded scenario.
+    scenario:   (sim_params, property_map, flowers, property_config) as returned by load_scenario
+    seed_seq:   numpy SeedSequence (or int) for this replica
+    simlength:   number of timesteps (default: sim_params['simlength'])
+    Returns a (timesteps, len(beeworld.METRIC_COLUMNS)) array of collect_metrics values.
+    """
+    sim_params, property_map, flowers, property_config = scenario
+    sim_params = dict(sim_params)
+    flowers = copy.deepcopy(flowers) # flowers are changed by the run, the loaded map is reused
+    if simlength is not None:
+        sim_params['simlength'] = simlength
+    world = beeworld.setup_world(sim_params, property_map.copy(), flowers, property_config, SimRNG(seed_seq))
+    rows = []
+    for t in range(sim_params['simlength']):
+        beeworld.step_world(world, t)
+        metrics = beeworld.collect_metrics(world, t)
+        rows.append([metrics[c] for c in beeworld.METRIC_COLUMNS])
+    return np.array(rows, dtype=np.int64)
+
+def _run_task(task):
+    i, seed_seq, simlength = task
+    return i, run_replica(_scenario, seed_seq, simlength)
+
+def run_ensemble(mapfile, paramfile, n_replicas, seed=None, workers=None, overrides=None, simlength=None):
+    """
+    Runs n_replicas seeded replicas of one scenario.
+    mapfile, paramfile:   scenario files, as for beeworld.py
+    n_replicas:   number of replicas
+    seed:   root seed; replica i uses the i-th child SeedSequence (None = fresh entropy, see the result's 'seed')
+    workers:   number of processes (default: all cores; 1 = run in this process)
+    overrides:   parameter values to change after loading paramfile, e.g. {'engine': 'swarm'}
+    simlength:   number of timesteps (default: from the parameter file)
+    Returns a dictionary with 'columns', 'runs' (replica x timestep x column array) and 'seed'.
+    """
+    root = SimRNG(seed)
+    seeds = root.seed_seq.spawn(n_replicas)
+    workers = workers or os.cpu_count() or 1
+    tasks = [(i, s, simlength) for i, s in enumerate(seeds)]
+    results = [None] * n_replicas
+    if workers == 1:
+        old_level = LOG.level
+        try:
+            _init_worker(mapfile, paramfile, overrides)
+            for task in tasks:
+                i, run = _run_task(task)
+                results[i] = run
+        finally:
+            LOG.configure(level=old_level) # also after an error or Ctrl-C
+    else:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(mapfile, paramfile, overrides)) as pool:
+            for i, run in pool.imap_unordered(_run_task, tasks):
+                results[i] = run
+    return {'columns': list(beeworld.METRIC_COLUMNS), 'runs': np.stack(results), 'seed': root.entropy}
+
+def summarise(runs, columns, quantiles=DEFAULT_QUANTILES):
+    """
+    Per-timestep statistics over the replicas.
+    runs:   replica x timestep x column array from run_ensemble
+    Returns a list of row dictionaries: timestep, metric, mean, std and one column per quantile.
+    """
+    mean = runs.mean(axis=0)
+    std = runs.std(axis=0)
+    qs = np.quantile(runs, quantiles, axis=0)
+    rows = []
+    for c, name in enumerate(columns):
+        if name == 'timestep':
+            continue
+        for t in range(runs.shape[1]):
+            row = {'timestep': t + 1, 'metric': name, 'mean': mean[t, c], 'std': std[t, c]}
+            for q, values in zip(quantiles, qs):
+                row[f'q{int(round(q * 100)):02d}'] = values[t, c]
+            rows.append(row)
+    return rows
+
+def save_rows(rows, filename):
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run seeded beeworld replicas in parallel and summarise them")
+    parser.add_argument("-f", "--mapfile", type=str, default="map1.csv", help="Path to CSV for property map")
+    parser.add_argument("-p", "--paramfile", type=str, default="para1.csv", help="Path to CSV for simulation parameters")
+    parser.add_argument("-n", "--replicas", type=int, default=16, help="Number of replicas")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None, help="Root seed for the ensemble")
+    parser.add_argument("--engine", choices=["object", "swarm"], default=None, help="Bee engine (overrides the parameter file)")
+    parser.add_argument("--steps", type=int, default=None, help="Timesteps per replica (default: simlength from the parameter file)")
+    parser.add_argument("-o", "--outdir", type=str, default="ensemble_out", help="Directory for ensemble_stats.csv and replicas.csv")
+    args = parser.parse_args()
+    overrides = {'engine': args.engine} if args.engine else None
+    result = run_ensemble(args.mapfile, args.paramfile, args.replicas, args.seed, args.workers, overrides, args.steps)
+    os.makedirs(args.outdir, exist_ok=True)
+    save_rows(summarise(result['runs'], result['columns']), os.path.join(args.outdir, 'ensemble_stats.csv'))
+    replica_rows = [dict(zip(['replica'] + result['columns'], [i] + run_row.tolist()))
+                    for i, run in enumerate(result['runs']) for run_row in run]
+    save_rows(replica_rows, os.path.join(args.outdir, 'replicas.csv'))
+    print(f"Ran {args.replicas} replicas (root seed {result['seed']}); statistics saved to {os.path.join(args.outdir, 'ensemble_stats.csv')}")
+
+if __name__ == "__main__":
+    main()
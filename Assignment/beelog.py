@@ -0,0 +1,149 @@
+#
+# beelog.py - Event logging for the bee simulation
+#
+# Replaces print() in the per-bee / per-flower code. Each event is a (timestep, level, category, message, args)
+# tuple; the message is only formatted (msg % args) by a sink, so events that are filtered out by level or
+# category cost a comparison and no string formatting or I/O.
+#
+
+import sys
+import json
+from collections import deque
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+OFF = 100 # above every level: nothing is logged
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR, 'off': OFF}
+LEVEL_NAMES = {v: k.upper() for k, v in LEVELS.items()}
+CATEGORIES = ('sim', 'bee', 'flower') # sim = per-timestep messages from beeworld
+
+def format_event(event):
+    """Message text of an event, as print() used to show it."""
+    _, _, _, msg, args = event
+    return msg % args if args else msg
+
+class StdoutSink():
+    """Prints each event straight away (the old print() behaviour)."""
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, event):
+        print(format_event(event), file=self.stream or sys.stdout)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class RingBufferSink():
+    """Keeps the last `capacity` events in memory, unformatted (e.g. to inspect what happened before a problem)."""
+    def __init__(self, capacity=10000):
+        self.buffer = deque(maxlen=capacity)
+
+    def write(self, event):
+        self.buffer.append(event)
+
+    def events(self):
+        return list(self.buffer)
+
+    def lines(self):
+        return [format_event(e) for e in self.buffer]
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class FileSink():
+    """Buffers events and appends them to a file as JSON lines, flush_every events at a time."""
+    def __init__(self, filename, flush_every=5000):
+        self.filename = filename
+        self.flush_every = flush_every
+        self.pending = []
+        open(filename, 'w').close() # start a fresh log file
+
+    def write(self, event):
+        self.pending.append(event)
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with open(self.filename, 'a') as f:
+            f.write(''.join(json.dumps({'t': e[0], 'level': LEVEL_NAMES.get(e[1], e[1]), 'category': e[2],
+                'message': format_event(e)}) + '\n' for e in self.pending))
+        self.pending = []
+
+    def close(self):
+        self.flush()
+
+class EventLog():
+    """
+    Level- and category-filtered event logger.
+    level:   lowest level that is recorded (DEBUG, INFO, WARNING, ERROR or OFF)
+    categories:   set of categories to record, or None for all
+    sinks:   list of sinks (objects with write(event), flush(), close())
+    """
+    def __init__(self, level=DEBUG, categories=None, sinks=None):
+        self.timestep = None # set by the simulation loop so events can be matched to timesteps
+        self.configure(level, categories, sinks if sinks is not None else [StdoutSink()])
+
+    def configure(self, level=None, categories=None, sinks=None):
+        """
+        Changes the level, category filter and/or sinks. Sinks that are replaced are flushed and closed.
+        categories:   names from CATEGORIES to keep (an empty list keeps none; None leaves the filter as it is)
+        Raises ValueError for a category name that is not in CATEGORIES.
+        """
+        if level is not None:
+            self.level = LEVELS[level] if isinstance(level, str) else level
+        if categories is not None:
+            unknown = sorted(set(categories) - set(CATEGORIES))
+            if unknown:
+                raise ValueError(f"Unknown log categories: {', '.join(unknown)} (choose from {', '.join(CATEGORIES)})")
+            self.categories = set(categories)
+        elif not hasattr(self, 'categories'):
+            self.categories = None
+        if sinks is not None:
+            for sink in getattr(self, 'sinks', []):
+                if sink not in sinks:
+                    sink.close()
+            self.sinks = list(sinks)
+
+    def enabled(self, level, category):
+        """True if an event with this level and category would be recorded."""
+        return level >= self.level and (self.categories is None or category in self.categories)
+
+    def log(self, level, category, msg, *args):
+        if level < self.level or (self.categories is not None and category not in self.categories):
+            return
+        event = (self.timestep, level, category, msg, args)
+        for sink in self.sinks:
+            sink.write(event)
+
+    def debug(self, category, msg, *args):
+        if DEBUG < self.level or (self.categories is not None and category not in self.categories):
+            return
+        self.log(DEBUG, category, msg, *args)
+
+    def info(self, category, msg, *args):
+        if INFO < self.level or (self.categories is not None and category not in self.categories):
+            return
+        self.log(INFO, category, msg, *args)
+
+    def warning(self, category, msg, *args):
+        self.log(WARNING, category, msg, *args)
+
+    def error(self, category, msg, *args):
+        self.log(ERROR, category, msg, *args)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+LOG = EventLog() # Shared logger used by buzzness and beeworld
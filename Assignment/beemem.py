@@ -0,0 +1,178 @@
+#
+# beemem.py - memory footprint of a run: tracemalloc snapshots and the size of the main structures
+#
+# MemoryMonitor takes a tracemalloc snapshot every N timesteps. For each one it reports the memory traced by
+# Python, the allocation sites that hold the most and the sites that grew most since the previous snapshot.
+# It also measures the structures we expect to grow, so a leak or bloat shows up with a name on it:
+#     bees:   Bee objects with everything they hold (recently_emptied_flowers dicts, paths, rng streams),
+#             or the BeeSwarm arrays
+#     bees.recently_emptied:   just the recently_emptied_flowers dicts (object engine)
+#     flowers, flower_index, occupancy, comb_index, hive_data, property_map, nav_fields (cached distance fields)
+#     log_buffers:   events waiting in beelog sinks (FileSink / RingBufferSink)
+#     plus anything the caller passes in, e.g. the metrics rows run_simulation keeps
+#
+# tracemalloc makes the run noticeably slower (every allocation is recorded), so this is for finding
+# problems, not for timing. NumPy buffers are traced too.
+#
+# Usage:  python beeworld.py --headless --memory-every 500 --memory-top 10 --memory-json memory.json
+#
+
+import sys
+import json
+import types
+import tracemalloc
+import numpy as np
+
+from beelog import LOG
+from buzzness import Flower
+
+MB = 2**20
+_NOT_ENTERED = (type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType)
+
+def deep_size(obj, seen=None, stop=()):
+    """
+    Bytes used by obj and everything it references (containers, instance attributes, NumPy buffers).
+    seen:   set of ids already counted (share it to count shared objects once)
+    stop:   types that are not counted or entered (e.g. Flower when measuring bees that point at flowers)
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    todo = [obj]
+    while todo:
+        o = todo.pop()
+        if id(o) in seen or isinstance(o, _NOT_ENTERED) or (stop and isinstance(o, stop)):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o) # an ndarray that owns its data includes the buffer
+        if isinstance(o, np.ndarray):
+            if o.base is not None:
+                todo.append(o.base)
+        elif isinstance(o, dict):
+            todo.extend(o.keys())
+            todo.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)) or type(o).__name__ == 'deque':
+            todo.extend(o)
+        if hasattr(o, '__dict__') and not isinstance(o, np.ndarray):
+            todo.append(o.__dict__)
+        elif hasattr(o, '__slots__'):
+            todo.extend(getattr(o, name) for name in o.__slots__ if hasattr(o, name))
+    return total
+
+def structure_sizes(world, extra=None):
+    """Bytes used by each main structure of a world (see the list at the top of this file)."""
+    sizes = {}
+    if 'swarm' in world:
+        sizes['bees'] = deep_size(world['swarm'])
+        sizes['flowers'] = deep_size(world['flowers']) + deep_size(world['flower_arrays'], stop=(Flower,))
+    else:
+        sizes['bees'] = deep_size(world['bees'], stop=(Flower,))
+        sizes['bees.recently_emptied'] = sum(deep_size(b.recently_emptied_flowers, stop=(Flower,)) for b in world['bees'])
+        sizes['flowers'] = deep_size(world['flowers'])
+        sizes['occupancy'] = deep_size(world['occupancy'])
+    sizes['flower_index'] = deep_size(world['flower_index'], stop=(Flower,))
+    sizes['comb_index'] = deep_size(world['hive_layout']['comb_index'], stop=(np.ndarray,)) # hive_data is counted below
+    sizes['hive_data'] = world['hive_data'].nbytes
+    sizes['property_map'] = world['property_map'].nbytes
+    sizes['nav_fields'] = world['nav'].stats()['used_bytes']
+    sizes['log_buffers'] = sum(deep_size(getattr(sink, 'pending', getattr(sink, 'buffer', None))) for sink in LOG.sinks)
+    for name, value in (extra or {}).items():
+        sizes[name] = deep_size(value)
+    return sizes
+
+def _site(stat):
+    frame = stat.traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+class MemoryMonitor():
+    """
+    tracemalloc snapshots and structure sizes every `every` timesteps of a run.
+    Call start() before the run, check(world, t) after each timestep and stop() at the end.
+    """
+    def __init__(self, every=1000, top=10, frames=1):
+        """
+        every:   timesteps between snapshots
+        top:   allocation sites listed per snapshot
+        frames:   call frames stored per allocation (more = slower, but shows who called the allocating line)
+        """
+        self.every = max(1, every)
+        self.top = top
+        self.frames = frames
+        self.records = []
+        self.first = None # first and previous snapshots, for the growth deltas
+        self.previous = None
+        self.started_tracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.started_tracing = True
+
+    def check(self, world, t, extra=None):
+        """Takes a snapshot if timestep t is one of the sampled ones."""
+        if (t + 1) % self.every == 0:
+            self.take(world, t, extra)
+
+    def take(self, world, t, extra=None):
+        """
+        Snapshot after timestep t.
+        extra:   dictionary of more structures to measure, e.g. {'metrics_rows': metrics_rows}
+        """
+        sizes = structure_sizes(world, extra)
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__), # deep_size's own temporary sets
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'), # modules imported during the run
+            tracemalloc.Filter(False, '<unknown>')))
+        traced, peak = tracemalloc.get_traced_memory()
+        record = {'timestep': t + 1, 'traced_bytes': traced, 'peak_bytes': peak, 'structures': sizes,
+                  'top': [{'site': _site(s), 'bytes': s.size, 'blocks': s.count} for s in snapshot.statistics('lineno')[:self.top]]}
+        if self.previous is not None:
+            growth = sorted(snapshot.compare_to(self.previous, 'lineno'), key=lambda s: -s.size_diff)[:self.top]
+            record['growth'] = [{'site': _site(s), 'bytes': s.size, 'growth_bytes': s.size_diff, 'blocks_diff': s.count_diff}
+                                for s in growth if s.size_diff > 0]
+        else:
+            self.first = snapshot
+        self.previous = snapshot
+        self.records.append(record)
+        print(f"Memory after timestep {t+1}: {traced / MB:.1f} MB traced (peak {peak / MB:.1f} MB), "
+              f"bees {sizes['bees'] / MB:.2f} MB, flowers {sizes['flowers'] / MB:.2f} MB")
+        return record
+
+    def growth_since_first(self):
+        """Allocation sites that grew most from the first snapshot to the last."""
+        if self.first is None or self.previous is self.first:
+            return []
+        stats = sorted(self.previous.compare_to(self.first, 'lineno'), key=lambda s: -s.size_diff)[:self.top]
+        return [{'site': _site(s), 'bytes': s.size, 'growth_bytes': s.size_diff, 'blocks_diff': s.count_diff}
+                for s in stats if s.size_diff > 0]
+
+    def stop(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def report(self):
+        """Text report: structure sizes per snapshot, top sites of the last snapshot, growth since the first."""
+        if not self.records:
+            return "Memory report: no snapshots taken (run shorter than --memory-every?)"
+        names = list(self.records[-1]['structures'])
+        widths = [max(9, len(n)) for n in names]
+        lines = ["Memory report (MB)", "  " + f"{'timestep':>9} {'traced':>8} {'peak':>8} " + ' '.join(f"{n:>{w}}" for n, w in zip(names, widths))]
+        for r in self.records:
+            lines.append("  " + f"{r['timestep']:9d} {r['traced_bytes'] / MB:8.2f} {r['peak_bytes'] / MB:8.2f} "
+                         + ' '.join(f"{r['structures'].get(n, 0) / MB:{w}.3f}" for n, w in zip(names, widths)))
+        last = self.records[-1]
+        lines.append(f"  Largest allocation sites at timestep {last['timestep']}:")
+        for s in last['top']:
+            lines.append(f"    {s['bytes'] / 1024:10.1f} KiB {s['blocks']:8d} blocks  {s['site']}")
+        growth = self.growth_since_first()
+        if growth:
+            lines.append(f"  Growth from timestep {self.records[0]['timestep']} to {last['timestep']}:")
+            for s in growth:
+                lines.append(f"    {s['growth_bytes'] / 1024:+10.1f} KiB {s['blocks_diff']:+8d} blocks  {s['site']}")
+        return '\n'.join(lines)
+
+    def save_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump({'every': self.every, 'snapshots': self.records, 'growth_since_first': self.growth_since_first()}, f, indent=1)
@@ -0,0 +1,152 @@
+#
+# beenav.py - obstacle-aware navigation fields for bees on the property
+#
+# A distance field holds, for every property cell, the number of bee moves (8 neighbours, like moveBee's
+# diagonal and jiggle steps) needed to reach a goal cell without crossing terrain != 0 (-1 = unreachable).
+# A bee heading for the goal just steps to a neighbour whose distance is one less, so it walks around
+# barriers instead of jiggling against them. Used by returning bees (hive entrance field) and by bees
+# flying to a flower (one field per flower position, LRU cached).
+#
+
+from collections import OrderedDict
+import numpy as np
+
+UNREACHABLE = -1
+MOORE_MOVES = np.array([(0,1), (1,0), (0,-1), (-1,0), (1,1), (1,-1), (-1,1), (-1,-1)]) # same neighbours as moveBee's jiggles
+MAX_PREFERRED = 3 # downhill steps tried before jiggling (moveBee also tries at most 3 preferred steps)
+
+def distance_field(terrain, goal):
+    """
+    Breadth-first search from goal over the passable cells (terrain == 0) of the property.
+    terrain:   numpy array of the property terrain
+    goal:   (x, y) goal cell (always treated as reachable, even if its terrain is not 0)
+    Returns an int32 array shaped like terrain.
+    """
+    maxX, maxY = terrain.shape
+    dist = np.full((maxX, maxY), UNREACHABLE, dtype=np.int32)
+    gx, gy = goal
+    if not (0 <= gx < maxX and 0 <= gy < maxY):
+        return dist
+    passable = terrain == 0
+    dist[gx, gy] = 0
+    fx, fy = np.array([gx]), np.array([gy]) # current BFS frontier
+    d = 0
+    while len(fx):
+        d += 1
+        nx = (fx[:, None] + MOORE_MOVES[None, :, 0]).ravel()
+        ny = (fy[:, None] + MOORE_MOVES[None, :, 1]).ravel()
+        inside = (nx >= 0) & (nx < maxX) & (ny >= 0) & (ny < maxY)
+        nx, ny = nx[inside], ny[inside]
+        new = passable[nx, ny] & (dist[nx, ny] == UNREACHABLE)
+        cells = np.unique(nx[new] * maxY + ny[new])
+        fx, fy = cells // maxY, cells % maxY
+        dist[fx, fy] = d
+    return dist
+
+def _preference(dx, dy, sx, sy):
+    """moveBee's order: the greedy diagonal step, then the two straight steps, then any other direction."""
+    if (dx, dy) == (sx, sy):
+        return 0
+    if (dx, dy) == (sx, 0) or (dx, dy) == (0, sy):
+        return 1
+    return 2
+
+def downhill_steps(field, pos, target):
+    """
+    Neighbours of pos that are one move closer to the field's goal, best first (at most MAX_PREFERRED).
+    Returns None if pos is not reachable from the goal (the caller falls back to greedy moves).
+    """
+    x, y = pos
+    here = field[x, y]
+    if here == UNREACHABLE:
+        return None
+    maxX, maxY = field.shape
+    sx, sy = int(np.sign(target[0] - x)), int(np.sign(target[1] - y))
+    steps = []
+    for dx, dy in MOORE_MOVES.tolist():
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < maxX and 0 <= ny < maxY and field[nx, ny] == here - 1 and field[nx, ny] != UNREACHABLE:
+            steps.append((_preference(dx, dy, sx, sy), (nx, ny)))
+    steps.sort(key=lambda item: item[0]) # stable: ties keep MOORE_MOVES order
+    return [cell for _, cell in steps[:MAX_PREFERRED]]
+
+def downhill_candidates(field, xs, ys, tx, ty):
+    """
+    Vectorised downhill_steps for many bees.
+    Returns (cells, valid, reachable): cells is (m, MAX_PREFERRED, 2), valid marks real steps,
+    reachable is False for bees whose cell the field does not reach.
+    """
+    maxX, maxY = field.shape
+    m = len(xs)
+    here = field[xs, ys]
+    nx = xs[:, None] + MOORE_MOVES[None, :, 0]
+    ny = ys[:, None] + MOORE_MOVES[None, :, 1]
+    inside = (nx >= 0) & (nx < maxX) & (ny >= 0) & (ny < maxY)
+    nd = np.full(nx.shape, UNREACHABLE, dtype=np.int64)
+    nd[inside] = field[nx[inside], ny[inside]]
+    down = inside & (nd == here[:, None] - 1) & (nd != UNREACHABLE)
+    sx, sy = np.sign(tx - xs)[:, None], np.sign(ty - ys)[:, None]
+    mdx, mdy = MOORE_MOVES[None, :, 0], MOORE_MOVES[None, :, 1]
+    pref = np.where((mdx == sx) & (mdy == sy), 0, np.where(((mdx == sx) & (mdy == 0)) | ((mdx == 0) & (mdy == sy)), 1, 2))
+    key = np.where(down, pref * len(MOORE_MOVES) + np.arange(len(MOORE_MOVES))[None, :], 1000)
+    best = np.argsort(key, axis=1, kind='stable')[:, :MAX_PREFERRED]
+    rows = np.arange(m)[:, None]
+    cells = np.stack([nx[rows, best], ny[rows, best]], axis=2)
+    return cells, down[rows, best], here != UNREACHABLE
+
+class NavFields():
+    """
+    Distance fields for one property terrain, computed on first use and kept in an LRU cache until the
+    terrain changes (call invalidate() after editing the terrain array). Bees heading for the same goal
+    share one field. Pinned goals (the hive entrance) are never evicted and do not count against the budget.
+    """
+    def __init__(self, terrain, max_bytes=64 * 2**20, pinned=()):
+        """
+        terrain:   numpy array of the property terrain (0 = passable)
+        max_bytes:   memory budget for the unpinned fields (the least recently used ones are evicted first)
+        pinned:   goals whose fields are always kept
+        """
+        self.terrain = terrain
+        self.max_bytes = max_bytes
+        self.pinned = {(int(g[0]), int(g[1])) for g in pinned}
+        self.fields = OrderedDict() # goal (x, y) -> distance field, least recently used first
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def invalidate(self):
+        self.fields = OrderedDict()
+        self.used_bytes = 0
+
+    def field(self, goal):
+        goal = (int(goal[0]), int(goal[1]))
+        found = self.fields.get(goal)
+        if found is not None:
+            self.hits += 1
+            self.fields.move_to_end(goal)
+            return found
+        self.misses += 1
+        found = distance_field(self.terrain, goal)
+        self.fields[goal] = found
+        if goal not in self.pinned:
+            self.used_bytes += found.nbytes
+            self._evict(keep=goal)
+        return found
+
+    def _evict(self, keep):
+        """Drops least recently used unpinned fields until the budget is met (the newest field is always kept)."""
+        for old in list(self.fields):
+            if self.used_bytes <= self.max_bytes:
+                break
+            if old in self.pinned or old == keep:
+                continue
+            self.used_bytes -= self.fields.pop(old).nbytes
+            self.evictions += 1
+
+    def stats(self):
+        """Cache statistics, for sizing max_bytes on large maps."""
+        lookups = self.hits + self.misses
+        return {'fields': len(self.fields), 'used_bytes': self.used_bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,217 @@
+#
+# beeprof.py - optional timing of where a run spends its time (bee states, bee helpers, loop phases)
+#
+# PROF is shared like beelog.LOG. While it is disabled nothing is measured: the bee methods are the plain ones
+# and PROF.phase() hands back a do-nothing context manager (one call per phase per timestep). PROF.enable()
+# swaps timing wrappers onto Bee.step_change (timed per bee state at the start of the call), the Bee helpers
+# (moveBee, moveRandomly, seekFlower, buildFrames, depositNectar), the BeeSwarm helpers and the navigation
+# field search; PROF.disable() puts the originals back. Times are inclusive: a state's time contains the
+# helpers it called, and a phase contains the phases inside it (step contains step.bees).
+#
+# The same wrappers and phases feed a beetrace.Tracer when one is attached with PROF.start_trace(), so a
+# run can be looked at as a timeline as well as totals. With --render-thread the simulation and GUI threads
+# both add to the totals, so add() holds a lock.
+#
+# Usage:  python beeworld.py --headless --profile
+#         python beeworld.py --headless --profile-json profile.json
+#
+
+import json
+import time
+import functools
+import threading
+
+import beenav
+from buzzness import Bee
+from beeswarm import BeeSwarm
+
+BEE_HELPERS = ('moveBee', 'moveRandomly', 'seekFlower', 'buildFrames', 'depositNectar')
+SWARM_HELPERS = ('_idle_in_hive', '_seek_flower', '_collect', '_build', '_deposit', '_toward_candidates',
+                 '_follow_fields', '_random_candidates', '_entrance_candidates', '_resolve_moves')
+
+class _NoTimer():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NO_TIMER = _NoTimer()
+
+class _Timer():
+    __slots__ = ('prof', 'key', 'args', 't0')
+
+    def __init__(self, prof, key, args=None):
+        self.prof = prof
+        self.key = key
+        self.args = args
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        t1 = time.perf_counter()
+        self.prof.record(self.key, self.t0, t1, self.args)
+        return False
+
+class Profiler():
+    """
+    Accumulates wall time and call counts per (kind, name): kind is 'phase', 'state' or 'helper'.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.tracer = None # beetrace.Tracer being filled, if any
+        self.seconds = {}
+        self.calls = {}
+        self.lock = threading.Lock() # the GUI thread adds render / gui_wait times while the simulation thread runs
+        self.wall = 0.0
+        self._started = None
+        self._originals = [] # (owner, attribute, original) to put back when neither timing nor tracing is on
+
+    def reset(self):
+        self.seconds, self.calls, self.wall = {}, {}, 0.0
+        if self.enabled:
+            self._started = time.perf_counter()
+
+    def add(self, key, seconds, calls=1):
+        with self.lock:
+            self.seconds[key] = self.seconds.get(key, 0.0) + seconds
+            self.calls[key] = self.calls.get(key, 0) + calls
+
+    def record(self, key, t0, t1, args=None):
+        """A finished call or phase: added to the totals and/or the trace."""
+        if self.enabled:
+            self.add(key, t1 - t0)
+        tracer = self.tracer
+        if tracer is not None and tracer.sampled:
+            tracer.complete(key[1], key[0], t0, t1, args)
+
+    def phase(self, name, args=None):
+        """
+        Context manager timing one phase of the loop (does nothing while neither timing nor tracing).
+        args:   dictionary shown with the span in a trace
+        """
+        if self.enabled or (self.tracer is not None and self.tracer.sampled):
+            return _Timer(self, ('phase', name), args)
+        return NO_TIMER
+
+    def begin_step(self, t):
+        """Tells an attached tracer that timestep t starts (it decides whether to sample it)."""
+        if self.tracer is not None:
+            self.tracer.begin_step(t)
+
+    def follow_step(self, t):
+        """Tells an attached tracer that the calling thread now works for timestep t (e.g. draws it)."""
+        if self.tracer is not None:
+            self.tracer.follow_step(t)
+
+    def enable(self):
+        """Starts a new measurement: clears the totals and installs the timing wrappers."""
+        if self.enabled:
+            return
+        self.enabled = True
+        self.reset()
+        self._install_all()
+
+    def disable(self):
+        """Stops measuring and puts the original methods back (the totals are kept for the report)."""
+        if not self.enabled:
+            return
+        self.wall += time.perf_counter() - self._started
+        self.enabled = False
+        if self.tracer is None:
+            self._uninstall_all()
+
+    def start_trace(self, tracer):
+        """Feeds a beetrace.Tracer from the same wrappers and phases until stop_trace()."""
+        self.stop_trace()
+        self.tracer = tracer
+        self._install_all()
+
+    def stop_trace(self):
+        """Detaches the tracer and returns it (None if there was none)."""
+        tracer, self.tracer = self.tracer, None
+        if tracer is not None and not self.enabled:
+            self._uninstall_all()
+        return tracer
+
+    def _install_all(self):
+        if self._originals:
+            return # already installed for timing or tracing
+        self._wrap_step_change()
+        for name in BEE_HELPERS:
+            self._wrap(Bee, name, name)
+        for name in SWARM_HELPERS:
+            self._wrap(BeeSwarm, name, 'swarm.' + name)
+        self._wrap(beenav, 'distance_field', 'distance_field (navigation BFS)')
+
+    def _uninstall_all(self):
+        for owner, attribute, original in reversed(self._originals):
+            setattr(owner, attribute, original)
+        self._originals = []
+
+    def _install(self, owner, attribute, wrapper):
+        original = getattr(owner, attribute)
+        self._originals.append((owner, attribute, original))
+        setattr(owner, attribute, functools.wraps(original)(wrapper(original)))
+
+    def _wrap(self, owner, attribute, label):
+        key = ('helper', label)
+        clock = time.perf_counter
+        def wrapper(original):
+            def timed(*args, **kwargs):
+                t0 = clock()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.record(key, t0, clock())
+            return timed
+        self._install(owner, attribute, wrapper)
+
+    def _wrap_step_change(self):
+        clock = time.perf_counter
+        def wrapper(original):
+            def timed(bee, *args, **kwargs):
+                key = ('state', bee.state) # the branch taken is decided by the state at the start of the step
+                t0 = clock()
+                try:
+                    return original(bee, *args, **kwargs)
+                finally:
+                    t1 = clock()
+                    if self.enabled:
+                        self.add(key, t1 - t0)
+                    tracer = self.tracer
+                    if tracer is not None and tracer.sampled: # the bee ID only goes into the trace
+                        tracer.complete(key[1], 'state', t0, t1, {'bee': bee.ID})
+            return timed
+        self._install(Bee, 'step_change', wrapper)
+
+    def wall_seconds(self):
+        return self.wall + (time.perf_counter() - self._started if self.enabled else 0.0)
+
+    def to_dict(self):
+        """Totals as a JSON-friendly dictionary, entries sorted by time (largest first)."""
+        entries = [{'kind': kind, 'name': name, 'calls': self.calls[(kind, name)], 'seconds': round(seconds, 6)}
+                   for (kind, name), seconds in sorted(self.seconds.items(), key=lambda item: -item[1])]
+        return {'wall_seconds': round(self.wall_seconds(), 6), 'entries': entries}
+
+    def report(self):
+        """Text table of the totals: one block per kind, largest time first."""
+        wall = self.wall_seconds() or 1.0
+        lines = [f"Timing report ({self.wall_seconds():.3f}s wall time, times include nested calls)"]
+        for kind, title in (('phase', 'Loop phases'), ('state', 'Bee states (step_change)'), ('helper', 'Helpers')):
+            rows = [(name, self.calls[(k, name)], s) for (k, name), s in self.seconds.items() if k == kind]
+            if not rows:
+                continue
+            lines.append(f"  {title}:")
+            lines.append(f"    {'name':<34} {'calls':>10} {'total s':>10} {'mean us':>10} {'% wall':>7}")
+            for name, calls, seconds in sorted(rows, key=lambda row: -row[2]):
+                lines.append(f"    {name:<34} {calls:10d} {seconds:10.4f} {seconds / calls * 1e6:10.1f} {100 * seconds / wall:6.1f}%")
+        return '\n'.join(lines)
+
+    def save_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+PROF = Profiler() # Shared profiler used by beeworld
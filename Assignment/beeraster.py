@@ -0,0 +1,181 @@
+#
+# beeraster.py - fast frame export: the hive and property views drawn straight into RGB NumPy arrays
+#
+# Going through a matplotlib figure (layout, text, savefig) costs tens of milliseconds per frame. For video
+# export RasterRenderer skips matplotlib: terrain and hive cells are coloured by palette lookup and scaled up
+# to `scale` pixels per cell, then bees, flowers and the hive entrance are stamped on as small pixel sprites.
+# FrameExporter writes the frames as a PNG sequence (zlib only) or pipes raw RGB frames to ffmpeg for a GIF
+# or MP4. Panels: hive on the left, property on the right (y axis upwards, like the plots).
+#
+# Usage:  python beeworld.py --headless --no-png --export run.mp4 --export-scale 8 --export-fps 30
+#
+
+import os
+import zlib
+import struct
+import shutil
+import subprocess
+import numpy as np
+
+import beeworld
+from beerecord import bee_columns, flower_columns
+
+def _hex(colour):
+    return tuple(int(colour[i:i+2], 16) for i in (1, 3, 5))
+
+# matplotlib's tab20, as used by plot_property for terrain values 0..19
+TERRAIN_PALETTE = np.array([_hex(c) for c in ('#1f77b4', '#aec7e8', '#ff7f0e', '#ffbb78', '#2ca02c', '#98df8a', '#d62728',
+                                              '#ff9896', '#9467bd', '#c5b0d5', '#8c564b', '#c49c94', '#e377c2', '#f7b6d2',
+                                              '#7f7f7f', '#c7c7c7', '#bcbd22', '#dbdb8d', '#17becf', '#9edae5')], dtype=np.uint8)
+FLOWER_RGB = {'Red': (255, 0, 0), 'Blue': (0, 0, 255), 'Yellow': (255, 255, 0), 'Purple': (128, 0, 128), 'Pink': (255, 192, 203),
+              'White': (211, 211, 211), 'Orange': (255, 165, 0), 'Green': (0, 128, 0)}
+OTHER_FLOWER_RGB = (255, 0, 255) # magenta, as in plot_property
+DEAD_FLOWER_RGB = (128, 128, 128)
+BEE_RGB = (0, 0, 0)
+ENTRANCE_RGB = (255, 215, 0) # gold
+BACKGROUND_RGB = (255, 255, 255)
+PANEL_GAP = 2 # cells of background between the two panels
+
+def hive_palette(max_nectar_val):
+    """RGB per hive_raster value: Oranges shades for 0..max nectar, grey for unbuilt stripe cells, brown outside."""
+    light, dark = np.array([255, 245, 235]), np.array([127, 39, 4]) # ends of matplotlib's Oranges
+    shades = [light + (dark - light) * i / (max_nectar_val + 1) for i in range(max_nectar_val + 1)]
+    return np.array(shades + [(217, 217, 217), (153, 102, 51)], dtype=np.uint8)
+
+def _sprite(scale, shape):
+    """(rows, cols) pixel offsets of a sprite inside one scale x scale cell."""
+    r, c = np.mgrid[0:scale, 0:scale]
+    centre = (scale - 1) / 2
+    if shape == 'disk':
+        mask = (r - centre) ** 2 + (c - centre) ** 2 <= (0.38 * scale) ** 2
+    elif shape == 'plus':
+        half = max(scale // 6, 0.5)
+        mask = ((np.abs(r - centre) <= half) | (np.abs(c - centre) <= half)) & (np.abs(r - centre) <= 0.45 * scale) & (np.abs(c - centre) <= 0.45 * scale)
+    else: # 'cell': the whole cell
+        mask = np.ones((scale, scale), dtype=bool)
+    return r[mask], c[mask]
+
+class RasterRenderer():
+    """
+    Renders a world (either engine) into an RGB uint8 array of shape (height, width, 3).
+    """
+    def __init__(self, world, scale=8):
+        """
+        world:   world from beeworld.setup_world (or a replay world); the map, hive size and flowers must not change
+        scale:   pixels per cell
+        """
+        self.scale = scale
+        layout = world['hive_layout']
+        config = world['property_config']
+        self.hive_w, self.hive_h = layout['max_x'], layout['max_y']
+        self.prop_w, self.prop_h = config['max_x'], config['max_y']
+        self.prop_col = (self.hive_w + PANEL_GAP) * scale # left edge of the property panel in pixels
+        height = max(self.hive_h, self.prop_h) * scale
+        width = self.prop_col + self.prop_w * scale
+        height += height % 2 # even sizes, so the frames can be encoded as yuv420p video
+        width += width % 2
+        self.hive_palette = hive_palette(layout.get('max_nectar_per_cell', 4))
+        self.base = np.empty((height, width, 3), dtype=np.uint8)
+        self.base[:] = BACKGROUND_RGB
+        terrain = np.clip(world['property_map'], 0, len(TERRAIN_PALETTE) - 1)
+        self._paint(self.base, TERRAIN_PALETTE[terrain], self.prop_col, self.prop_h) # the terrain never changes
+        flowers = world['flowers']
+        self.flower_x = np.array([f.get_pos()[0] for f in flowers], dtype=np.int64).reshape(len(flowers))
+        self.flower_y = np.array([f.get_pos()[1] for f in flowers], dtype=np.int64).reshape(len(flowers))
+        self.flower_rgb = np.array([FLOWER_RGB.get(f.colour, OTHER_FLOWER_RGB) for f in flowers], dtype=np.uint8).reshape(len(flowers), 3)
+        self.sprites = {shape: _sprite(scale, shape) for shape in ('disk', 'plus')}
+        ex, ey = config['hive_position_on_property']
+        self._stamp(self.base, np.array([ex]), np.array([ey]), self.prop_col, self.prop_h, np.array([ENTRANCE_RGB], dtype=np.uint8), 'disk')
+
+    def _paint(self, img, cells_rgb, col0, panel_h):
+        """Scales an (x, y, 3) cell image up to pixels and copies it into img with y pointing up."""
+        s = self.scale
+        pixels = cells_rgb.transpose(1, 0, 2)[::-1].repeat(s, axis=0).repeat(s, axis=1)
+        img[:panel_h * s, col0:col0 + pixels.shape[1]] = pixels
+
+    def _stamp(self, img, xs, ys, col0, panel_h, rgb, shape):
+        """Draws one sprite per (x, y) cell. rgb: one colour, or one per sprite."""
+        if len(xs) == 0:
+            return
+        s = self.scale
+        dr, dc = self.sprites[shape]
+        rows = ((panel_h - 1 - ys) * s)[:, None] + dr[None, :]
+        cols = (col0 + xs * s)[:, None] + dc[None, :]
+        colours = np.broadcast_to(rgb.reshape(-1, 1, 3), rows.shape + (3,))
+        img[rows.ravel(), cols.ravel()] = colours.reshape(-1, 3)
+
+    def render(self, world, bees=None):
+        """The frame for the world's current state. bees: Bee objects to draw instead (e.g. from a replay)."""
+        img = self.base.copy()
+        raster = beeworld.hive_raster(world['hive_data'], world['hive_layout']).astype(np.int64)
+        self._paint(img, self.hive_palette[np.clip(raster, 0, len(self.hive_palette) - 1)], 0, self.hive_h)
+        if len(self.flower_x):
+            dead = flower_columns(world)[1]
+            rgb = np.where(dead[:, None], np.array(DEAD_FLOWER_RGB, dtype=np.uint8), self.flower_rgb)
+            self._stamp(img, self.flower_x, self.flower_y, self.prop_col, self.prop_h, rgb, 'plus')
+        if bees is not None:
+            xs = np.array([b.get_pos()[0] for b in bees], dtype=np.int64).reshape(len(bees))
+            ys = np.array([b.get_pos()[1] for b in bees], dtype=np.int64).reshape(len(bees))
+            inhive = np.array([b.get_inhive() for b in bees], dtype=bool).reshape(len(bees))
+        else:
+            xs, ys, _, inhive, _ = bee_columns(world)
+            xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+        black = np.array([BEE_RGB], dtype=np.uint8)
+        self._stamp(img, xs[inhive], ys[inhive], 0, self.hive_h, black, 'disk')
+        self._stamp(img, xs[~inhive], ys[~inhive], self.prop_col, self.prop_h, black, 'disk')
+        return img
+
+def write_png(filename, rgb, level=1):
+    """Writes an RGB uint8 array as a PNG (zlib level 1: large-ish files, fast to write)."""
+    height, width, _ = rgb.shape
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8) # each row starts with filter type 0
+    raw[:, 1:] = rgb.reshape(height, width * 3)
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    with open(filename, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), level)))
+        f.write(chunk(b'IEND', b''))
+
+class FrameExporter():
+    """
+    Writes frames to a PNG sequence (path is a directory) or to a .gif / .mp4 file through an ffmpeg pipe.
+    """
+    def __init__(self, path, fps=10, ffmpeg='ffmpeg'):
+        self.path = path
+        self.fps = fps
+        self.ffmpeg = ffmpeg
+        self.video = os.path.splitext(path)[1].lower() in ('.gif', '.mp4')
+        self.process = None
+        self.frames = 0
+        if self.video:
+            if shutil.which(ffmpeg) is None:
+                raise RuntimeError(f"GIF/MP4 export needs '{ffmpeg}' on the PATH (or export a PNG sequence to a directory)")
+        else:
+            os.makedirs(path, exist_ok=True)
+
+    def _command(self, width, height):
+        command = [self.ffmpeg, '-loglevel', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+                   '-s', f'{width}x{height}', '-r', str(self.fps), '-i', '-']
+        if self.path.lower().endswith('.mp4'):
+            command += ['-pix_fmt', 'yuv420p']
+        return command + [self.path]
+
+    def write(self, rgb, t=None):
+        """Adds a frame. t: timestep, used for the PNG file name (default: frame count)."""
+        self.frames += 1
+        if not self.video:
+            write_png(os.path.join(self.path, f'frame_{(t + 1) if t is not None else self.frames:06d}.png'), rgb)
+            return
+        if self.process is None: # the frame size is known now
+            height, width, _ = rgb.shape
+            self.process = subprocess.Popen(self._command(width, height), stdin=subprocess.PIPE)
+        self.process.stdin.write(np.ascontiguousarray(rgb).tobytes())
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            if self.process.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed writing {self.path}")
+            self.process = None
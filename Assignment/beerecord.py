@@ -0,0 +1,216 @@
+#
+# beerecord.py - columnar trajectory recording of a run into memory-mapped files
+#
+# TrajectoryRecorder appends one row per timestep to preallocated memory-mapped columns (bee x / y, state code,
+# in-hive flag, nectar carried, flower nectar) plus the hive cells that changed in that step. The files grow in
+# chunks, so a step costs a handful of array writes whatever the number of bees. open_recording() maps the files
+# read-only, so long runs can be analysed without loading them into memory.
+#
+# Layout of a recording directory:
+#     meta.json           columns (dtype, row shape), number of steps, bee IDs, flower IDs
+#     hive_start.npy      hive_data before the first recorded step
+#     <column>.bin        raw column data, one row per timestep (hive_* columns: one row per changed cell)
+#
+
+import os
+import json
+import numpy as np
+
+from buzzness import BEE_STATES
+from beeswarm import STATE_CODE
+
+CHUNK_STEPS = 256 # timesteps added to the per-step columns each time they fill up
+CHUNK_CELLS = 4096 # rows added to the hive change columns each time they fill up
+
+class Column():
+    """
+    One memory-mapped column of fixed-shape rows that grows in chunks.
+    """
+    def __init__(self, filename, dtype, row_shape=(), chunk=CHUNK_STEPS):
+        self.filename = filename
+        self.dtype = np.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self.chunk = chunk
+        self.size = 0 # rows written
+        self.capacity = 0 # rows the file currently holds
+        self.data = None
+        open(filename, 'wb').close()
+
+    def _grow(self, rows):
+        self.capacity = max(self.capacity + self.chunk, rows)
+        row_bytes = self.dtype.itemsize * int(np.prod(self.row_shape, dtype=np.int64))
+        if self.data is not None:
+            self.data.flush()
+            self.data = None # release the old mapping before resizing the file
+        with open(self.filename, 'r+b') as f:
+            f.truncate(self.capacity * row_bytes)
+        if row_bytes:
+            self.data = np.memmap(self.filename, dtype=self.dtype, mode='r+', shape=(self.capacity,) + self.row_shape)
+
+    def append(self, values):
+        """Appends one row (append_rows for several)."""
+        self.append_rows(np.asarray(values, dtype=self.dtype).reshape((1,) + self.row_shape))
+
+    def append_rows(self, rows):
+        n = len(rows)
+        if self.size + n > self.capacity:
+            self._grow(self.size + n)
+        if n and self.data is not None:
+            self.data[self.size:self.size + n] = rows
+        self.size += n
+
+    def close(self):
+        if self.data is not None:
+            self.data.flush()
+            self.data = None
+        with open(self.filename, 'r+b') as f: # drop the unused part of the last chunk
+            f.truncate(self.size * self.dtype.itemsize * int(np.prod(self.row_shape, dtype=np.int64)))
+
+def bee_columns(world, bee_col=None):
+    """
+    (x, y, state code, in-hive flag, nectar) arrays of every bee, for either engine.
+    bee_col:   object engine only - bee ID -> column, so the columns keep one order although the bee list is shuffled
+    """
+    if 'swarm' in world:
+        s = world['swarm']
+        return s.x, s.y, s.state, s.inhive, s.nectar
+    bees = world['bees']
+    n = len(bees)
+    cols = (np.fromiter((b.pos[0] for b in bees), dtype=np.int32, count=n),
+            np.fromiter((b.pos[1] for b in bees), dtype=np.int32, count=n),
+            np.fromiter((STATE_CODE[b.state] for b in bees), dtype=np.int8, count=n),
+            np.fromiter((b.inhive for b in bees), dtype=np.bool_, count=n),
+            np.fromiter((b.nectarCarried for b in bees), dtype=np.int32, count=n))
+    if bee_col is None:
+        return cols
+    order = np.fromiter((bee_col[b.ID] for b in bees), dtype=np.int64, count=n)
+    unshuffled = []
+    for c in cols:
+        out = np.empty_like(c)
+        out[order] = c
+        unshuffled.append(out)
+    return unshuffled
+
+def flower_columns(world):
+    """(nectar, dead flag) arrays of every flower, for either engine."""
+    if 'swarm' in world:
+        return world['flower_arrays'].nectar, world['flower_arrays'].dead
+    flowers = world['flowers']
+    return (np.fromiter((f.currentNectar for f in flowers), dtype=np.int32, count=len(flowers)),
+            np.fromiter((f.state == 'DEAD' for f in flowers), dtype=np.bool_, count=len(flowers)))
+
+class TrajectoryRecorder():
+    """
+    Records every timestep of a world from beeworld.setup_world (either engine) into a directory.
+    Call record(world, t) after each step_world and close() at the end.
+    """
+    def __init__(self, directory, world, chunk_steps=CHUNK_STEPS):
+        """
+        directory:   where the column files are written (created if needed)
+        world:   the world that will be recorded (its bees, flowers and hive set the column shapes)
+        chunk_steps:   timesteps added to the files each time they fill up
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        if 'swarm' in world:
+            self.bee_ids = list(world['swarm'].ids)
+            self.bee_col = None
+        else:
+            self.bee_ids = [b.ID for b in world['bees']]
+            self.bee_col = {bid: i for i, bid in enumerate(self.bee_ids)} # the bee list is shuffled every step
+        self.flower_ids = [f.ID for f in world['flowers']]
+        n_bees, n_flowers = len(self.bee_ids), len(self.flower_ids)
+        self.hive = world['hive_data'].copy() # hive as of the last recorded step
+        np.save(os.path.join(directory, 'hive_start.npy'), self.hive)
+        self.columns = {}
+        for name, dtype, shape, chunk in (('timestep', np.int64, (), chunk_steps),
+                                          ('bee_x', np.int32, (n_bees,), chunk_steps),
+                                          ('bee_y', np.int32, (n_bees,), chunk_steps),
+                                          ('bee_state', np.int8, (n_bees,), chunk_steps),
+                                          ('bee_inhive', np.bool_, (n_bees,), chunk_steps),
+                                          ('bee_nectar', np.int32, (n_bees,), chunk_steps),
+                                          ('flower_nectar', np.int32, (n_flowers,), chunk_steps),
+                                          ('hive_offset', np.int64, (), chunk_steps), # first hive_* row of each step
+                                          ('hive_x', np.int32, (), CHUNK_CELLS),
+                                          ('hive_y', np.int32, (), CHUNK_CELLS),
+                                          ('hive_value', np.int32, (self.hive.shape[2],), CHUNK_CELLS)):
+            self.columns[name] = Column(os.path.join(directory, name + '.bin'), dtype, shape, chunk)
+
+    def record(self, world, t):
+        """Appends the state of the world after timestep t."""
+        c = self.columns
+        c['timestep'].append(t + 1)
+        for name, values in zip(('bee_x', 'bee_y', 'bee_state', 'bee_inhive', 'bee_nectar'), bee_columns(world, self.bee_col)):
+            c[name].append(values)
+        c['flower_nectar'].append(flower_columns(world)[0])
+        hive = world['hive_data']
+        cx, cy = np.nonzero((hive != self.hive).any(axis=2))
+        c['hive_offset'].append(c['hive_x'].size)
+        c['hive_x'].append_rows(cx)
+        c['hive_y'].append_rows(cy)
+        c['hive_value'].append_rows(hive[cx, cy])
+        self.hive[cx, cy] = hive[cx, cy]
+
+    def close(self):
+        for column in self.columns.values():
+            column.close()
+        meta = {'steps': self.columns['timestep'].size, 'bee_ids': [str(b) for b in self.bee_ids],
+                'flower_ids': [str(f) for f in self.flower_ids], 'states': list(BEE_STATES),
+                'columns': {name: {'dtype': col.dtype.str, 'row_shape': list(col.row_shape), 'rows': col.size}
+                            for name, col in self.columns.items()}}
+        with open(os.path.join(self.directory, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+class Recording():
+    """
+    Read-only view of a recording directory. Columns are memory maps: indexing reads only what is used,
+    e.g. rec.bee_x[:, 17] is the x track of the 18th bee (rec.bee_ids[17]).
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.steps = self.meta['steps']
+        self.bee_ids = self.meta['bee_ids']
+        self.flower_ids = self.meta['flower_ids']
+        self.states = self.meta['states']
+        self.hive_start_data = np.load(os.path.join(directory, 'hive_start.npy'))
+        self._columns = {}
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get('meta', {}).get('columns', {})
+        if name not in columns:
+            raise AttributeError(name)
+        if name not in self._columns:
+            info = columns[name]
+            shape = (info['rows'],) + tuple(info['row_shape'])
+            filename = os.path.join(self.directory, name + '.bin')
+            if info['rows'] == 0 or 0 in shape:
+                self._columns[name] = np.zeros(shape, dtype=info['dtype'])
+            else:
+                self._columns[name] = np.memmap(filename, dtype=info['dtype'], mode='r', shape=shape)
+        return self._columns[name]
+
+    def __len__(self):
+        return self.steps
+
+    def hive_changes(self, i):
+        """(x, y, values) of the hive cells changed in recorded step i."""
+        lo = self.hive_offset[i]
+        hi = self.hive_offset[i + 1] if i + 1 < self.steps else len(self.hive_x)
+        return self.hive_x[lo:hi], self.hive_y[lo:hi], self.hive_value[lo:hi]
+
+    def hive_at(self, i):
+        """hive_data after recorded step i (replays the hive changes up to it)."""
+        hive = self.hive_start_data.copy()
+        hi = self.hive_offset[i + 1] if i + 1 < self.steps else len(self.hive_x)
+        xs, ys = np.asarray(self.hive_x[:hi]), np.asarray(self.hive_y[:hi])
+        cell = (xs * hive.shape[1] + ys)[::-1]
+        _, last = np.unique(cell, return_index=True) # latest change of each cell
+        last = hi - 1 - last
+        hive[xs[last], ys[last]] = self.hive_value[last]
+        return hive
+
+def open_recording(directory):
+    """Opens a recording written by TrajectoryRecorder without loading it into memory."""
+    return Recording(directory)
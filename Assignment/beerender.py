@@ -0,0 +1,259 @@
+#
+# beerender.py - incremental rendering of the beeworld figure (artists made once, updated every frame)
+#
+# draw_frame clears all three panels and rebuilds every image, scatter, bar and label for each frame, so the
+# frame time grows with the map and the number of flowers. FrameRenderer builds the same panels once and then
+# only changes data: set_data on the hive image, set_offsets on the bee scatters, set_facecolors on the flower
+# markers, set_verts on the nectar bars (one PolyCollection) and set_text on the bar labels that changed.
+# In an interactive window it also blits: the static parts (axes, terrain, labels) are kept as a saved
+# background and only the changing artists are redrawn on top of it.
+#
+# For --render-thread the simulation runs in a worker thread and hands over Snapshots (read-only copies of
+# what a frame shows) through a SnapshotQueue; the GUI thread draws them. Policy 'latest' never holds the
+# simulation up and draws only the newest snapshot (stale frames are dropped), 'every' makes the simulation
+# wait when the queue is full so that every frame is drawn (back-pressure).
+#
+
+import threading
+from collections import deque, namedtuple
+import numpy as np
+
+import beeworld
+from beerecord import flower_columns
+
+LABEL_LIMIT = 60 # most flowers whose nectar bars get text labels / x ticks (plot_flowerNectar labels every bar)
+FLOWER_COLOURS = {'Red': 'red', 'Blue': 'blue', 'Yellow': 'yellow', 'Purple': 'purple', 'Pink': 'pink', 'White':'lightgray', 'Orange':'orange', 'Green':'green'}
+
+FRAME_POLICIES = ('latest', 'every')
+
+# What one frame shows, copied out of the world so the simulation can carry on while it is drawn
+Snapshot = namedtuple('Snapshot', 't simlength hive_data bee_x bee_y bee_inhive flower_nectar flower_dead')
+
+def take_snapshot(world, t, bees=None):
+    """Snapshot of the world after timestep t. bees: Bee objects to show instead of the world's (e.g. from a replay)."""
+    if bees is None:
+        bees = world['bees'] if 'swarm' not in world else None
+    if bees is not None:
+        xs = np.fromiter((b.get_pos()[0] for b in bees), dtype=np.int64, count=len(bees))
+        ys = np.fromiter((b.get_pos()[1] for b in bees), dtype=np.int64, count=len(bees))
+        inhive = np.fromiter((b.get_inhive() for b in bees), dtype=bool, count=len(bees))
+    else:
+        swarm = world['swarm'] # the swarm columns are changed in place, so copy them
+        xs, ys, inhive = swarm.x.copy(), swarm.y.copy(), swarm.inhive.copy()
+    nectar, dead = flower_columns(world)
+    snap = Snapshot(t, world['params']['simlength'], world['hive_data'].copy(), xs, ys, inhive, np.array(nectar), np.array(dead))
+    for values in snap[2:]:
+        values.flags.writeable = False
+    return snap
+
+class SnapshotQueue():
+    """
+    Bounded hand-over of Snapshots from the simulation thread (put) to the GUI thread (get).
+    """
+    def __init__(self, maxsize=2, policy='latest'):
+        """
+        maxsize:   snapshots waiting to be drawn at most
+        policy:   'latest' - put never waits (the oldest waiting snapshot is dropped when full) and get returns
+                  the newest snapshot, dropping older ones; 'every' - put waits while the queue is full and get
+                  returns snapshots in order
+        """
+        if policy not in FRAME_POLICIES:
+            raise ValueError(f"Unknown frame policy '{policy}' (choose from {', '.join(FRAME_POLICIES)})")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0 # snapshots never drawn
+
+    def put(self, snap):
+        with self.cond:
+            if self.policy == 'every':
+                while len(self.items) >= self.maxsize and not self.closed:
+                    self.cond.wait()
+            elif len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(snap)
+            self.cond.notify_all()
+
+    def get(self, timeout=None):
+        """Next snapshot to draw, or None if there is none within timeout seconds (or the queue is finished)."""
+        with self.cond:
+            if not self.items and not self.closed:
+                self.cond.wait(timeout)
+            if not self.items:
+                return None
+            if self.policy == 'latest':
+                self.dropped += len(self.items) - 1
+                snap = self.items.pop()
+                self.items.clear()
+            else:
+                snap = self.items.popleft()
+            self.cond.notify_all()
+            return snap
+
+    def close(self):
+        """No more snapshots will be put (wakes up a waiting get)."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def finished(self):
+        """True once the queue is closed and everything in it has been taken."""
+        with self.cond:
+            return self.closed and not self.items
+
+class FrameRenderer():
+    """
+    Draws a world into a figure from beeworld.create_figure, keeping the artists between frames.
+    """
+    def __init__(self, fig, axes_dict, world, blit=True):
+        """
+        fig, axes_dict:   figure and panels from beeworld.create_figure
+        world:   world to draw (sets the map, hive size and flowers; they must not change later)
+        blit:   redraw only the changing artists on screen (ignored by backends without blitting, e.g. Agg)
+        """
+        self.fig = fig
+        self.axes = axes_dict
+        self.blit = blit and getattr(fig.canvas, 'supports_blit', False)
+        self.background = None
+        self.last_nectar = None # flower nectar shown by the labels, to update only the ones that changed
+        self._build(world)
+        if self.blit:
+            for artist in self.artists:
+                artist.set_animated(True)
+            self.draw_cid = fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _build(self, world):
+        from matplotlib.colors import to_rgba_array
+        from matplotlib.collections import PolyCollection
+        sim_params = world['params']
+        hive_layout = world['hive_layout']
+        self.hive_layout = hive_layout
+        property_config = world['property_config']
+        flowers = world['flowers']
+        for ax in self.axes.values():
+            ax.clear()
+        self.title = self.fig.suptitle("Bee World", fontsize=16, fontweight='bold')
+        # Hive panel
+        ax = self.axes['hive']
+        cmap, norm = beeworld.hive_colormap(hive_layout.get('max_nectar_per_cell', 4))
+        self.hive_image = ax.imshow(beeworld.hive_raster(world['hive_data'], hive_layout).T, origin="lower", cmap=cmap, norm=norm)
+        self.hive_bees = ax.scatter(np.zeros(0), np.zeros(0), c='black', marker='h', s=40, label='Bees')
+        ax.set_title('Bee Hive')
+        ax.set_xlabel("X position")
+        ax.set_ylabel("Y position")
+        ax.set_xlim(-0.5, hive_layout['max_x'] - 0.5)
+        ax.set_ylim(-0.5, hive_layout['max_y'] - 0.5)
+        ax.legend(loc='upper right', fontsize='small')
+        # Property panel: the terrain and the flower positions never change, only the flower colours (DEAD = grey)
+        ax = self.axes['property']
+        ax.imshow(world['property_map'].T, origin="lower", cmap='tab20', vmin=0, vmax=19)
+        self.flower_rgba = to_rgba_array([FLOWER_COLOURS.get(f.colour, 'magenta') for f in flowers]) if flowers else np.zeros((0, 4))
+        self.dead_rgba = to_rgba_array(['grey'])[0]
+        self.alive_bar_rgba, self.dead_bar_rgba = to_rgba_array(['mediumseagreen', 'lightcoral'])
+        self.flower_markers = None
+        if flowers:
+            self.flower_markers = ax.scatter([f.get_pos()[0] for f in flowers], [f.get_pos()[1] for f in flowers],
+                                             c=self.flower_rgba, marker='P', s=80, label='Flowers', edgecolors='black', alpha=0.7)
+        hive_pos_prop = property_config['hive_position_on_property']
+        ax.scatter(hive_pos_prop[0], hive_pos_prop[1], c='gold', marker='H', s=150, edgecolors='black', label='Hive Entrance')
+        self.property_bees = ax.scatter(np.zeros(0), np.zeros(0), c='black', marker='h', s=50, label='Bees')
+        ax.set_title('Property')
+        ax.set_xlabel("X position")
+        ax.set_ylabel("Y position")
+        ax.set_xlim(-0.5, property_config['max_x'] - 0.5)
+        ax.set_ylim(-0.5, property_config['max_y'] - 0.5)
+        ax.legend(loc='upper right', fontsize='small')
+        # Nectar panel: all bars are one PolyCollection (one draw call however many flowers); labels only up to
+        # LABEL_LIMIT flowers (thousands of labels are unreadable and each one is a separate draw)
+        ax = self.axes['nectar']
+        self.bars, self.bar_labels = None, []
+        ax.set_title('Flower Nectar Levels')
+        if not flowers:
+            ax.text(0.5, 0.5, "No flowers defined", ha='center', va='center', transform=ax.transAxes)
+            ax.set_xticks([])
+            ax.set_yticks([])
+        else:
+            n = len(flowers)
+            capacities = [f.nectarCapacity for f in flowers if f.nectarCapacity is not None]
+            max_cap = max(capacities) if capacities else sim_params.get('flower_nectar_capacity_default', 5)
+            if max_cap == 0: max_cap = 1
+            self.capacities = [f.nectarCapacity for f in flowers]
+            self.bar_verts = np.zeros((n, 4, 2)) # rectangle corners of every bar; the top two follow the nectar level
+            self.bar_verts[:, :, 0] = np.arange(n)[:, None] + np.array([-0.4, -0.4, 0.4, 0.4])
+            self.bars = PolyCollection(self.bar_verts, facecolors='mediumseagreen')
+            ax.add_collection(self.bars)
+            self.text_offset = 0.05 * (max_cap + 1)
+            if n <= LABEL_LIMIT:
+                for i in range(n):
+                    self.bar_labels.append(ax.text(i, self.text_offset, f'0/{self.capacities[i]}', ha='center', va='bottom', fontsize=7))
+                ax.set_xticks(range(n))
+                ax.set_xticklabels([f"{f.ID}\n({f.name})" for f in flowers])
+            ax.set_xlim(-0.6 - 0.02 * n, n - 0.4 + 0.02 * n) # same margins as ax.bar
+            ax.set_ylabel('Nectar Units')
+            ax.set_ylim(0, max_cap + 1)
+            ax.tick_params(axis='x', labelrotation=30, labelsize=8)
+            ax.grid(axis='y', linestyle='--', alpha=0.7)
+        self.fig.tight_layout(rect=[0, 0, 1, 0.96]) # layout is fixed from here on
+        self.artists = [self.title, self.hive_image, self.hive_bees, self.property_bees] + self.bar_labels
+        if self.bars is not None:
+            self.artists += [self.bars, self.flower_markers]
+
+    def _on_draw(self, event):
+        """A full redraw (first show, resize): save the new background and put the changing artists back on it."""
+        if event is not None and event.canvas is not self.fig.canvas:
+            return
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.artists:
+            self.fig.draw_artist(artist)
+
+    def update(self, world, t, bees=None):
+        """
+        Shows the world after timestep t. bees: Bee objects to show instead of the world's (e.g. from a replay).
+        With blitting the window is refreshed here; otherwise call fig.canvas.draw() or fig.savefig() afterwards.
+        """
+        self.show(take_snapshot(world, t, bees))
+
+    def show(self, snap):
+        """Shows a Snapshot (see take_snapshot), e.g. one handed over by the simulation thread."""
+        self.title.set_text(f"Bee World - Timestep: {snap.t+1}/{snap.simlength}")
+        self.hive_image.set_data(beeworld.hive_raster(snap.hive_data, self.hive_layout).T)
+        xs, ys, inhive = snap.bee_x, snap.bee_y, snap.bee_inhive
+        self.hive_bees.set_offsets(np.column_stack([xs[inhive], ys[inhive]]))
+        self.property_bees.set_offsets(np.column_stack([xs[~inhive], ys[~inhive]]))
+        if self.bars is not None:
+            nectar, dead = snap.flower_nectar, snap.flower_dead
+            self.flower_markers.set_facecolors(np.where(dead[:, None], self.dead_rgba, self.flower_rgba))
+            self.bar_verts[:, 1:3, 1] = nectar[:, None]
+            self.bars.set_verts(self.bar_verts)
+            self.bars.set_facecolors(np.where(dead[:, None], self.dead_bar_rgba, self.alive_bar_rgba))
+            if self.last_nectar is None:
+                changed = range(len(self.bar_labels))
+            else:
+                changed = np.nonzero(nectar != self.last_nectar)[0].tolist() if self.bar_labels else []
+            for i in changed:
+                level = int(nectar[i])
+                self.bar_labels[i].set_y(level + self.text_offset)
+                self.bar_labels[i].set_text(f'{level}/{self.capacities[i]}')
+            self.last_nectar = np.array(nectar)
+        if self.blit:
+            canvas = self.fig.canvas
+            if self.background is None:
+                canvas.draw() # first frame: full draw, _on_draw saves the background
+            else:
+                canvas.restore_region(self.background)
+                for artist in self.artists:
+                    self.fig.draw_artist(artist)
+            canvas.blit(self.fig.bbox)
+            canvas.flush_events()
+
+    def stop_blitting(self):
+        """Turns the changing artists back into normal ones, so savefig() and plt.show() include them."""
+        if not self.blit:
+            return
+        self.fig.canvas.mpl_disconnect(self.draw_cid)
+        for artist in self.artists:
+            artist.set_animated(False)
+        self.blit = False
@@ -0,0 +1,329 @@
+#
+# beereplay.py - keyframe + delta replays of a run, and a tool to render any range of steps from them
+#
+# A replay stores the full state (bees, flowers, hive) every keyframe_every steps and, for every step, only
+# what changed: bees that moved or changed state/nectar, flowers whose nectar or DEAD state changed and hive
+# cells that changed. The per-step offsets into the change columns form the index, so frame 40000 is found by
+# loading the keyframe at or before it and applying the few steps of changes after it. All columns are
+# memory-mapped files (beerecord.Column), so a replay of a long run is never read into memory as a whole.
+#
+# Frame i is the state after i timesteps (frame 0 = the world before the first step).
+#
+# Frames can be rendered across a process pool (-j): each worker renders whole runs of frames and the PNGs are
+# returned in frame order, ready to be joined into a video (--video, through ffmpeg).
+#
+# Usage:  python beeworld.py --headless --replay run_replay --keyframe-every 500
+#         python beereplay.py run_replay --start 40000 --end 40100 --every 5 -o frames
+#         python beereplay.py run_replay -j 8 --video run.mp4 --fps 30
+#
+
+import os
+import json
+import shutil
+import argparse
+import contextlib
+import subprocess
+import multiprocessing
+import numpy as np
+
+import beeworld
+from buzzness import Flower, Bee, BEE_STATES
+from beerecord import Column, bee_columns, flower_columns, CHUNK_STEPS, CHUNK_CELLS
+import beerender
+
+KEYFRAME_EVERY = 1000
+BEE_FIELDS = ('x', 'y', 'state', 'inhive', 'nectar')
+BEE_DTYPES = (np.int32, np.int32, np.int8, np.bool_, np.int32)
+
+def _latest(keys):
+    """Indices of the last occurrence of every distinct key (changes applied in order: the last one wins)."""
+    _, first_from_end = np.unique(keys[::-1], return_index=True)
+    return len(keys) - 1 - first_from_end
+
+class ReplayWriter():
+    """
+    Writes a replay of a world from beeworld.setup_world (either engine).
+    Call write(world) after each step_world and close() at the end.
+    """
+    def __init__(self, directory, world, keyframe_every=KEYFRAME_EVERY, start_frame=0):
+        """
+        directory:   where the replay files go (created if needed)
+        world:   the world to replay, before its first recorded step (written as frame start_frame)
+        keyframe_every:   frames between full keyframes (smaller = faster seeking, bigger files)
+        start_frame:   frame number of the world as given (e.g. the timestep a resumed run starts at)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.keyframe_every = keyframe_every
+        self.start_frame = start_frame
+        if 'swarm' in world:
+            bee_ids, self.bee_col = list(world['swarm'].ids), None
+        else:
+            bee_ids = [b.ID for b in world['bees']]
+            self.bee_col = {bid: i for i, bid in enumerate(bee_ids)}
+        n_bees, n_flowers = len(bee_ids), len(world['flowers'])
+        hive_shape = world['hive_data'].shape
+        self.frame = start_frame - 1
+        self.bees = None # state of the previous frame, to find what changed
+        self.flowers = None
+        self.hive = None
+        self.columns = {}
+        def add(name, dtype, shape=(), chunk=CHUNK_STEPS):
+            self.columns[name] = Column(os.path.join(directory, name + '.bin'), dtype, shape, chunk)
+        add('keyframe_frame', np.int64)
+        for field, dtype in zip(BEE_FIELDS, BEE_DTYPES):
+            add('key_bee_' + field, dtype, (n_bees,), 16)
+            add('bee_' + field, dtype, (), CHUNK_CELLS)
+        add('key_flower_nectar', np.int32, (n_flowers,), 16)
+        add('key_flower_dead', np.bool_, (n_flowers,), 16)
+        add('key_hive', np.int32, hive_shape, 16)
+        add('bee_offset', np.int64) # index: first change row of each frame, per change column group
+        add('flower_offset', np.int64)
+        add('hive_offset', np.int64)
+        add('bee_index', np.int32, (), CHUNK_CELLS)
+        add('flower_index', np.int32, (), CHUNK_CELLS)
+        add('flower_nectar', np.int32, (), CHUNK_CELLS)
+        add('flower_dead', np.bool_, (), CHUNK_CELLS)
+        add('hive_x', np.int32, (), CHUNK_CELLS)
+        add('hive_y', np.int32, (), CHUNK_CELLS)
+        add('hive_value', np.int32, (hive_shape[2],), CHUNK_CELLS)
+        f0 = world['flowers']
+        header = {'start_frame': start_frame, 'keyframe_every': keyframe_every, 'bee_ids': [str(b) for b in bee_ids],
+                  'states': list(BEE_STATES), 'params': world['params'], 'property_config': world['property_config'],
+                  'hive_layout': {k: v for k, v in world['hive_layout'].items() if k != 'comb_index'},
+                  'flowers': [(str(f.ID), f.pos, f.name, f.colour, f.nectarCapacity, f.deadDuration) for f in f0],
+                  'hive_entrance_pos': world['property_config']['hive_position_on_property']}
+        with open(os.path.join(directory, 'header.json'), 'w') as f:
+            json.dump(header, f, default=lambda v: v.item() if isinstance(v, np.generic) else str(v))
+        np.save(os.path.join(directory, 'property_map.npy'), world['property_map'])
+        self.write(world)
+
+    def write(self, world):
+        """Adds the current state of the world as the next frame."""
+        self.frame += 1
+        c = self.columns
+        bees = [np.array(col) for col in bee_columns(world, self.bee_col)]
+        flowers = [np.array(col) for col in flower_columns(world)]
+        hive = world['hive_data'].copy()
+        c['bee_offset'].append(c['bee_index'].size)
+        c['flower_offset'].append(c['flower_index'].size)
+        c['hive_offset'].append(c['hive_x'].size)
+        if self.bees is not None:
+            moved = np.nonzero(np.logical_or.reduce([new != old for new, old in zip(bees, self.bees)]))[0]
+            c['bee_index'].append_rows(moved)
+            for field, values in zip(BEE_FIELDS, bees):
+                c['bee_' + field].append_rows(values[moved])
+            changed = np.nonzero(np.logical_or.reduce([new != old for new, old in zip(flowers, self.flowers)]))[0]
+            c['flower_index'].append_rows(changed)
+            c['flower_nectar'].append_rows(flowers[0][changed])
+            c['flower_dead'].append_rows(flowers[1][changed])
+            cx, cy = np.nonzero((hive != self.hive).any(axis=2))
+            c['hive_x'].append_rows(cx)
+            c['hive_y'].append_rows(cy)
+            c['hive_value'].append_rows(hive[cx, cy])
+        if (self.frame - self.start_frame) % self.keyframe_every == 0:
+            c['keyframe_frame'].append(self.frame)
+            for field, values in zip(BEE_FIELDS, bees):
+                c['key_bee_' + field].append(values)
+            c['key_flower_nectar'].append(flowers[0])
+            c['key_flower_dead'].append(flowers[1])
+            c['key_hive'].append(hive)
+        self.bees, self.flowers, self.hive = bees, flowers, hive
+
+    def close(self):
+        for column in self.columns.values():
+            column.close()
+        index = {'frames': self.frame - self.start_frame + 1,
+                 'columns': {name: {'dtype': col.dtype.str, 'row_shape': list(col.row_shape), 'rows': col.size}
+                             for name, col in self.columns.items()}}
+        with open(os.path.join(self.directory, 'index.json'), 'w') as f:
+            json.dump(index, f)
+
+class Replay():
+    """
+    Read-only, seekable view of a replay directory: state(frame) rebuilds any frame from its keyframe.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'header.json')) as f:
+            self.header = json.load(f)
+        with open(os.path.join(directory, 'index.json')) as f:
+            self.index = json.load(f)
+        self.start_frame = self.header['start_frame']
+        self.frames = self.index['frames']
+        self.property_map = np.load(os.path.join(directory, 'property_map.npy'))
+        self.c = {}
+        for name, info in self.index['columns'].items():
+            shape = (info['rows'],) + tuple(info['row_shape'])
+            if info['rows'] == 0 or 0 in shape:
+                self.c[name] = np.zeros(shape, dtype=info['dtype'])
+            else:
+                self.c[name] = np.memmap(os.path.join(directory, name + '.bin'), dtype=info['dtype'], mode='r', shape=shape)
+
+    def __len__(self):
+        return self.frames
+
+    @property
+    def first_frame(self):
+        return self.start_frame
+
+    @property
+    def last_frame(self):
+        return self.start_frame + self.frames - 1
+
+    def _rows(self, group, lo_frame, hi_frame):
+        """Change rows of frames lo_frame..hi_frame (both included) for one group ('bee', 'flower', 'hive')."""
+        offsets = self.c[group + '_offset']
+        lo = offsets[lo_frame - self.start_frame]
+        end = hi_frame - self.start_frame + 1
+        hi = offsets[end] if end < len(offsets) else len(self.c[group + ('_x' if group == 'hive' else '_index')])
+        return slice(int(lo), int(hi))
+
+    def state(self, frame):
+        """
+        Arrays for one frame: 'bee_x', 'bee_y', 'bee_state', 'bee_inhive', 'bee_nectar' (one value per bee, in
+        header bee_ids order), 'flower_nectar', 'flower_dead' and 'hive' (hive_data).
+        """
+        if not self.first_frame <= frame <= self.last_frame:
+            raise IndexError(f"Frame {frame} is not in this replay ({self.first_frame}-{self.last_frame})")
+        c = self.c
+        k = int(np.searchsorted(c['keyframe_frame'], frame, side='right')) - 1
+        key_frame = int(c['keyframe_frame'][k])
+        state = {'frame': frame}
+        for field in BEE_FIELDS:
+            state['bee_' + field] = np.array(c['key_bee_' + field][k])
+        state['flower_nectar'] = np.array(c['key_flower_nectar'][k])
+        state['flower_dead'] = np.array(c['key_flower_dead'][k])
+        state['hive'] = np.array(c['key_hive'][k])
+        if frame == key_frame:
+            return state
+        rows = self._rows('bee', key_frame + 1, frame)
+        idx = np.asarray(c['bee_index'][rows])
+        last = _latest(idx)
+        for field in BEE_FIELDS:
+            state['bee_' + field][idx[last]] = np.asarray(c['bee_' + field][rows])[last]
+        rows = self._rows('flower', key_frame + 1, frame)
+        idx = np.asarray(c['flower_index'][rows])
+        last = _latest(idx)
+        state['flower_nectar'][idx[last]] = np.asarray(c['flower_nectar'][rows])[last]
+        state['flower_dead'][idx[last]] = np.asarray(c['flower_dead'][rows])[last]
+        rows = self._rows('hive', key_frame + 1, frame)
+        xs, ys = np.asarray(c['hive_x'][rows]), np.asarray(c['hive_y'][rows])
+        last = _latest(xs * state['hive'].shape[1] + ys)
+        state['hive'][xs[last], ys[last]] = np.asarray(c['hive_value'][rows])[last]
+        return state
+
+    def world(self, frame):
+        """
+        (world, bees) for beeworld.draw_frame: a dictionary with the plotted parts of a world and Bee objects.
+        """
+        state = self.state(frame)
+        h = self.header
+        flowers = []
+        for i, (fid, pos, name, colour, capacity, dead_duration) in enumerate(h['flowers']):
+            f = Flower(fid, tuple(pos), name, colour, capacity, dead_duration)
+            f.currentNectar = int(state['flower_nectar'][i])
+            f.state = 'DEAD' if state['flower_dead'][i] else 'ALIVE'
+            flowers.append(f)
+        entrance = tuple(h['hive_entrance_pos'])
+        bees = []
+        for i, bid in enumerate(h['bee_ids']):
+            b = Bee(bid, (int(state['bee_x'][i]), int(state['bee_y'][i])), entrance)
+            b.state = h['states'][state['bee_state'][i]]
+            b.inhive = bool(state['bee_inhive'][i])
+            b.nectarCarried = int(state['bee_nectar'][i])
+            bees.append(b)
+        property_config = dict(h['property_config'])
+        property_config['hive_position_on_property'] = entrance
+        world = {'params': h['params'], 'hive_data': state['hive'], 'hive_layout': h['hive_layout'],
+                 'property_map': self.property_map, 'flowers': flowers, 'property_config': property_config}
+        return world, bees
+
+def render(replay, frames, out_dir='replay_frames'):
+    """Saves the given frames as PNGs with the beeworld figure (hive, property and nectar panels)."""
+    os.makedirs(out_dir, exist_ok=True)
+    plt = beeworld.load_pyplot(headless=True)
+    fig, axes = beeworld.create_figure(plt)
+    renderer = None
+    saved = []
+    for frame in frames:
+        world, bees = replay.world(frame)
+        if renderer is None: # flowers, map and layout are the same in every frame
+            renderer = beerender.FrameRenderer(fig, axes, world, blit=False)
+        renderer.update(world, frame - 1, bees)
+        filename = os.path.join(out_dir, f'frame_{frame:06d}.png')
+        fig.savefig(filename)
+        saved.append(filename)
+    plt.close(fig)
+    return saved
+
+def _render_chunk(task):
+    directory, frames, out_dir = task
+    return render(Replay(directory), frames, out_dir)
+
+def render_parallel(directory, frames, out_dir='replay_frames', workers=None):
+    """
+    Renders frames of a replay across a process pool. Each worker opens the replay itself and renders
+    contiguous runs of frames (one seek per run). Returns the PNG file names in frame order.
+    workers:   number of processes (default: all cores; 1 = render in this process)
+    """
+    frames = list(frames)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(frames) < 2:
+        return render(Replay(directory), frames, out_dir)
+    n_chunks = min(len(frames), workers * 4) # a few chunks per worker, so a slow chunk doesn't hold up the rest
+    tasks = [(directory, chunk.tolist(), out_dir) for chunk in np.array_split(np.array(frames), n_chunks)]
+    saved = []
+    with multiprocessing.Pool(workers) as pool:
+        for files in pool.imap(_render_chunk, tasks): # imap keeps the chunk order
+            saved.extend(files)
+    return saved
+
+def stitch_video(files, path, fps=10, ffmpeg='ffmpeg'):
+    """Joins PNG frames, in the given order, into a .gif / .mp4 by piping them to ffmpeg."""
+    if shutil.which(ffmpeg) is None:
+        raise RuntimeError(f"Stitching a video needs '{ffmpeg}' on the PATH")
+    command = [ffmpeg, '-loglevel', 'error', '-y', '-f', 'image2pipe', '-framerate', str(fps), '-i', '-']
+    if path.lower().endswith('.mp4'):
+        command += ['-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+    process = subprocess.Popen(command + [path], stdin=subprocess.PIPE)
+    try:
+        for filename in files:
+            with open(filename, 'rb') as f:
+                process.stdin.write(f.read())
+        process.stdin.close()
+    except BrokenPipeError: # ffmpeg exited before reading all the frames
+        with contextlib.suppress(BrokenPipeError):
+            process.stdin.close() # flushing what is left in the buffer fails the same way
+        process.wait()
+        raise RuntimeError(f"ffmpeg failed writing {path} (it stopped reading the frames)")
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg failed writing {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Render frames of a beeworld replay without re-running the simulation")
+    parser.add_argument("replay", type=str, help="Replay directory (beeworld.py --replay DIR)")
+    parser.add_argument("--start", type=int, default=None, help="First frame (timesteps done; default: first in the replay)")
+    parser.add_argument("--end", type=int, default=None, help="Last frame, included (default: last in the replay)")
+    parser.add_argument("--every", type=int, default=1, help="Render every Nth frame")
+    parser.add_argument("-o", "--outdir", type=str, default="replay_frames", help="Directory for the PNG frames")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="Render in this many processes (0 = all cores)")
+    parser.add_argument("--video", type=str, default=None, help="Also join the frames into this .gif / .mp4 (needs ffmpeg)")
+    parser.add_argument("--fps", type=int, default=10, help="Frames per second of --video")
+    args = parser.parse_args()
+    replay = Replay(args.replay)
+    start = replay.first_frame if args.start is None else args.start
+    end = replay.last_frame if args.end is None else args.end
+    if not replay.first_frame <= start <= end <= replay.last_frame:
+        parser.error(f"--start/--end must satisfy {replay.first_frame} <= start <= end <= {replay.last_frame} for this replay")
+    saved = render_parallel(args.replay, range(start, end + 1, args.every), args.outdir, args.workers or None)
+    print(f"Saved {len(saved)} frames to {args.outdir}")
+    if args.video:
+        try:
+            stitch_video(saved, args.video, args.fps)
+            print(f"Saved video to {args.video}")
+        except RuntimeError as e:
+            print(f"Error: {e}")
+
+if __name__ == "__main__":
+    main()
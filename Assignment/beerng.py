@@ -0,0 +1,95 @@
+#
+# beerng.py - seedable random streams for the bee simulation
+#
+# One SimRNG per run, built on numpy.random.SeedSequence, replaces the global random module. Child streams
+# (one per bee, one per replica in a parallel ensemble) are spawned from it, so they are independent of each
+# other and a whole run is reproduced from a single seed. Scalar draws come from a small pre-drawn buffer,
+# so shuffling a list of 8 moves does not cost one NumPy call per number.
+#
+
+import numpy as np
+
+BUFFER_SIZE = 256 # floats drawn at once for the scalar helpers
+DEFAULT_SEED = 0 # seed of the stream handed to plot-only objects
+
+class SimRNG():
+    """
+    Random stream with the random-module helpers the simulation uses (random, randrange, randint, choice, shuffle)
+    plus the underlying numpy Generator for batched draws (e.g. BeeSwarm).
+    """
+    def __init__(self, seed=None, buffer_size=BUFFER_SIZE):
+        """
+        seed:   int, numpy SeedSequence, or None for fresh OS entropy (see .entropy to repeat the run)
+        buffer_size:   how many floats to pre-draw for scalar draws
+        """
+        self.seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.generator = np.random.Generator(np.random.PCG64(self.seed_seq))
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.next = 0
+
+    @property
+    def entropy(self):
+        """Seed to pass back in to get the same run (for child streams, the root seed)."""
+        return self.seed_seq.entropy
+
+    def spawn(self, n):
+        """n independent child streams (for bees, or replicas run in other processes)."""
+        return [SimRNG(child, self.buffer_size) for child in self.seed_seq.spawn(n)]
+
+    def get_state(self):
+        """Everything needed to continue this stream exactly (for checkpoints)."""
+        seq = self.seed_seq
+        return {'entropy': seq.entropy, 'spawn_key': tuple(seq.spawn_key), 'pool_size': seq.pool_size,
+                'n_children_spawned': seq.n_children_spawned, 'bit_generator': self.generator.bit_generator.state,
+                'buffer': self.buffer[self.next:]}
+
+    @classmethod
+    def from_state(cls, state, buffer_size=BUFFER_SIZE):
+        """Rebuilds a stream saved with get_state()."""
+        seq = np.random.SeedSequence(state['entropy'], spawn_key=state['spawn_key'], pool_size=state['pool_size'],
+                                     n_children_spawned=state['n_children_spawned'])
+        rng = cls(seq, buffer_size)
+        rng.generator.bit_generator.state = state['bit_generator']
+        rng.buffer = list(state['buffer'])
+        return rng
+
+    def random(self, size=None):
+        """Float in [0, 1); with size, an array from the Generator."""
+        if size is not None:
+            return self.generator.random(size)
+        if self.next >= len(self.buffer):
+            self.buffer = self.generator.random(self.buffer_size).tolist()
+            self.next = 0
+        value = self.buffer[self.next]
+        self.next += 1
+        return value
+
+    def randrange(self, n):
+        """Integer in [0, n)."""
+        return min(int(self.random() * n), n - 1)
+
+    def randint(self, a, b):
+        """Integer in [a, b], both ends included (like random.randint)."""
+        return a + self.randrange(b - a + 1)
+
+    def choice(self, seq):
+        return seq[self.randrange(len(seq))]
+
+    def shuffle(self, items):
+        """Shuffles a list in place (Fisher-Yates, like random.shuffle)."""
+        for i in range(len(items) - 1, 0, -1):
+            j = self.randrange(i + 1)
+            items[i], items[j] = items[j], items[i]
+
+_default = None
+
+def default_rng():
+    """
+    Shared fixed-seed stream for Bee objects rebuilt only for plotting (beereplay, BeeSwarm.to_bees).
+    The simulation itself never draws from it: every step takes the run's SimRNG explicitly.
+    """
+    global _default
+    if _default is None:
+        _default = SimRNG(DEFAULT_SEED)
+    return _default
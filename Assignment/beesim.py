@@ -0,0 +1,182 @@
+#
+# beesim.py - the simulation as an object that other programs can drive (no plotting, no files)
+#
+# run_simulation does everything at once: it builds the world, runs every timestep and draws or saves the
+# frames. Simulation only holds the world: step() runs one timestep, run(n) runs several and iterate() is a
+# generator of Snapshots, so a caller can stream states into its own code, stop whenever it likes or step
+# several simulations in turn in one process. matplotlib is never imported. The per-bee log messages are
+# switched off while stepping (log_level='off'), otherwise the shared beelog.LOG prints several lines per
+# timestep to stdout; pass log_level='debug' or None (leave LOG as configured) to see them.
+#
+# A Snapshot is lazy: taking one costs nothing, and the bee / flower / hive arrays are only copied when
+# they are first read. Fields read before the next step stay valid for good; reading a new field after the
+# simulation has moved on raises a RuntimeError, so call snap.freeze() on snapshots you want to keep.
+#
+# Usage:
+#     sim = Simulation.from_files('para1.csv', 'map1.csv', seed=1)
+#     for snap in sim.iterate(every=10):
+#         print(snap.step, snap.metrics['total_hive_nectar'])
+#         if not snap.bee_inhive.any(): break
+#
+
+import io
+import copy
+import contextlib
+import numpy as np
+
+import beeworld
+import beecheckpoint
+from beelog import LOG
+from beerng import SimRNG
+from beerecord import bee_columns, flower_columns
+
+SNAPSHOT_FIELDS = ('bee_x', 'bee_y', 'bee_state', 'bee_inhive', 'bee_nectar', 'flower_nectar', 'flower_dead', 'hive', 'metrics')
+
+class Snapshot():
+    """
+    State of a Simulation after one timestep. Fields are worked out on first use:
+    bee_x, bee_y, bee_state (beeswarm.STATE_CODE values), bee_inhive, bee_nectar:   one entry per bee, in bee_ids order
+    flower_nectar, flower_dead:   one entry per flower, in the world's flower order
+    hive:   copy of hive_data (x, y, [comb built, nectar])
+    metrics:   beeworld.collect_metrics dictionary
+    """
+    def __init__(self, sim):
+        self._sim = sim
+        self.t = sim.t - 1 # timestep index that was just run
+        self.step = sim.t # number of timesteps run so far
+        self.bee_ids = sim.bee_ids
+        self._data = {}
+
+    def __getattr__(self, name):
+        if name not in SNAPSHOT_FIELDS:
+            raise AttributeError(name)
+        data = self.__dict__['_data']
+        if name not in data:
+            self._fill(name)
+        return data[name]
+
+    def _fill(self, name):
+        if self._sim is None or self._sim.t != self.step:
+            raise RuntimeError(f"Snapshot of step {self.step} read after the simulation moved on (freeze() it to keep it)")
+        world = self._sim.world
+        if name.startswith('bee_'):
+            cols = bee_columns(world, self._sim.bee_col)
+            for field, values in zip(SNAPSHOT_FIELDS[:5], cols):
+                self._data[field] = np.array(values) # the swarm columns are changed in place
+        elif name.startswith('flower_'):
+            nectar, dead = flower_columns(world)
+            self._data['flower_nectar'], self._data['flower_dead'] = np.array(nectar), np.array(dead)
+        elif name == 'hive':
+            self._data['hive'] = world['hive_data'].copy()
+        else:
+            self._data['metrics'] = beeworld.collect_metrics(world, self.t)
+
+    def freeze(self):
+        """Reads every field now, so the snapshot no longer depends on the simulation."""
+        for name in SNAPSHOT_FIELDS:
+            if name not in self._data:
+                self._fill(name)
+        return self
+
+class Simulation():
+    """
+    One bee world that can be stepped from Python.
+    """
+    def __init__(self, sim_params, property_map, flowers, property_config, seed=None, rng=None, log_level='off'):
+        """
+        sim_params, property_map, flowers, property_config:   as returned by beeworld.loadParameters and loadMap
+                    (copied, so one loaded scenario can start any number of simulations)
+        seed:   seed for the run (default: sim_params['seed'], fresh entropy if there is none)
+        rng:   SimRNG to use instead of seed
+        log_level:   beelog level used while stepping (None = leave beelog.LOG as it is)
+        """
+        sim_params = dict(sim_params)
+        if seed is not None:
+            sim_params['seed'] = seed
+        if rng is None:
+            rng = SimRNG(sim_params.get('seed'))
+        world = beeworld.setup_world(sim_params, property_map.copy(), copy.deepcopy(flowers), property_config, rng)
+        self._attach(world, 0, log_level)
+
+    def _attach(self, world, t, log_level):
+        self.world = world
+        self.log_level = log_level
+        self.t = t # next timestep to run
+        if 'swarm' in world:
+            self.bee_ids = list(world['swarm'].ids)
+            self.bee_col = None
+        else:
+            self.bee_ids = [b.ID for b in world['bees']]
+            self.bee_col = {bid: i for i, bid in enumerate(self.bee_ids)} # the bee list is shuffled every step
+
+    @classmethod
+    def from_files(cls, paramfile, mapfile, seed=None, overrides=None, quiet=True, log_level='off'):
+        """
+        Loads a scenario like beeworld.py -p paramfile -f mapfile.
+        overrides:   parameter values to change after loading, e.g. {'engine': 'swarm', 'simlength': 2000}
+        quiet:   hide the messages printed while loading
+        log_level:   beelog level used while stepping (see __init__)
+        """
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            sim_params = beeworld.loadParameters(paramfile)
+            sim_params.update(overrides or {})
+            property_map, flowers, property_config = beeworld.loadMap(mapfile, sim_params)
+        return cls(sim_params, property_map, flowers, property_config, seed, log_level=log_level)
+
+    @classmethod
+    def from_checkpoint(cls, filename, log_level='off'):
+        """Continues a run saved by beecheckpoint.save_checkpoint (or Simulation.save)."""
+        world, next_t, _ = beecheckpoint.load_checkpoint(filename)
+        sim = cls.__new__(cls)
+        sim._attach(world, next_t, log_level)
+        return sim
+
+    def save(self, filename):
+        """Saves a checkpoint that from_checkpoint (or beeworld.py --resume) can continue."""
+        beecheckpoint.save_checkpoint(self.world, self.t, filename)
+
+    @property
+    def simlength(self):
+        return self.world['params']['simlength']
+
+    @property
+    def finished(self):
+        """True once simlength timesteps have been run (step() can still go on past it)."""
+        return self.t >= self.simlength
+
+    def step(self):
+        """Runs one timestep and returns its Snapshot."""
+        old_level = LOG.level
+        if self.log_level is not None:
+            LOG.configure(level=self.log_level)
+        try:
+            beeworld.step_world(self.world, self.t)
+        finally:
+            LOG.configure(level=old_level)
+        self.t += 1
+        return Snapshot(self)
+
+    def snapshot(self):
+        """Lazy Snapshot of the current state."""
+        return Snapshot(self)
+
+    def run(self, n=None):
+        """Runs n timesteps (default: up to simlength) and returns the last Snapshot (None if none ran)."""
+        if n is None:
+            n = self.simlength - self.t
+        snap = None
+        for _ in range(n):
+            snap = self.step()
+        return snap
+
+    def iterate(self, n=None, every=1):
+        """
+        Generator of Snapshots, one every `every` timesteps for n timesteps (default: up to simlength).
+        The last timestep is always yielded. Stop early by breaking out of the loop.
+        """
+        if n is None:
+            n = self.simlength - self.t
+        for i in range(n):
+            snap = self.step()
+            if (i + 1) % every == 0 or i == n - 1:
+                yield snap
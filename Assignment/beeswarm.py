@@ -0,0 +1,737 @@
+#
+# beeswarm.py - array-backed (structure-of-arrays) bee engine for beeworld.py
+#
+# Every bee attribute from buzzness.Bee is stored as one NumPy column instead of one Python
+# object per bee. Each timestep all bees in the same state are advanced together with
+# batched NumPy operations, so the cost per step grows with the number of *states*, not bees.
+#
+# Rules follow Bee.step_change (same states, same targets, same collision / entrance checks,
+# same clog reset). Where bees compete for something (a cell, the hive entrance, a flower's
+# nectar, a comb cell) the bee earlier in this timestep's shuffled order wins, which is what
+# the sequential object model does as well. A single bee follows exactly the same trajectory as in
+# the object model for the same seed. With more bees the random numbers are drawn differently and the
+# moves are resolved in batches (see BeeSwarm._resolve_moves), so a run is not step-for-step identical.
+# test_beeswarm.py checks the single-bee trajectory, and runs the same seeds through both engines to
+# check that comb cells, hive nectar and the time spent in each state agree on average.
+#
+
+import numpy as np
+
+from buzzness import Bee, BEE_STATES
+from beenav import downhill_candidates, MAX_PREFERRED
+
+STATE_CODE = {name: code for code, name in enumerate(BEE_STATES)} # state name -> int8 code
+IDLE_IN_HIVE = STATE_CODE['IDLE_IN_HIVE']
+MOVING_TO_HIVE_EXIT = STATE_CODE['MOVING_TO_HIVE_EXIT']
+SEEKING_FLOWER = STATE_CODE['SEEKING_FLOWER']
+MOVING_TO_FLOWER = STATE_CODE['MOVING_TO_FLOWER']
+COLLECTING_NECTAR = STATE_CODE['COLLECTING_NECTAR']
+RETURNING_TO_HIVE_ENTRANCE = STATE_CODE['RETURNING_TO_HIVE_ENTRANCE']
+MOVING_TO_COMB_BUILD_SITE = STATE_CODE['MOVING_TO_COMB_BUILD_SITE']
+BUILDING_COMB = STATE_CODE['BUILDING_COMB']
+MOVING_TO_COMB_DEPOSIT_SITE = STATE_CODE['MOVING_TO_COMB_DEPOSIT_SITE']
+DEPOSITING_NECTAR = STATE_CODE['DEPOSITING_NECTAR']
+IDLE_ON_PROPERTY = STATE_CODE['IDLE_ON_PROPERTY']
+
+NO_TARGET = -1
+JIGGLE_MOVES = np.array([(0,1), (1,0), (0,-1), (-1,0), (1,1), (1,-1), (-1,1), (-1,-1)]) # Moore neighbours (moveBee)
+RANDOM_MOVES = np.array([(0,1), (1,0), (0,-1), (-1,0)]) # von Neumann neighbours (moveRandomly)
+MAX_CANDIDATES = 3 + len(JIGGLE_MOVES) # up to 3 preferred steps followed by the 8 jiggles
+SEEK_CHUNK_CELLS = 4_000_000 # max bee x flower distance entries computed at once in seekFlower
+
+
+def _first_per_group(keys):
+    """Returns a bool mask that is True for the first occurrence of every key (keys already in priority order)."""
+    first = np.zeros(len(keys), dtype=bool)
+    if len(keys):
+        _, idx = np.unique(keys, return_index=True)
+        first[idx] = True
+    return first
+
+def _sequential_take(keys, wanted, available):
+    """
+    Shares a resource between bees in priority order, like calling take_nectar / depositing one bee after another.
+    keys:   group (flower or comb cell) of each request, requests already in priority order
+    wanted:   amount each bee tries to take
+    available:   amount in the group before anyone takes (one value per request)
+    Returns (amount given to each request, amount left in the group after each request).
+    """
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    sort_idx = np.argsort(keys, kind='stable') # stable: keeps priority order inside each group
+    k, w, a = keys[sort_idx], wanted[sort_idx], available[sort_idx]
+    csum = np.cumsum(w)
+    group_start = np.r_[True, k[1:] != k[:-1]]
+    start_csum = np.maximum.accumulate(np.where(group_start, csum - w, 0)) # running total at each group start
+    before = csum - w - start_csum # amount requested by earlier bees in the same group
+    given = np.clip(a - before, 0, w)
+    left = np.maximum(a - before - w, 0)
+    out_given, out_left = np.empty_like(given), np.empty_like(left)
+    out_given[sort_idx], out_left[sort_idx] = given, left
+    return out_given, out_left
+
+
+class FlowerArrays():
+    """
+    Flower objects as columns, with the same ALIVE/DEAD/refilling rules as buzzness.Flower.
+    """
+    def __init__(self, flowers_list, step=0):
+        """
+        flowers_list:   list of Flower objects (positions, capacities and current state are copied)
+        step:   number of regenerate() calls already made (when resuming a run)
+        """
+        self.flowers = flowers_list # kept so write_back() can update the objects for plotting
+        n = len(flowers_list)
+        self.x = np.array([f.pos[0] for f in flowers_list], dtype=np.int64).reshape(n)
+        self.y = np.array([f.pos[1] for f in flowers_list], dtype=np.int64).reshape(n)
+        self.capacity = np.array([f.nectarCapacity for f in flowers_list], dtype=np.int64).reshape(n)
+        self.nectar = np.array([f.currentNectar for f in flowers_list], dtype=np.int64).reshape(n)
+        self.dead = np.array([f.state == 'DEAD' for f in flowers_list], dtype=bool).reshape(n)
+        self.cooldown = np.array([f.regeneration_cooldown for f in flowers_list], dtype=np.int64).reshape(n)
+        self.dead_duration = np.array([f.deadDuration for f in flowers_list], dtype=np.int64).reshape(n)
+        self.refilling = np.array([f.is_refilling for f in flowers_list], dtype=bool).reshape(n)
+        # Only flowers with work to do are touched by regenerate(): dead flowers wait in a timer wheel
+        # (step -> flower indices) until their cooldown ends, refilling flowers are listed in refill_idx.
+        self.step = step # number of regenerate() calls so far
+        self.wake = np.full(n, -1, dtype=np.int64) # step of the regenerate() call that revives a dead flower
+        self.wheel = {}
+        self.refill_idx = np.nonzero(~self.dead & self.refilling)[0]
+        self._schedule(np.nonzero(self.dead)[0])
+
+    def __len__(self):
+        return len(self.x)
+
+    def available(self):
+        """Same as Flower.is_available_for_bees for every flower."""
+        return ~self.dead & (self.nectar > 0)
+
+    def _schedule(self, idx):
+        wake = self.step + self.cooldown[idx]
+        self.wake[idx] = wake
+        for w in np.unique(wake).tolist():
+            self.wheel.setdefault(w, []).append(idx[wake == w])
+
+    def kill(self, idx):
+        """Flower.take_nectar emptied these flowers: they die and wake up after dead_duration regenerate() calls."""
+        self.nectar[idx] = 0
+        self.dead[idx] = True
+        self.refilling[idx] = False
+        self.cooldown[idx] = self.dead_duration[idx]
+        self._schedule(idx)
+
+    def regenerate(self, rate=1):
+        """Flower.regenerate_nectar for all flowers at once (only dead flowers due now and refilling flowers are touched)."""
+        r = self.refill_idx
+        r = r[~self.dead[r] & self.refilling[r]] # a bee taking nectar stops the refill
+        due = self.wheel.pop(self.step, [])
+        due = np.concatenate(due) if due else np.zeros(0, dtype=np.int64)
+        due = due[self.dead[due] & (self.wake[due] == self.step)]
+        self.dead[due] = False
+        self.refilling[due] = True
+        self.cooldown[due] = 0
+        self.wake[due] = -1
+        grow = np.concatenate([r, due])
+        grow = grow[self.nectar[grow] < self.capacity[grow]]
+        self.nectar[grow] = np.minimum(self.capacity[grow], self.nectar[grow] + rate)
+        self.refilling[grow[self.nectar[grow] == self.capacity[grow]]] = False
+        r = np.concatenate([r, due])
+        self.refill_idx = r[self.refilling[r]]
+        self.step += 1
+
+    def sync(self):
+        """Brings the cooldown column of the sleeping dead flowers up to date."""
+        dead = np.nonzero(self.dead & (self.wake >= 0))[0]
+        self.cooldown[dead] = self.wake[dead] - self.step
+
+    def write_back(self):
+        """Copies the column values back into the Flower objects (e.g. before plotting)."""
+        self.sync()
+        for i, f in enumerate(self.flowers):
+            f.currentNectar = int(self.nectar[i])
+            f.state = 'DEAD' if self.dead[i] else 'ALIVE'
+            f.regeneration_cooldown = int(self.cooldown[i])
+            f.is_refilling = bool(self.refilling[i])
+
+
+class BeeSwarm():
+    """
+    Structure-of-arrays version of a list of Bee objects.
+    """
+    def __init__(self, n_bees, initial_pos, hive_entrance_pos, max_nectarCarry=1, empty_flower_avoiding_duration=20,
+                 max_clogCount=5, avoid_slots=8):
+        """
+        n_bees:   number of bees
+        initial_pos:   x, y starting position of every bee inside the hive
+        hive_entrance_pos:   x, y of the hive entrance on the property
+        max_nectarCarry, empty_flower_avoiding_duration, max_clogCount:   as for buzzness.Bee
+        avoid_slots:   how many recently emptied flowers each bee remembers (Bee uses an unbounded dict)
+        """
+        self.n = n_bees
+        self._ids = None # bee names, only made when Bee objects are needed (see ids)
+        self.x = np.full(n_bees, initial_pos[0], dtype=np.int64)
+        self.y = np.full(n_bees, initial_pos[1], dtype=np.int64)
+        self.inhive = np.ones(n_bees, dtype=bool)
+        self.state = np.full(n_bees, IDLE_IN_HIVE, dtype=np.int8)
+        self.nectar = np.zeros(n_bees, dtype=np.int64)
+        self.age = np.zeros(n_bees, dtype=np.int64)
+        self.clog = np.zeros(n_bees, dtype=np.int64)
+        self.target_x = np.full(n_bees, NO_TARGET, dtype=np.int64)
+        self.target_y = np.full(n_bees, NO_TARGET, dtype=np.int64)
+        self.target_flower = np.full(n_bees, NO_TARGET, dtype=np.int64)
+        self.avoid_flower = np.full((n_bees, avoid_slots), NO_TARGET, dtype=np.int64) # ring of emptied flower indices
+        self.avoid_time = np.full((n_bees, avoid_slots), np.iinfo(np.int64).min // 2, dtype=np.int64)
+        self.hive_entrance_pos = tuple(hive_entrance_pos)
+        self.max_nectarCarry = max_nectarCarry
+        self.empty_flower_avoiding_duration = empty_flower_avoiding_duration
+        self.max_clogCount = max_clogCount
+
+    @property
+    def ids(self):
+        """Bee names (B1, B2, ... unless built from Bee objects)."""
+        if self._ids is None:
+            self._ids = [f"B{i+1}" for i in range(self.n)]
+        return self._ids
+
+    @ids.setter
+    def ids(self, names):
+        self._ids = names
+
+    @classmethod
+    def from_bees(cls, bees, flowers_list, avoid_slots=8):
+        """
+        Builds a swarm from existing Bee objects (all bees must share the same carry/avoid/clog settings).
+        flowers_list:   the Flower list, to turn flower objects / IDs into column indices
+        """
+        b0 = bees[0]
+        swarm = cls(len(bees), b0.pos, b0.hive_entrance_pos, b0.max_nectarCarry, b0.empty_flower_avoiding_duration,
+                    b0.max_clogCount, avoid_slots)
+        flower_index = {f.ID: i for i, f in enumerate(flowers_list)}
+        swarm.ids = [b.ID for b in bees]
+        for i, b in enumerate(bees):
+            swarm.x[i], swarm.y[i] = b.pos
+            swarm.inhive[i] = b.inhive
+            swarm.state[i] = STATE_CODE[b.state]
+            swarm.nectar[i], swarm.age[i], swarm.clog[i] = b.nectarCarried, b.age, b.clogCount
+            if b.current_move_pos is not None:
+                swarm.target_x[i], swarm.target_y[i] = b.current_move_pos
+            if b.current_move_object is not None:
+                swarm.target_flower[i] = flower_index[b.current_move_object.ID]
+            recent = sorted(b.recently_emptied_flowers.items(), key=lambda item: item[1])[-avoid_slots:]
+            for slot, (fid, ts) in enumerate(recent):
+                swarm.avoid_flower[i, slot], swarm.avoid_time[i, slot] = flower_index[fid], ts
+        return swarm
+
+    def to_bees(self, flowers_list=None):
+        """Returns a list of Bee objects with the current column values (used for plotting and checking)."""
+        bees = []
+        for i in range(self.n):
+            b = Bee(self.ids[i], (int(self.x[i]), int(self.y[i])), self.hive_entrance_pos, self.max_nectarCarry,
+                    self.empty_flower_avoiding_duration, self.max_clogCount)
+            b.inhive = bool(self.inhive[i])
+            b.state = BEE_STATES[self.state[i]]
+            b.nectarCarried, b.age, b.clogCount = int(self.nectar[i]), int(self.age[i]), int(self.clog[i])
+            if self.target_x[i] != NO_TARGET:
+                b.current_move_pos = (int(self.target_x[i]), int(self.target_y[i]))
+            if flowers_list is not None:
+                if self.target_flower[i] != NO_TARGET:
+                    b.current_move_object = flowers_list[self.target_flower[i]]
+                for fidx, ts in zip(self.avoid_flower[i], self.avoid_time[i]):
+                    if fidx != NO_TARGET:
+                        b.recently_emptied_flowers[flowers_list[fidx].ID] = int(ts)
+            bees.append(b)
+        return bees
+
+    def state_counts(self):
+        """Number of bees in each state, as a dictionary keyed by state name."""
+        counts = np.bincount(self.state, minlength=len(BEE_STATES))
+        return {name: int(counts[code]) for code, name in enumerate(BEE_STATES)}
+
+    def occupancy_grids(self, hive_size, property_size):
+        """Bee count per cell for the hive and the property, built from the position columns."""
+        hive = np.zeros(hive_size, dtype=np.int32)
+        prop = np.zeros(property_size, dtype=np.int32)
+        np.add.at(hive, (self.x[self.inhive], self.y[self.inhive]), 1)
+        np.add.at(prop, (self.x[~self.inhive], self.y[~self.inhive]), 1)
+        return hive, prop
+
+    ## Helpers
+    def _set_target(self, idx, tx, ty):
+        self.target_x[idx] = tx
+        self.target_y[idx] = ty
+
+    def _clear_target(self, idx):
+        self.target_x[idx] = NO_TARGET
+        self.target_y[idx] = NO_TARGET
+
+    def _remember_emptied(self, idx, flower_idx, t):
+        """recently_emptied_flowers[flower] = t for each bee in idx (reuses the flower's slot or the oldest one)."""
+        if len(idx) == 0:
+            return
+        match = self.avoid_flower[idx] == flower_idx[:, None]
+        slot = np.where(match.any(axis=1), match.argmax(axis=1), self.avoid_time[idx].argmin(axis=1))
+        self.avoid_flower[idx, slot] = flower_idx
+        self.avoid_time[idx, slot] = t
+
+    def _at_target(self, idx):
+        return (self.x[idx] == self.target_x[idx]) & (self.y[idx] == self.target_y[idx])
+
+    ## (1) Decisions
+    def _comb_targets(self, idx, hive_data, hive_layout, rng):
+        """
+        buildFrames / depositNectar for the bees in idx: returns (build_x, build_y, deposit_x, deposit_y), -1 where none.
+        """
+        m = len(idx)
+        bx = np.full(m, NO_TARGET); by = np.full(m, NO_TARGET)
+        dx = np.full(m, NO_TARGET); dy = np.full(m, NO_TARGET)
+        if 'comb_index' in hive_layout: # incremental stripe index: no scan of the stripe
+            comb_index = hive_layout['comb_index']
+            free = comb_index.free
+            if len(free):
+                pick = rng.integers(0, len(free), m)
+                bx, by = free.xs[pick], free.ys[pick]
+            level = comb_index.least_level()
+            if level is not None:
+                least = comb_index.levels[level]
+                pick = rng.integers(0, len(least), m)
+                dx, dy = least.xs[pick], least.ys[pick]
+            return bx, by, dx, dy
+        combWidth = hive_layout.get('comb_stripe_width', 3)
+        startX = max(0, hive_layout['max_x'] // 2 - combWidth // 2)
+        endX = min(hive_layout['max_x'], startX + combWidth)
+        max_nectar_per_cell = hive_layout.get('max_nectar_per_cell', 4)
+        stripe = hive_data[startX:endX]
+        free_x, free_y = np.nonzero(stripe[:, :, 0] == 0)
+        if len(free_x):
+            pick = rng.integers(0, len(free_x), m)
+            bx, by = free_x[pick] + startX, free_y[pick]
+        depositable = (stripe[:, :, 0] == 1) & (stripe[:, :, 1] < max_nectar_per_cell)
+        if depositable.any():
+            least = stripe[:, :, 1][depositable].min()
+            least_x, least_y = np.nonzero(depositable & (stripe[:, :, 1] == least))
+            pick = rng.integers(0, len(least_x), m)
+            dx, dy = least_x[pick] + startX, least_y[pick]
+        return bx, by, dx, dy
+
+    def _idle_in_hive(self, idx, hive_data, hive_layout, rng):
+        bx, by, dx, dy = self._comb_targets(idx, hive_data, hive_layout, rng)
+        has_nectar = self.nectar[idx] >= 1
+        can_build = bx != NO_TARGET
+        can_deposit = dx != NO_TARGET
+        needs_more = self.nectar[idx] < self.max_nectarCarry
+        build = has_nectar & can_build
+        deposit = has_nectar & ~can_build & can_deposit
+        leave = ~build & ~deposit & needs_more # has nectar but nowhere to put it, or has no nectar at all
+        self.state[idx[build]] = MOVING_TO_COMB_BUILD_SITE
+        self._set_target(idx[build], bx[build], by[build])
+        self.state[idx[deposit]] = MOVING_TO_COMB_DEPOSIT_SITE
+        self._set_target(idx[deposit], dx[deposit], dy[deposit])
+        exit_x, exit_y = hive_layout['hive_exit_cell_inside']
+        self.state[idx[leave]] = MOVING_TO_HIVE_EXIT
+        self._set_target(idx[leave], exit_x, exit_y)
+
+    def _seek_flower_dense(self, idx, flowers, t, rng):
+        """Nearest flower by computing every bee-to-flower distance (chunked to bound memory)."""
+        choice = np.full(len(idx), NO_TARGET)
+        avail = np.nonzero(flowers.available())[0]
+        if len(avail) and len(idx):
+            fx, fy = flowers.x[avail], flowers.y[avail]
+            chunk = max(1, SEEK_CHUNK_CELLS // len(avail))
+            for start in range(0, len(idx), chunk):
+                sub = idx[start:start + chunk]
+                d2 = (self.x[sub, None] - fx[None, :])**2 + (self.y[sub, None] - fy[None, :])**2
+                d2 = d2 + rng.random(d2.shape) * 0.5 # distances are whole numbers, so this only breaks ties (randomly)
+                fresh = (t - self.avoid_time[sub]) <= self.empty_flower_avoiding_duration
+                avoided = np.zeros(d2.shape, dtype=bool)
+                for slot in range(self.avoid_flower.shape[1]):
+                    hit = (self.avoid_flower[sub, slot][:, None] == avail[None, :]) & fresh[:, slot][:, None]
+                    avoided |= hit
+                preferred = np.where(avoided, np.inf, d2)
+                has_preferred = ~avoided.all(axis=1)
+                best = np.where(has_preferred, preferred.argmin(axis=1), d2.argmin(axis=1)) # fall back to any available flower
+                choice[start:start + chunk] = avail[best]
+        return choice
+
+    def _seek_flower(self, idx, flowers, t, rng, flower_index=None):
+        """seekFlower for every bee in idx: nearest available flower not recently emptied, random among ties."""
+        if flower_index is not None: # spatial index: only nearby buckets are searched
+            avoid_flower, avoid_time = self.avoid_flower[idx], self.avoid_time[idx]
+            fresh = (t - avoid_time) <= self.empty_flower_avoiding_duration
+            def avoided(rows, cand):
+                hit = (avoid_flower[rows, :, None] == cand[None, None, :]) & fresh[rows, :, None]
+                return hit.any(axis=1)
+            choice = flower_index.nearest_batch(self.x[idx], self.y[idx], rng, avoided, flowers.available())
+        else:
+            choice = self._seek_flower_dense(idx, flowers, t, rng)
+        found = choice != NO_TARGET
+        self.target_flower[idx] = choice
+        self.state[idx[found]] = MOVING_TO_FLOWER
+        self._set_target(idx[found], flowers.x[choice[found]], flowers.y[choice[found]])
+        self.state[idx[~found]] = IDLE_ON_PROPERTY
+        self._clear_target(idx[~found])
+
+    def _collect(self, idx, flowers, t):
+        """
+        COLLECTING_NECTAR for every bee in idx (idx in priority order).
+        Returns (flower indices emptied this call, the bee that emptied each one).
+        """
+        f = self.target_flower[idx]
+        has_flower = f != NO_TARGET
+        fsafe = np.where(has_flower, f, 0)
+        available_before = has_flower & ~flowers.dead[fsafe] & (flowers.nectar[fsafe] > 0) if len(flowers) else np.zeros(len(idx), bool)
+        wants = available_before & (self.nectar[idx] < self.max_nectarCarry)
+        take_idx = np.nonzero(wants)[0]
+        still_available = available_before.copy()
+        emptied_flower = emptier = np.zeros(0, dtype=np.int64)
+        if len(take_idx):
+            keys = fsafe[take_idx]
+            given, left = _sequential_take(keys, self.max_nectarCarry - self.nectar[idx[take_idx]], flowers.nectar[keys])
+            self.nectar[idx[take_idx]] += given
+            # A bee sees the flower as it is after its own take, so a later bee at an emptied flower finds it dead
+            still_available[take_idx] = left > 0
+            first = _first_per_group(keys[left == 0])
+            emptied_flower, emptied_at = keys[left == 0][first], take_idx[left == 0][first]
+            emptier = idx[emptied_at]
+            later = np.nonzero(available_before & ~wants)[0] # bees already full: did an earlier bee empty this flower?
+            if len(later):
+                emptied_pos = np.full(len(flowers), len(idx))
+                emptied_pos[emptied_flower] = emptied_at
+                still_available[later] = emptied_pos[fsafe[later]] > later
+            flowers_taken = np.unique(keys)
+            remaining = flowers.nectar.copy()
+            np.minimum.at(remaining, keys, left) # what is left after the last bee at each flower
+            flowers.nectar[flowers_taken] = remaining[flowers_taken]
+            flowers.refilling[flowers_taken] = False
+            flowers.kill(flowers_taken[(flowers.nectar[flowers_taken] <= 0) & ~flowers.dead[flowers_taken]])
+        done = (self.nectar[idx] >= self.max_nectarCarry) | ~has_flower | ~still_available
+        emptied_now = done & has_flower & ~still_available
+        self._remember_emptied(idx[emptied_now], f[emptied_now], t)
+        leaving = idx[done]
+        self.state[leaving] = RETURNING_TO_HIVE_ENTRANCE
+        self._set_target(leaving, self.hive_entrance_pos[0], self.hive_entrance_pos[1])
+        self.target_flower[leaving] = NO_TARGET
+        return emptied_flower, emptier
+
+    def _hive_turns(self, idle, workers, rank, hive_data, hive_layout, rng):
+        """
+        IDLE_IN_HIVE decisions and BUILDING_COMB / DEPOSITING_NECTAR work in priority order, like the object
+        model: an idle bee picks its comb target from the cells as they are after the workers earlier in the
+        order, and before the later ones. The idle bees between two workers are decided in one batch.
+        idle, workers:   bee indices in priority order
+        """
+        before = np.searchsorted(rank[workers], rank[idle]) # number of workers ahead of each idle bee
+        done = 0
+        for k in np.unique(before).tolist():
+            self._work(workers[done:k], hive_data, hive_layout)
+            self._idle_in_hive(idle[before == k], hive_data, hive_layout, rng)
+            done = k
+        self._work(workers[done:], hive_data, hive_layout)
+
+    def _work(self, idx, hive_data, hive_layout):
+        if len(idx):
+            building = self.state[idx] == BUILDING_COMB
+            self._build(idx[building], hive_data, hive_layout)
+            self._deposit(idx[~building], hive_data, hive_layout)
+
+    def _build(self, idx, hive_data, hive_layout):
+        """BUILDING_COMB: first bee (in priority order) on an unbuilt cell builds it."""
+        maxX, maxY = hive_layout['max_x'], hive_layout['max_y']
+        x, y = self.x[idx], self.y[idx]
+        ok = (self.nectar[idx] >= 1) & (x >= 0) & (x < maxX) & (y >= 0) & (y < maxY)
+        ok[ok] &= hive_data[x[ok], y[ok], 0] == 0
+        ok[ok] &= _first_per_group(x[ok] * maxY + y[ok])
+        hive_data[x[ok], y[ok], 0] = 1
+        hive_data[x[ok], y[ok], 1] = 0
+        if 'comb_index' in hive_layout:
+            for cx, cy in zip(x[ok].tolist(), y[ok].tolist()):
+                hive_layout['comb_index'].built(cx, cy)
+        self.nectar[idx[ok]] -= 1
+        self.state[idx] = IDLE_IN_HIVE
+        self._clear_target(idx)
+
+    def _deposit(self, idx, hive_data, hive_layout):
+        """DEPOSITING_NECTAR: bees fill their cell in priority order until it holds max_nectar_per_cell."""
+        maxX, maxY = hive_layout['max_x'], hive_layout['max_y']
+        x, y = self.x[idx], self.y[idx]
+        ok = (self.nectar[idx] > 0) & (x >= 0) & (x < maxX) & (y >= 0) & (y < maxY)
+        ok[ok] &= hive_data[x[ok], y[ok], 0] == 1
+        if ok.any():
+            ox, oy = x[ok], y[ok]
+            room = hive_layout['max_nectar_per_cell'] - hive_data[ox, oy, 1]
+            given, _ = _sequential_take(ox * maxY + oy, self.nectar[idx[ok]], np.maximum(room, 0))
+            cells = np.unique(ox * maxY + oy)
+            cx, cy = cells // maxY, cells % maxY
+            before = hive_data[cx, cy, 1].copy()
+            np.add.at(hive_data[:, :, 1], (ox, oy), given)
+            if 'comb_index' in hive_layout: # one index update per cell that changed
+                for x1, y1, old, new in zip(cx.tolist(), cy.tolist(), before.tolist(), hive_data[cx, cy, 1].tolist()):
+                    if old != new:
+                        hive_layout['comb_index'].nectar_changed(x1, y1, old, new)
+            self.nectar[idx[ok]] -= given
+        self.state[idx] = IDLE_IN_HIVE
+        self._clear_target(idx)
+
+    ## (2) Movement
+    # Candidate cells are (inhive, x, y) rows, so passing through the hive entrance is just a move between grids.
+    def _empty_candidates(self, m):
+        return np.full((m, MAX_CANDIDATES, 3), NO_TARGET, dtype=np.int64), np.zeros((m, MAX_CANDIDATES), dtype=bool)
+
+    def _toward_candidates(self, idx, rng):
+        """Candidate cells for moveBee: preferred diagonal/straight steps, then the shuffled Moore jiggles."""
+        m = len(idx)
+        cand, valid = self._empty_candidates(m)
+        cand[:, :, 0] = self.inhive[idx, None]
+        sx = np.sign(self.target_x[idx] - self.x[idx])
+        sy = np.sign(self.target_y[idx] - self.y[idx])
+        diagonal = (sx != 0) & (sy != 0)
+        cand[:, 0, 1], cand[:, 0, 2] = self.x[idx] + sx, self.y[idx] + sy
+        valid[:, 0] = (sx != 0) | (sy != 0)
+        cand[:, 1, 1], cand[:, 1, 2] = self.x[idx] + sx, self.y[idx]
+        cand[:, 2, 1], cand[:, 2, 2] = self.x[idx], self.y[idx] + sy
+        valid[:, 1] = valid[:, 2] = diagonal
+        order = rng.permuted(np.tile(np.arange(len(JIGGLE_MOVES)), (m, 1)), axis=1)
+        cand[:, 3:, 1] = self.x[idx, None] + JIGGLE_MOVES[order, 0]
+        cand[:, 3:, 2] = self.y[idx, None] + JIGGLE_MOVES[order, 1]
+        valid[:, 3:] = True
+        return cand, valid
+
+    def _follow_fields(self, toward, idx, nav):
+        """
+        moveBee with a nav_field: bees on the property flying to a flower or back to the hive get the
+        downhill steps of their target's distance field as preferred steps (one field lookup per target).
+        """
+        cand, valid = toward
+        use = ~self.inhive[idx] & ((self.state[idx] == RETURNING_TO_HIVE_ENTRANCE) | (self.state[idx] == MOVING_TO_FLOWER))
+        rows = np.nonzero(use)[0]
+        if not len(rows):
+            return
+        b = idx[rows]
+        goals, group = np.unique(np.stack([self.target_x[b], self.target_y[b]], axis=1), axis=0, return_inverse=True)
+        group = group.ravel()
+        for g, (gx, gy) in enumerate(goals.tolist()):
+            r, bg = rows[group == g], b[group == g]
+            cells, ok, reachable = downhill_candidates(nav.field((gx, gy)), self.x[bg], self.y[bg], self.target_x[bg], self.target_y[bg])
+            r, cells, ok = r[reachable], cells[reachable], ok[reachable] # unreachable: keep the greedy steps
+            cand[r, :MAX_PREFERRED, 1] = cells[:, :, 0]
+            cand[r, :MAX_PREFERRED, 2] = cells[:, :, 1]
+            valid[r, :MAX_PREFERRED] = ok
+
+    def _random_candidates(self, idx, rng, first=0):
+        """Candidate cells for moveRandomly: the 4 von Neumann neighbours in random order (from column `first`)."""
+        m = len(idx)
+        cand, valid = self._empty_candidates(m)
+        cand[:, :, 0] = self.inhive[idx, None]
+        order = rng.permuted(np.tile(np.arange(len(RANDOM_MOVES)), (m, 1)), axis=1)
+        cols = slice(first, first + len(RANDOM_MOVES))
+        cand[:, cols, 1] = self.x[idx, None] + RANDOM_MOVES[order, 0]
+        cand[:, cols, 2] = self.y[idx, None] + RANDOM_MOVES[order, 1]
+        valid[:, cols] = True
+        return cand, valid
+
+    def _entrance_candidates(self, idx, rng, through):
+        """Pass through the entrance (`through` = (inhive, x, y) on the other side) or, if blocked, moveRandomly."""
+        cand, valid = self._random_candidates(idx, rng, first=1)
+        cand[:, 0] = through
+        valid[:, 0] = True
+        return cand, valid
+
+    def _resolve_moves(self, idx, cand, valid, hive_grid, prop_grid, terrain, rank):
+        """
+        Moves each bee in idx to its first candidate cell that is in bounds, passable and free, approximating
+        the sequential object model with a few vectorized rounds. In every round each waiting bee picks its
+        first acceptable candidate, where:
+        - a cell left by another bee this step is only acceptable to bees later in the order than that bee
+        - two bees picking the same cell -> the one earlier in priority order gets it
+        Rounds repeat while bees keep moving (moves free cells for later bees).
+        idx:   bee indices, sorted by priority
+        cand, valid:   (len(idx), MAX_CANDIDATES, 3) candidate cells and which of them are real
+        hive_grid, prop_grid:   bee count per cell (updated in place)
+        terrain:   property terrain (0 = passable); only checked for moves that stay on the property
+        rank:   priority of every bee this step (lower goes first)
+        Returns a bool array: True where the bee moved.
+
+        Known differences from the object model, where each bee runs its whole step_change in turn:
+        - the random numbers come from one shared generator in a different order than the per-bee streams
+        - SEEKING_FLOWER bees all pick their flower from the flower state at the start of the step; a bee
+          whose flower is emptied by an earlier bee in the same step notices it next timestep
+        - all decisions are made before anybody moves, and the moves are resolved here in vectorized
+          rounds with the rules above instead of one bee at a time: this is an approximation of the
+          sequential conflict resolution, not a copy of it
+        With crowding at the hive entrance (e.g. 40 bees on map1.csv) the share of bees waiting to leave vs.
+        returning differs by a few percent; with the default scenario the state shares agree within 1%.
+        """
+        sizes = np.array([prop_grid.shape, hive_grid.shape]) # row 0 = property, row 1 = hive
+        key_offset = np.array([0, prop_grid.size]) # unique key per cell across both grids
+        flat = (prop_grid.reshape(-1), hive_grid.reshape(-1))
+        my_rank = rank[idx]
+        moved = np.zeros(len(idx), dtype=bool)
+        # Bounds, terrain and cell keys never change during the step, so work them out once
+        ci, cx, cy = cand[:, :, 0], cand[:, :, 1], cand[:, :, 2]
+        maxX, maxY = sizes[ci, 0], sizes[ci, 1]
+        static_ok = valid & (cx >= 0) & (cx < maxX) & (cy >= 0) & (cy < maxY)
+        walking = static_ok & (ci == 0) & ~self.inhive[idx, None] # staying on the property: terrain applies
+        static_ok[walking] = terrain[cx[walking], cy[walking]] == 0
+        key = np.where(static_ok, key_offset[ci] + cx * maxY + cy, 0)
+        vac_keys = np.zeros(0, dtype=np.int64) # cells left this step (sorted) and the latest rank that left each
+        vac_rank = np.zeros(0, dtype=np.int64)
+        pending = np.nonzero(static_ok.any(axis=1))[0]
+        while len(pending):
+            pk = key[pending]
+            ok = static_ok[pending].copy()
+            for g in (0, 1):
+                sel = ok & (ci[pending] == g)
+                ok[sel] = flat[g][pk[sel] - key_offset[g]] == 0
+            if len(vac_keys):
+                pos = np.clip(np.searchsorted(vac_keys, pk), 0, len(vac_keys) - 1)
+                ok &= ~((vac_keys[pos] == pk) & (vac_rank[pos] > my_rank[pending, None]))
+            # Sequentially, a bee earlier in the order that is still waiting to move could free one of our
+            # better cells first, so a bee waits while any better cell is held by such a bee.
+            bees = idx[pending]
+            where = self.inhive[bees].astype(np.int64)
+            here_key = key_offset[where] + self.x[bees] * sizes[where, 1] + self.y[bees]
+            occ_keys, first = np.unique(here_key, return_index=True) # pending is in priority order -> first = earliest
+            occ_rank = my_rank[pending][first]
+            col = np.where(ok.any(axis=1), ok.argmax(axis=1), cand.shape[1])
+            better = static_ok[pending] & ~ok & (np.arange(cand.shape[1])[None, :] < col[:, None])
+            pos = np.clip(np.searchsorted(occ_keys, pk), 0, len(occ_keys) - 1)
+            held_by_earlier = better & (occ_keys[pos] == pk) & (occ_rank[pos] < my_rank[pending, None])
+            wait = held_by_earlier.any(axis=1)
+            if not wait.any() and not ok.any():
+                break # nobody can move and nobody ahead of them can free a cell
+            go = ~wait & ok.any(axis=1)
+            if not go.any():
+                break
+            gi = np.nonzero(go)[0]
+            choice = pk[gi, col[gi]]
+            win = _first_per_group(choice)
+            winners, wcol, new_key = pending[gi[win]], col[gi[win]], choice[win]
+            bees = idx[winners]
+            old_in = self.inhive[bees].astype(np.int64)
+            old_key = key_offset[old_in] + self.x[bees] * sizes[old_in, 1] + self.y[bees]
+            new_in = ci[winners, wcol]
+            for g in (0, 1):
+                np.subtract.at(flat[g], old_key[old_in == g] - key_offset[g], 1)
+                np.add.at(flat[g], new_key[new_in == g] - key_offset[g], 1)
+            self.inhive[bees] = new_in == 1
+            self.x[bees], self.y[bees] = cx[winners, wcol], cy[winners, wcol]
+            moved[winners] = True
+            all_keys = np.concatenate([vac_keys, old_key])
+            all_rank = np.concatenate([vac_rank, my_rank[winners]])
+            vac_keys = np.unique(all_keys)
+            vac_rank = np.full(len(vac_keys), -1, dtype=np.int64)
+            np.maximum.at(vac_rank, np.searchsorted(vac_keys, all_keys), all_rank)
+            stuck = ~wait & ~ok.any(axis=1) # nothing acceptable and nothing to wait for: stays put
+            keep = np.ones(len(pending), dtype=bool)
+            keep[gi[win]] = False
+            keep[stuck] = False
+            pending = pending[keep]
+        return moved
+
+    ## (3) One timestep
+    def step(self, t, property_map_data, flowers, hive_data, hive_layout, property_config, rng, flower_index=None, nav=None):
+        """
+        Advances every bee by one timestep (Bee.step_change for the whole swarm).
+        flowers:   FlowerArrays
+        rng:   numpy.random.Generator
+        flower_index:   optional buzzness.FlowerIndex for the flower search (otherwise all distances are computed)
+        nav:   optional beenav.NavFields - bees flying to a flower or back to the hive follow distance fields
+        """
+        order = rng.permutation(self.n) # shuffled update priority, like random.shuffle(all_bees)
+        self.age += 1
+        s = self.state[order] # state at the start of the step decides which branch each bee runs
+        acted = np.zeros(self.n, dtype=bool) # moved_during_current_timestep
+        hive_grid, prop_grid = self.occupancy_grids((hive_layout['max_x'], hive_layout['max_y']),
+                                                    (property_config['max_x'], property_config['max_y']))
+        movers_toward, movers_random = [], [] # bee indices (priority order) that need a moveBee / moveRandomly
+        rank = np.empty(self.n, dtype=np.int64)
+        rank[order] = np.arange(self.n)
+
+        def in_state(code):
+            return order[s == code]
+
+        idx = in_state(SEEKING_FLOWER)
+        acted[idx] = True
+        self._seek_flower(idx, flowers, t, rng, flower_index)
+
+        idx = in_state(MOVING_TO_FLOWER)
+        f = self.target_flower[idx]
+        fsafe = np.where(f != NO_TARGET, f, 0)
+        gone = (f == NO_TARGET) | flowers.dead[fsafe] | (flowers.nectar[fsafe] <= 0) if len(flowers) else np.ones(len(idx), bool)
+        collecting = in_state(COLLECTING_NECTAR)
+        acted[collecting] = True
+        emptied_flower, emptier = self._collect(collecting, flowers, t)
+        if len(emptier): # flowers emptied by a bee earlier in the order are gone for this bee too
+            emptied_rank = np.full(len(flowers), self.n)
+            emptied_rank[emptied_flower] = rank[emptier]
+            gone |= (f != NO_TARGET) & (emptied_rank[fsafe] < rank[idx])
+        self._remember_emptied(idx[gone & (f != NO_TARGET)], f[gone & (f != NO_TARGET)], t)
+        self.state[idx[gone]] = SEEKING_FLOWER
+        self._clear_target(idx[gone])
+        self.target_flower[idx[gone]] = NO_TARGET
+        arrived = ~gone & self._at_target(idx)
+        self.state[idx[arrived]] = COLLECTING_NECTAR
+        acted[idx[gone | arrived]] = True
+        movers_toward.append(idx[~gone & ~arrived])
+
+        for moving, doing in ((MOVING_TO_COMB_BUILD_SITE, BUILDING_COMB), (MOVING_TO_COMB_DEPOSIT_SITE, DEPOSITING_NECTAR)):
+            idx = in_state(moving)
+            arrived = self._at_target(idx)
+            self.state[idx[arrived]] = doing
+            acted[idx[arrived]] = True
+            movers_toward.append(idx[~arrived])
+
+        idle = in_state(IDLE_IN_HIVE)
+        self.clog[idle] = 0
+        workers = order[(s == BUILDING_COMB) | (s == DEPOSITING_NECTAR)]
+        acted[idle] = acted[workers] = True
+        self._hive_turns(idle, workers, rank, hive_data, hive_layout, rng)
+
+        idx = in_state(IDLE_ON_PROPERTY)
+        going_home = self.age[idx] % 10 == 0
+        self.state[idx[going_home]] = RETURNING_TO_HIVE_ENTRANCE
+        self._set_target(idx[going_home], self.hive_entrance_pos[0], self.hive_entrance_pos[1])
+        acted[idx[going_home]] = True
+        movers_random.append(idx[~going_home])
+
+        ## Movement (including passing through the hive entrance), all in one priority-ordered pass
+        hx, hy = self.hive_entrance_pos
+        ex, ey = hive_layout['hive_entry_cell_inside']
+        idx = in_state(MOVING_TO_HIVE_EXIT)
+        at_exit = self._at_target(idx)
+        movers_toward.append(idx[~at_exit])
+        leaving = idx[at_exit]
+        idx = in_state(RETURNING_TO_HIVE_ENTRANCE)
+        at_entrance = self._at_target(idx)
+        movers_toward.append(idx[~at_entrance])
+        entering = idx[at_entrance]
+        toward = self._toward_candidates(np.concatenate(movers_toward), rng)
+        if nav is not None:
+            self._follow_fields(toward, np.concatenate(movers_toward), nav)
+        parts = [toward,
+                 self._random_candidates(np.concatenate(movers_random), rng),
+                 self._entrance_candidates(leaving, rng, (0, hx, hy)),
+                 self._entrance_candidates(entering, rng, (1, ex, ey))]
+        idx = np.concatenate(movers_toward + movers_random + [leaving, entering])
+        cand = np.concatenate([c for c, _ in parts])
+        valid = np.concatenate([v for _, v in parts])
+        by_rank = np.argsort(rank[idx], kind='stable')
+        idx, cand, valid = idx[by_rank], cand[by_rank], valid[by_rank]
+        was_inside = self.inhive[idx].copy()
+        acted[idx] = self._resolve_moves(idx, cand, valid, hive_grid, prop_grid, property_map_data, rank)
+        went_out = idx[was_inside & ~self.inhive[idx]] # exited the hive
+        self.state[went_out] = SEEKING_FLOWER
+        self._clear_target(went_out)
+        came_in = idx[~was_inside & self.inhive[idx]] # entered the hive
+        self.state[came_in] = IDLE_IN_HIVE
+        self._clear_target(came_in)
+
+        ## Clog counter and stuck reset
+        self.clog[acted] = 0
+        self.clog[~acted] += 1
+        stuck = np.nonzero(self.clog > self.max_clogCount)[0]
+        if len(stuck):
+            f = self.target_flower[stuck]
+            self._remember_emptied(stuck[f != NO_TARGET], f[f != NO_TARGET], t)
+            self.state[stuck] = np.where(self.inhive[stuck], IDLE_IN_HIVE, SEEKING_FLOWER)
+            self._clear_target(stuck)
+            self.target_flower[stuck] = NO_TARGET
+            self.clog[stuck] = 0
@@ -0,0 +1,188 @@
+#
+# beesweep.py - parallel parameter sweeps over the loadParameters keys of para1.csv
+#
+# Each parameter gets a list (a,b,c), an inclusive range (start:stop:step) or, for Latin-hypercube designs,
+# bounds (lo:hi). The values are expanded into a full grid or a Latin hypercube, every configuration is run
+# for a number of seeded replicas across a process pool (see beeensemble.py), and the results are written
+# as one tidy table: one row per (configuration, replica) with the parameter values, seed and final metrics.
+#
+# Usage:  python beesweep.py --param num_bees=5:50:5 --param flower_regen_rate=1,2 -r 4 -j 8 -o sweep.csv
+#         python beesweep.py --design lhs --samples 200 --param num_bees=5:100 --param flower_dead_time=5:30
+#
+
+import os
+import io
+import csv
+import argparse
+import itertools
+import contextlib
+import multiprocessing
+import numpy as np
+
+import beeworld
+from beelog import LOG
+from beerng import SimRNG
+from beeensemble import run_replica
+
+MAP_KEYS = ('flower_dead_time',) # parameters that loadMap uses to build the flowers
+
+def _number(text):
+    text = text.strip()
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return text
+
+def parse_spec(spec):
+    """
+    'name=values' -> (name, values). values is a list for 'a,b,c' and 'start:stop:step' (stop included),
+    or a (lo, hi) tuple for 'lo:hi' (Latin-hypercube bounds).
+    """
+    name, _, values = spec.partition('=')
+    if not values:
+        raise ValueError(f"Parameter spec '{spec}' should look like name=a,b,c or name=start:stop:step or name=lo:hi")
+    parts = values.split(':')
+    if len(parts) == 3:
+        start, stop, step = (_number(p) for p in parts)
+        n = int(np.floor((stop - start) / step + 1e-9)) + 1
+        return name.strip(), [start + i * step for i in range(n)]
+    if len(parts) == 2:
+        return name.strip(), (_number(parts[0]), _number(parts[1]))
+    return name.strip(), [_number(v) for v in values.split(',')]
+
+def grid_design(specs):
+    """Every combination of the listed values. specs: {name: list of values}"""
+    names = list(specs)
+    for name in names:
+        if isinstance(specs[name], tuple):
+            raise ValueError(f"Parameter '{name}' has bounds (lo:hi); a grid needs a list or start:stop:step")
+    return [dict(zip(names, combo)) for combo in itertools.product(*(specs[n] for n in names))]
+
+def lhs_design(specs, n_samples, rng):
+    """
+    Latin hypercube: each parameter's range is cut into n_samples strata and each stratum is used once.
+    Bounds (lo, hi) are sampled uniformly inside the strata (rounded if both bounds are ints);
+    lists are split into n_samples equal strata of their indices.
+    """
+    configs = [{} for _ in range(n_samples)]
+    for name, values in specs.items():
+        u = (rng.permutation(n_samples) + rng.random(n_samples)) / n_samples # one point per stratum, strata shuffled
+        if isinstance(values, tuple):
+            lo, hi = values
+            samples = lo + u * (hi - lo)
+            if isinstance(lo, int) and isinstance(hi, int):
+                samples = np.minimum(np.floor(lo + u * (hi - lo + 1)), hi).astype(int)
+            samples = samples.tolist()
+        else:
+            samples = [values[min(int(x * len(values)), len(values) - 1)] for x in u]
+        for config, value in zip(configs, samples):
+            config[name] = value
+    return configs
+
+def apply_overrides(sim_params, overrides):
+    """Sets parameter values the way loadParameters would have read them (keeping derived values consistent)."""
+    params = dict(sim_params)
+    params.update(overrides)
+    params['hive_width'], params['hive_height'] = int(params['hive_width']), int(params['hive_height'])
+    params['hive_exit_cell_inside'] = (int(params['hive_exit_cell_inside_x']), int(params['hive_exit_cell_inside_y']))
+    params['hive_entry_cell_inside'] = (int(params['hive_entry_cell_inside_x']), int(params['hive_entry_cell_inside_y']))
+    for key in ('num_bees', 'simlength', 'bee_max_nectarCarry', 'max_nectar_per_cell', 'comb_stripe_width'):
+        params[key] = int(params[key])
+    return params
+
+_files = None # (mapfile, paramfile, base parameters) for this worker process
+_maps = {} # map-affecting parameter values -> (property_map, flowers, property_config), loaded once per worker
+
+def _init_worker(mapfile, paramfile):
+    global _files, _maps
+    LOG.configure(level='off')
+    with contextlib.redirect_stdout(io.StringIO()):
+        _files = (mapfile, paramfile, beeworld.loadParameters(paramfile))
+    _maps = {}
+
+def _scenario_for(overrides):
+    mapfile, _, base = _files
+    sim_params = apply_overrides(base, overrides)
+    key = tuple(sim_params.get(k) for k in MAP_KEYS)
+    if key not in _maps:
+        with contextlib.redirect_stdout(io.StringIO()):
+            _maps[key] = beeworld.loadMap(mapfile, sim_params)
+    return (sim_params,) + _maps[key]
+
+def _run_task(task):
+    config_id, replica, overrides, seed_seq, simlength, per_step = task
+    run = run_replica(_scenario_for(overrides), seed_seq, simlength)
+    return config_id, replica, run if per_step else run[-1:]
+
+def run_sweep(mapfile, paramfile, configs, replicas=1, seed=None, workers=None, simlength=None, per_step=False):
+    """
+    Runs every configuration for `replicas` seeds across a process pool.
+    configs:   list of {parameter: value} dictionaries (from grid_design / lhs_design)
+    seed:   root seed or SimRNG; each (configuration, replica) gets its own child SeedSequence (pass the SimRNG
+            an LHS design was drawn from, so the seed column repeats the whole sweep)
+    per_step:   keep every timestep (otherwise only the final metrics)
+    Returns tidy row dictionaries: config, replica, seed, the parameter values, then the metrics.
+    """
+    root = seed if isinstance(seed, SimRNG) else SimRNG(seed)
+    children = root.seed_seq.spawn(len(configs) * replicas)
+    tasks = [(c, r, configs[c], children[c * replicas + r], simlength, per_step)
+             for c in range(len(configs)) for r in range(replicas)]
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    if workers == 1:
+        old_level = LOG.level
+        try:
+            _init_worker(mapfile, paramfile)
+            for task in tasks:
+                c, r, run = _run_task(task)
+                results[c, r] = run
+        finally:
+            LOG.configure(level=old_level) # also after an error or Ctrl-C
+    else:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(mapfile, paramfile)) as pool:
+            for c, r, run in pool.imap_unordered(_run_task, tasks, chunksize=max(1, len(tasks) // (workers * 8))):
+                results[c, r] = run
+    rows = []
+    for c, r, _, seed_seq, _, _ in tasks:
+        for values in results[c, r].tolist():
+            row = {'config': c, 'replica': r, 'seed': f"{root.entropy}/{'-'.join(map(str, seed_seq.spawn_key))}"}
+            row.update(configs[c])
+            row.update(zip(beeworld.METRIC_COLUMNS, values))
+            rows.append(row)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep for beeworld")
+    parser.add_argument("-f", "--mapfile", type=str, default="map1.csv", help="Path to CSV for property map")
+    parser.add_argument("-p", "--paramfile", type=str, default="para1.csv", help="Base parameter file")
+    parser.add_argument("--param", action="append", default=[], help="name=a,b,c | name=start:stop:step | name=lo:hi (lhs only). Repeat for more parameters")
+    parser.add_argument("--design", choices=["grid", "lhs"], default="grid", help="Full grid or Latin hypercube")
+    parser.add_argument("--samples", type=int, default=100, help="Number of Latin-hypercube configurations")
+    parser.add_argument("-r", "--replicas", type=int, default=1, help="Seeded replicas per configuration")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None, help="Root seed (design sampling and every replica)")
+    parser.add_argument("--steps", type=int, default=None, help="Timesteps per run (default: simlength from the parameter file)")
+    parser.add_argument("--per-step", action="store_true", help="One row per timestep instead of final metrics only")
+    parser.add_argument("-o", "--output", type=str, default="sweep_results.csv", help="Output CSV")
+    args = parser.parse_args()
+    if not args.param:
+        parser.error("give at least one --param")
+    specs = dict(parse_spec(spec) for spec in args.param)
+    root = SimRNG(args.seed) # one root for the design and the replicas: --seed <root seed> repeats the sweep
+    if args.design == 'grid':
+        configs = grid_design(specs)
+    else:
+        configs = lhs_design(specs, args.samples, root.generator) # replicas use child streams, not this one
+    print(f"Running {len(configs)} configurations x {args.replicas} replicas (root seed {root.entropy})")
+    rows = run_sweep(args.mapfile, args.paramfile, configs, args.replicas, root, args.workers, args.steps, args.per_step)
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Saved {len(rows)} rows to {args.output}")
+
+if __name__ == "__main__":
+    main()
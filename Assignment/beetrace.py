@@ -0,0 +1,97 @@
+#
+# beetrace.py - timeline of a run (timesteps, phases, bee updates, rendering) as Chrome Trace Event JSON
+#
+# Totals (beeprof) hide the odd slow timestep, e.g. the few where every bee jiggles at the hive entrance.
+# A Tracer keeps one span per timestep, per loop phase, per bee update (named after the bee's state) and per
+# helper call, for every sample_every-th timestep. Spans go into a bounded buffer (the oldest are dropped
+# once it is full), so tracing a long run costs a fixed amount of memory. The saved file opens in
+# chrome://tracing, ui.perfetto.dev or speedscope.app; with --render-thread the two threads get their own rows.
+#
+# Spans are stored as Chrome "complete" events (ph 'X': begin time and duration in one event), so a span
+# whose begin was dropped from the buffer can never be left without its end.
+#
+# With --render-thread both threads add spans: complete() takes a lock, and whether a span is kept is decided
+# per thread. The simulation thread follows its current timestep (begin_step) and the GUI thread follows the
+# timestep of the snapshot it is drawing (follow_step), so one thread's step never decides for the other.
+#
+# Usage:  python beeworld.py --headless --trace run.trace.json --trace-every 10
+#
+
+import json
+import time
+import threading
+from collections import deque
+
+TRACE_BUFFER = 1000000 # spans kept at most
+
+class _Sampling(threading.local):
+    sampled = True # spans outside any timestep (setup) are kept
+
+class Tracer():
+    """
+    Bounded buffer of timed spans, filled through beeprof.PROF.start_trace(tracer).
+    """
+    def __init__(self, capacity=TRACE_BUFFER, sample_every=1):
+        """
+        capacity:   spans kept at most (the oldest are dropped)
+        sample_every:   trace every N-th timestep only (1 = all)
+        """
+        self.events = deque(maxlen=capacity)
+        self.capacity = capacity
+        self.sample_every = max(1, sample_every)
+        self._sampling = _Sampling() # per-thread sampling decision
+        self.lock = threading.Lock()
+        self.recorded = 0 # spans ever added
+        self.steps_sampled = 0
+        self.origin = time.perf_counter()
+        self.threads = {} # thread ident -> name
+
+    @property
+    def sampled(self):
+        """Whether spans of the calling thread are kept right now."""
+        return self._sampling.sampled
+
+    def begin_step(self, t):
+        """Timestep t starts (simulation thread): decides whether its spans are recorded."""
+        self.follow_step(t)
+        if self._sampling.sampled:
+            self.steps_sampled += 1
+
+    def follow_step(self, t):
+        """The calling thread now works for timestep t (e.g. the GUI thread drawing it): same decision as begin_step."""
+        self._sampling.sampled = t % self.sample_every == 0
+
+    def complete(self, name, category, t0, t1, args=None):
+        """Adds a span that ran from t0 to t1 (time.perf_counter values)."""
+        ident = threading.get_ident()
+        with self.lock:
+            if ident not in self.threads:
+                self.threads[ident] = threading.current_thread().name
+            self.events.append((name, category, t0, t1, ident, args))
+            self.recorded += 1
+
+    @property
+    def dropped(self):
+        return self.recorded - len(self.events)
+
+    def to_chrome(self):
+        """The buffer as a Chrome Trace Event dictionary."""
+        tids = {ident: i + 1 for i, ident in enumerate(self.threads)}
+        events = []
+        for name, category, t0, t1, ident, args in sorted(self.events, key=lambda e: (e[2], -e[3])): # parents before children
+            event = {'name': name, 'cat': category, 'ph': 'X', 'pid': 1, 'tid': tids[ident],
+                     'ts': round((t0 - self.origin) * 1e6, 3), 'dur': round((t1 - t0) * 1e6, 3)}
+            if args:
+                event['args'] = args
+            events.append(event)
+        meta = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'beeworld'}}]
+        meta += [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tids[ident], 'args': {'name': name}}
+                 for ident, name in self.threads.items()]
+        return {'traceEvents': meta + events, 'displayTimeUnit': 'ms',
+                'otherData': {'sample_every': self.sample_every, 'steps_sampled': self.steps_sampled,
+                              'capacity': self.capacity, 'dropped_spans': self.dropped}}
+
+    def save(self, filename):
+        """Writes the trace for chrome://tracing / speedscope."""
+        with open(filename, 'w') as f:
+            json.dump(self.to_chrome(), f, separators=(',', ':'))
@@ -9,15 +9,39 @@
 #     11/04/2025 : Implemented bee collision avoidance and stuck resolution.
 #     11/04/2025 : Refined slow logic, hive entrance clogging and flower regeneration. 
 #     12/05/2024: Final version uploaded
+#     16/10/2026 : Headless batch mode (--headless, --render-every, --outdir) writing metrics.csv and the final PNG.
+#     16/10/2026 : Per-step messages go through beelog.LOG (--log-level, --log-categories, --log-file).
+#     16/10/2026 : All randomness comes from a seedable beerng.SimRNG (--seed / 'seed' parameter).
+#     16/10/2026 : Checkpoint / resume of the full simulation state (--checkpoint-every, --resume, see beecheckpoint.py).
+#     16/10/2026 : Optional memory-mapped trajectory recording (--record, see beerecord.py).
+#     16/10/2026 : Keyframe + delta replays (--replay, --keyframe-every) rendered by beereplay.py.
+#     16/10/2026 : Fast NumPy frame export to PNG / GIF / MP4 (--export, see beeraster.py).
+#     16/10/2026 : Frames are drawn by beerender.FrameRenderer (artists kept between frames, blitting on screen).
+#     16/10/2026 : Optional simulation thread feeding the window through a snapshot queue (--render-thread, --frame-policy).
+#     16/10/2026 : Optional timing report per bee state, helper and loop phase (--profile, --profile-json, see beeprof.py).
+#     16/10/2026 : Optional Chrome trace / speedscope timeline of sampled timesteps (--trace, --trace-every, see beetrace.py).
+#     16/10/2026 : Optional memory report with tracemalloc snapshots and structure sizes (--memory-every, see beemem.py).
 
-import random
+import os
+import threading
 import argparse 
 import csv      
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.colors import ListedColormap, BoundaryNorm 
+# matplotlib is imported inside the plotting functions so headless batch runs never load it
 
-from buzzness import Flower, Bee 
+from buzzness import Flower, Bee, BeeOccupancy, FlowerIndex, FlowerScheduler, CombIndex, BEE_STATES
+from beeswarm import BeeSwarm, FlowerArrays
+from beelog import LOG, LEVELS, CATEGORIES, FileSink
+from beenav import NavFields
+from beerng import SimRNG
+from beeprof import PROF
+import beetrace
+import beemem
+import beecheckpoint
+from beerecord import TrajectoryRecorder
+import beereplay
+import beerender
+import beeraster
 
 # (5) User interface
 # Batch Mode
@@ -229,11 +253,14 @@ def loadInteractiveParameters(): # Prompts user for parameters in INTERACTIVE MO
     print(f"Interactive parameters set: {params}")
     return params
 
-def generateInteractiveMap(sim_params): # Generates property, flowers, obstacles for INTERACTIVE MODE
+def generateInteractiveMap(sim_params, rng=None): # Generates property, flowers, obstacles for INTERACTIVE MODE
     """
     Generates property grid, flower list, and property configuration randomly based on user inputs/defaults.
     sim_params:  dictionary of simulation parameters (some may be used for defaults here)
+    rng:   SimRNG used to place flowers and obstacles (default: seeded from sim_params['seed'])
     """
+    if rng is None:
+        rng = SimRNG(sim_params.get('seed'))
     print("\nInteractive Mode Map Generation")
     property_config = {} # dictionary for property settings
     flowers_list = []    # list to hold Flower objects
@@ -266,15 +293,15 @@ def generateInteractiveMap(sim_params): # Generates property, flowers, obstacles
     default_dead_time = sim_params.get('flower_dead_time', 10)      # from sim_params
     for i in range(num_flowers):
         f_id = f"Flower_Int{i+1}" #  ID for input generated flower
-        f_x = random.randint(0, propertyW - 1) 
-        f_y = random.randint(0, propertyH - 1) 
+        f_x = rng.randint(0, propertyW - 1) 
+        f_y = rng.randint(0, propertyH - 1) 
         while (f_x, f_y) == property_config['hive_position_on_property']: #avoid plotting a flower directly on hive entrance
-            f_x = random.randint(0, propertyW - 1)
-            f_y = random.randint(0, propertyH - 1)
-        f_name = random.choice(flower_names_pool)
-        f_color = random.choice(flower_colors_pool)
+            f_x = rng.randint(0, propertyW - 1)
+            f_y = rng.randint(0, propertyH - 1)
+        f_name = rng.choice(flower_names_pool)
+        f_color = rng.choice(flower_colors_pool)
         # Nectar capacity can be slightly randomized around the default
-        f_nectar_capacity = max(1, default_nectar_cap + random.randint(-int(default_nectar_cap/2), int(default_nectar_cap/2))) 
+        f_nectar_capacity = max(1, default_nectar_cap + rng.randint(-int(default_nectar_cap/2), int(default_nectar_cap/2))) 
         flowers_list.append(Flower(f_id, (f_x, f_y), f_name, f_color, f_nectar_capacity, default_dead_time))
     print(f"Generated {len(flowers_list)} flowers randomly on the property.")
     while True:
@@ -285,10 +312,10 @@ def generateInteractiveMap(sim_params): # Generates property, flowers, obstacles
             else: print("Number of obstacles cannot be negative.")
         except ValueError: print("Invalid input for number of obstacles. Please enter an integer.")
     for i in range(num_obstacles): # obstacle properties
-        obs_w = random.randint(1, max(1, propertyW // 8)) # Obstacle width, minimum = 1
-        obs_h = random.randint(1, max(1, propertyH // 8)) 
-        obs_x = random.randint(0, propertyW - obs_w) # Ensure obstacle spawns within bounds
-        obs_y = random.randint(0, propertyH - obs_h)
+        obs_w = rng.randint(1, max(1, propertyW // 8)) # Obstacle width, minimum = 1
+        obs_h = rng.randint(1, max(1, propertyH // 8)) 
+        obs_x = rng.randint(0, propertyW - obs_w) # Ensure obstacle spawns within bounds
+        obs_y = rng.randint(0, propertyH - obs_h)
         # Avoid placing obstacle directly over hive entrance (simple check for center of obstacle)
         hive_center_in_obstacle = (obs_x <= hive_x_prop < obs_x + obs_w) and (obs_y <= hive_y_prop < obs_y + obs_h)
         if not hive_center_in_obstacle:
@@ -297,8 +324,7 @@ def generateInteractiveMap(sim_params): # Generates property, flowers, obstacles
     print(f"Generated interactive environment: \n Dimensions: ({propertyW}x{propertyH})")
     return world_data, flowers_list, property_config
 
-def plot_hive(hive, blist, ax, hiveLayout):
-    ax.clear() # Clear previous plot content from the axis
+def hive_raster(hive, hiveLayout): # Colour index of every hive cell: nectar level, unbuilt stripe cell or background
     max_nectar_val = hiveLayout.get('max_nectar_per_cell', 4) # Max nectar for color scaling
     val_not_yet_built_in_stripe = max_nectar_val + 1 # Value for cells in stripe but not built
     val_outside_stripe = max_nectar_val + 2    # Value for cells outside comb stripe (background)
@@ -307,15 +333,17 @@ def plot_hive(hive, blist, ax, hiveLayout):
     stripe_center_x = hiveLayout['max_x'] // 2
     start_x = max(0, stripe_center_x - comb_width // 2)
     end_x = min(hiveLayout['max_x'], start_x + comb_width)
-    for r_idx in range(hiveLayout['max_x']): # Iterate through hive cells
-        for c_idx in range(hiveLayout['max_y']):
-            is_in_stripe = (start_x <= r_idx < end_x) # Check if cell is in the comb stripe
-            if is_in_stripe:
-                if hive[r_idx, c_idx, 0] == 1: # If comb is built
-                    nectar_level = hive[r_idx, c_idx, 1] 
-                    hive_plot_array[r_idx, c_idx] = nectar_level 
-                else: # Comb not built in stripe
-                    hive_plot_array[r_idx, c_idx] = float(val_not_yet_built_in_stripe)
+    stripe = hive[start_x:end_x] # only cells in the comb stripe show nectar / not yet built
+    hive_plot_array[start_x:end_x] = np.where(stripe[:, :, 0] == 1, stripe[:, :, 1], val_not_yet_built_in_stripe)
+    return hive_plot_array
+
+_hive_colormaps = {} # max_nectar_per_cell -> (colormap, norm), built once
+
+def hive_colormap(max_nectar_val): # Colormap and norm for hive_raster values
+    if max_nectar_val in _hive_colormaps:
+        return _hive_colormaps[max_nectar_val]
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import ListedColormap, BoundaryNorm
     num_nectar_shades = max_nectar_val + 1 
     try:
         base_cmap = plt.get_cmap('Oranges', num_nectar_shades + 2) # Colormap for nectar + states
@@ -328,6 +356,13 @@ def plot_hive(hive, blist, ax, hiveLayout):
     custom_cmap = ListedColormap(colors)
     bounds = list(np.arange(0, max_nectar_val + 3, 1)) 
     norm = BoundaryNorm(bounds, custom_cmap.N)
+    _hive_colormaps[max_nectar_val] = (custom_cmap, norm)
+    return custom_cmap, norm
+
+def plot_hive(hive, blist, ax, hiveLayout):
+    ax.clear() # Clear previous plot content from the axis
+    hive_plot_array = hive_raster(hive, hiveLayout)
+    custom_cmap, norm = hive_colormap(hiveLayout.get('max_nectar_per_cell', 4))
     ax.imshow(hive_plot_array.T, origin="lower", cmap=custom_cmap, norm=norm) # Transpose for (x,y)
     # x and y positions of the bees in hive.
     xvalues = [b.get_pos()[0] for b in blist if b.get_inhive()] # list of x coordinates only if inhive = True
@@ -401,7 +436,19 @@ def plot_flowerNectar(flowers_list, ax, default_max_nectar): # Creates a bar cha
                 ha='center', va='bottom', fontsize=7)
     ax.grid(axis='y', linestyle='--', alpha=0.7) # Add a light grid for y-axis
 
-def run_simulation(sim_params, property_map_data, flowers_list, property_config, interactive_mode=False): # Main function to run the bee simulation steps
+def setup_world(sim_params, property_map_data, flowers_list, property_config, rng=None, start_step=0): # Builds the hive, bees and layout config needed to run the simulation
+    """
+    Creates the simulation state (no plotting) from the loaded parameters and map.
+    sim_params:   dictionary of simulation parameters
+    property_map_data:   numpy array of the main property terrain
+    flowers_list:   list of Flower objects
+    property_config:   dictionary with property dimensions and hive location
+    rng:   SimRNG for the run (default: seeded from sim_params['seed'], fresh entropy if there is none)
+    start_step:   first timestep that will be run (non-zero when a checkpoint is being restored)
+    Returns a dictionary holding everything step_world needs.
+    """
+    if rng is None:
+        rng = SimRNG(sim_params.get('seed'))
     hiveX, hiveY = sim_params['hive_width'], sim_params['hive_height'] # Get hive dimensions from parameters
     max_nectar_in_comb = sim_params.get('max_nectar_per_cell', 4)
     # Initialize hive data: 3D numpy array (x, y, [comb_status, nectar_amount])
@@ -412,61 +459,362 @@ def run_simulation(sim_params, property_map_data, flowers_list, property_config,
         'max_nectar_per_cell': max_nectar_in_comb,
         'hive_exit_cell_inside': sim_params['hive_exit_cell_inside'],
         'hive_entry_cell_inside': sim_params['hive_entry_cell_inside']}
+    hive_layout_config['comb_index'] = CombIndex(hive_data, hive_layout_config) # Free / least-filled comb cells, kept up to date by the bees
     initial_bee_pos_in_hive = hive_layout_config['hive_entry_cell_inside'] # Bees start at the designated internal entry point
     if not (0 <= initial_bee_pos_in_hive[0] < hiveX and 0 <= initial_bee_pos_in_hive[1] < hiveY):
         print(f"Warning: Initial bee position {initial_bee_pos_in_hive} is outside hive dimensions {hiveX}x{hiveY}. Resetting.")
         initial_bee_pos_in_hive = (min(hiveX-1,0) if hiveX > 0 else 0, min(hiveY-1,0) if hiveY > 0 else 0)
         if hiveX > 0 and hiveY > 0: initial_bee_pos_in_hive = (hiveX//2, hiveY//2) # Prefer center if hive has size
-    all_bees = [Bee(f"B{i+1}", initial_bee_pos_in_hive, property_config['hive_position_on_property'],
+    # Distance fields around obstacles: hive entrance (kept) + one per flower (LRU, 'nav_cache_mb' budget).
+    # Call world['nav'].invalidate() if the terrain is edited.
+    nav = NavFields(property_map_data, max_bytes=int(float(sim_params.get('nav_cache_mb', 64)) * 2**20),
+                    pinned=[property_config['hive_position_on_property']])
+    if sim_params.get('engine', 'object') == 'swarm': # Array-backed engine: bees are NumPy columns, not objects
+        swarm = BeeSwarm(sim_params['num_bees'], initial_bee_pos_in_hive, property_config['hive_position_on_property'],
             sim_params['bee_max_nectarCarry'],
             sim_params.get('bee_empty_flower_avoiding_duration', 20),
             sim_params.get('bee_max_clogCount', 5))
-        for i in range(sim_params['num_bees'])]
-    plt.ion() # Turn on interactive mode for Matplotlib
-    fig_interactive, axes_array_interactive = plt.subplots(2, 2, figsize=(16, 10)) # Create 2x2 grid of subplots
-    axes_dict_interactive = {'hive': axes_array_interactive[0,0],'property': axes_array_interactive[0,1],'nectar': axes_array_interactive[1,0]}
-    axes_array_interactive[1,1].axis('off') # Turn off the unused 4th subplot
-    for t in range(sim_params['simlength']): ## Main for loop for the simulation
-        print(f"\n--- Timestep {t+1}/{sim_params['simlength']} ---") # Log current timestep
-        random.shuffle(all_bees) # Shuffle bee order each timestep to vary update priority
-        for i, current_bee_obj in enumerate(all_bees):
-            # Gather information about other bees for collision avoidance
-            other_bees_details = []
-            for j, other_b in enumerate(all_bees):
-                if i != j: # Don't include the current bee in its own "other bees" list
-                    other_bees_details.append({'pos': other_b.get_pos(), 'state': other_b.state,'id': other_b.ID,'inhive': other_b.get_inhive()})
-            current_bee_obj.step_change(property_map_data, flowers_list, hive_data, hive_layout_config,property_config,t,other_bees_details)
-        for flower in flowers_list:
-            flower.regenerate_nectar(rate=sim_params.get('flower_regen_rate',1))
+        return {'params': sim_params, 'property_map': property_map_data, 'flowers': flowers_list,
+            'property_config': property_config, 'hive_data': hive_data,
+            'hive_layout': hive_layout_config, 'swarm': swarm, 'flower_arrays': FlowerArrays(flowers_list, start_step),
+            'flower_index': FlowerIndex(flowers_list, property_config['max_x'], property_config['max_y']),
+            'nav': nav, 'rng': rng, 'swarm_rng': rng.generator} # batched draws straight from the Generator
+    all_bees = [Bee(f"B{i+1}", initial_bee_pos_in_hive, property_config['hive_position_on_property'],
+            sim_params['bee_max_nectarCarry'],
+            sim_params.get('bee_empty_flower_avoiding_duration', 20),
+            sim_params.get('bee_max_clogCount', 5), bee_rng)
+        for i, bee_rng in enumerate(rng.spawn(sim_params['num_bees']))] # one independent stream per bee
+    occupancy = BeeOccupancy((hiveX, hiveY), (property_config['max_x'], property_config['max_y'])) # Where every bee is, for collision avoidance
+    for b in all_bees:
+        occupancy.add_bee(b)
+    return {'params': sim_params, 'property_map': property_map_data, 'flowers': flowers_list,
+        'property_config': property_config, 'hive_data': hive_data,
+        'hive_layout': hive_layout_config, 'bees': all_bees, 'occupancy': occupancy,
+        'flower_index': FlowerIndex(flowers_list, property_config['max_x'], property_config['max_y']),
+        'nav': nav, 'flower_scheduler': FlowerScheduler(flowers_list, start_step), 'rng': rng}
+
+def step_world(world, t): # Advances every bee and flower by one timestep
+    """
+    Runs timestep t of the simulation on the world dictionary from setup_world.
+    """
+    sim_params = world['params']
+    LOG.timestep = t
+    LOG.info('sim', "\n--- Timestep %s/%s ---", t+1, sim_params['simlength']) # Log current timestep
+    if 'swarm' in world: # Array-backed engine
+        with PROF.phase('step.bees'):
+            world['swarm'].step(t, world['property_map'], world['flower_arrays'], world['hive_data'], world['hive_layout'], world['property_config'], world['swarm_rng'], world['flower_index'], world['nav'])
+        with PROF.phase('step.flowers'):
+            world['flower_arrays'].regenerate(rate=sim_params.get('flower_regen_rate',1))
+        return
+    all_bees = world['bees']
+    world['rng'].shuffle(all_bees) # Shuffle bee order each timestep to vary update priority
+    with PROF.phase('step.prefetch'):
+        world['flower_index'].prefetch([b for b in all_bees if b.state == 'SEEKING_FLOWER'], t, world['rng']) # One batched flower query per step
+    with PROF.phase('step.bees'):
+        for current_bee_obj in all_bees: # Occupancy grids are updated by each bee as it moves
+            current_bee_obj.step_change(world['property_map'], world['flowers'], world['hive_data'], world['hive_layout'], world['property_config'], t, world['occupancy'], world['flower_index'], world['nav'])
+    with PROF.phase('step.flowers'):
+        world['flower_scheduler'].regenerate(rate=sim_params.get('flower_regen_rate',1)) # Only dead / refilling flowers are touched
+
+METRIC_COLUMNS = ['timestep', 'total_hive_nectar', 'comb_cells', 'bees_in_hive', 'flowers_alive'] + list(BEE_STATES) # collect_metrics keys, in order
+
+def collect_metrics(world, t): # Summary numbers for one timestep, used for the metrics.csv output
+    """
+    Returns a dictionary of aggregate statistics for the world after timestep t.
+    """
+    hive_data = world['hive_data']
+    row = {'timestep': t + 1,
+        'total_hive_nectar': int(hive_data[:, :, 1].sum()),
+        'comb_cells': int(np.count_nonzero(hive_data[:, :, 0]))}
+    if 'swarm' in world:
+        row['bees_in_hive'] = int(world['swarm'].inhive.sum())
+        row['flowers_alive'] = int((~world['flower_arrays'].dead).sum())
+        row.update(world['swarm'].state_counts())
+        return row
+    row['bees_in_hive'] = sum(1 for b in world['bees'] if b.get_inhive())
+    row['flowers_alive'] = sum(1 for f in world['flowers'] if f.state == 'ALIVE')
+    for state in BEE_STATES: # One column per bee state, so every row has the same columns
+        row[state] = 0
+    for b in world['bees']:
+        row[b.state] = row.get(b.state, 0) + 1
+    return row
+
+def world_bees(world): # List of Bee objects for plotting, whichever engine is running
+    if 'swarm' in world:
+        world['flower_arrays'].write_back() # Flower objects are only brought up to date when needed
+        return world['swarm'].to_bees(world['flowers'])
+    world['flower_scheduler'].sync() # cooldowns of dead flowers are only counted when needed
+    return world['bees']
+
+def save_metrics(metrics_rows, filename): # Writes the per-timestep metrics to a CSV file
+    if not metrics_rows:
+        return
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(metrics_rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(metrics_rows)
+
+def load_pyplot(headless=False): # Imports matplotlib only when a frame actually has to be drawn
+    """
+    Returns matplotlib.pyplot. In headless mode the non-GUI Agg backend is selected first.
+    """
+    import matplotlib
+    if headless:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def create_figure(plt): # Creates the 2x2 figure used by run_simulation
+    fig, axes_array = plt.subplots(2, 2, figsize=(16, 10)) # Create 2x2 grid of subplots
+    axes_dict = {'hive': axes_array[0,0],'property': axes_array[0,1],'nectar': axes_array[1,0]}
+    axes_array[1,1].axis('off') # Turn off the unused 4th subplot
+    return fig, axes_dict
+
+def draw_frame(world, fig, axes_dict, t, bees=None): # Redraws the hive, property and nectar panels for timestep t
+    sim_params = world['params']
+    axes_dict['hive'].clear()
+    axes_dict['property'].clear()
+    axes_dict['nectar'].clear()
+    # Set suptitle
+    fig.suptitle(f"Bee World - Timestep: {t+1}/{sim_params['simlength']}", fontsize=16, fontweight='bold')
+    all_bees = world_bees(world) if bees is None else bees # bees given when drawing a replay (no engine behind it)
+    bees_in_hive_list = [b for b in all_bees if b.get_inhive()]
+    plot_hive(world['hive_data'], bees_in_hive_list, axes_dict['hive'], world['hive_layout'])
+    bees_on_property_list = [b for b in all_bees if not b.get_inhive()]
+    plot_property(world['property_map'], world['flowers'], bees_on_property_list, world['property_config'], axes_dict['property'])
+    plot_flowerNectar(world['flowers'], axes_dict['nectar'], sim_params.get('flower_nectar_capacity_default', 5))
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+
+def run_simulation(sim_params, property_map_data, flowers_list, property_config, interactive_mode=False,
+                   headless=False, render_every=None, output_dir=None, save_final_png=True, rng=None,
+                   checkpoint_every=None, resume_from=None, record_dir=None, replay_dir=None, keyframe_every=None,
+                   export_path=None, export_every=1, export_scale=8, export_fps=10,
+                   render_thread=False, frame_policy='latest', frame_queue=2, profile=False, profile_json=None,
+                   trace_path=None, trace_every=1, trace_buffer=beetrace.TRACE_BUFFER,
+                   memory_every=None, memory_top=10, memory_json=None): # Main function to run the bee simulation steps
+    """
+    Runs the simulation for sim_params['simlength'] timesteps.
+    interactive_mode:   True if parameters/map came from user input
+    headless:   if True no window is opened; matplotlib is only imported if a frame has to be saved
+    render_every:   draw a frame every N timesteps (0 = only the final frame). Default: 0 if headless, else 1
+    output_dir:   directory for metrics.csv, the final PNG and (headless) saved frames
+    save_final_png:   headless only - if False and render_every is 0, matplotlib is never imported
+    rng:   SimRNG for the run (default: seeded from sim_params['seed'])
+    checkpoint_every:   save the whole state to checkpoint_NNNNNN.npz (in output_dir) every N timesteps
+    resume_from:   checkpoint file to continue from (its world replaces the map, flowers and rng given here;
+                   sim_params['simlength'] still sets where the run ends)
+    record_dir:   directory for a memory-mapped trajectory recording of every timestep (see beerecord.py)
+    replay_dir:   directory for a seekable keyframe + delta replay (see beereplay.py), a keyframe every keyframe_every steps
+    export_path:   fast frame export without matplotlib (see beeraster.py): a directory for PNGs, or a .gif / .mp4 file;
+                   a frame every export_every steps, export_scale pixels per cell, export_fps frames per second of video
+    render_thread:   window only - run the simulation in a worker thread and draw its snapshots in this thread
+    frame_policy:   with render_thread: 'latest' (never wait for the window, skip stale frames) or 'every' (draw every
+                    frame, the simulation waits while frame_queue snapshots are waiting to be drawn)
+    profile:   time the bee states, bee helpers and loop phases (see beeprof.py) and print the report at the end
+    profile_json:   also save the timing report to this JSON file
+    trace_path:   save a Chrome Trace Event timeline (see beetrace.py) of every trace_every-th timestep,
+                  keeping at most trace_buffer spans
+    memory_every:   take a tracemalloc snapshot and measure the main structures every N timesteps (see beemem.py);
+                    memory_top allocation sites per snapshot, report also saved to memory_json
+    Returns the list of per-timestep metric dictionaries.
+    """
+    if render_every is None:
+        render_every = 0 if headless else 1
+    if profile or profile_json:
+        PROF.enable()
+    memory = None
+    if memory_every:
+        memory = beemem.MemoryMonitor(memory_every, memory_top)
+        memory.start()
+    tracer = None
+    if trace_path is not None:
+        tracer = beetrace.Tracer(trace_buffer, trace_every)
+        PROF.start_trace(tracer)
+    simlength = sim_params['simlength']
+    if resume_from is not None:
+        with PROF.phase('setup'):
+            world, start_t, metrics_rows = beecheckpoint.load_checkpoint(resume_from)
+        world['params']['simlength'] = simlength
+        LOG.info('sim', "Resuming from %s at timestep %s (seed %s)", resume_from, start_t + 1, world['rng'].entropy)
+    else:
+        if rng is None:
+            rng = SimRNG(sim_params.get('seed'))
+        LOG.info('sim', "Random seed: %s (pass --seed %s to repeat this run)", rng.entropy, rng.entropy)
+        with PROF.phase('setup'):
+            world = setup_world(sim_params, property_map_data, flowers_list, property_config, rng)
+        start_t, metrics_rows = 0, []
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    out_dir = output_dir if output_dir is not None else '.'
+    final_png = os.path.join(out_dir, 'beeworld_simulation_end.png')
+    recorder = TrajectoryRecorder(record_dir, world) if record_dir is not None else None
+    replay = None
+    if replay_dir is not None:
+        replay = beereplay.ReplayWriter(replay_dir, world, keyframe_every or beereplay.KEYFRAME_EVERY, start_frame=start_t)
+    exporter, rasteriser = None, None
+    if export_path is not None:
+        exporter = beeraster.FrameExporter(export_path, export_fps)
+        rasteriser = beeraster.RasterRenderer(world, export_scale)
+    plt = None
+    fig_interactive, axes_dict_interactive = None, None
+    renderer = None # artists are built on the first drawn frame and only updated afterwards
+    if not headless:
+        plt = load_pyplot()
+        plt.ion() # Turn on interactive mode for Matplotlib
+        fig_interactive, axes_dict_interactive = create_figure(plt)
+    try:
+        pause_duration = float(sim_params.get('interactive_pause', 0.1))
+    except ValueError:
+        pause_duration = 0.1
+
+    def advance(t): # One timestep plus everything saved after it
+        PROF.begin_step(t)
+        with PROF.phase('timestep', {'timestep': t + 1}):
+            with PROF.phase('step'):
+                step_world(world, t)
+            with PROF.phase('metrics'):
+                metrics_rows.append(collect_metrics(world, t))
+            if recorder is not None:
+                with PROF.phase('record'):
+                    recorder.record(world, t)
+            if replay is not None:
+                with PROF.phase('replay'):
+                    replay.write(world)
+            if exporter is not None and (t + 1) % export_every == 0:
+                with PROF.phase('export'):
+                    exporter.write(rasteriser.render(world), t)
+            if checkpoint_every and (t + 1) % checkpoint_every == 0:
+                with PROF.phase('checkpoint'):
+                    beecheckpoint.save_checkpoint(world, t + 1, os.path.join(out_dir, f'checkpoint_{t+1:06d}.npz'), metrics_rows)
+            if memory is not None:
+                with PROF.phase('memory'):
+                    memory.check(world, t, {'metrics_rows': metrics_rows})
+
+    def wants_frame(t): # Whether timestep t is drawn
+        is_last_step = (t == simlength - 1) and (save_final_png or not headless)
+        return is_last_step or (render_every > 0 and (t + 1) % render_every == 0)
+
+    def show_frame(snap): # Draws a snapshot in the window, re-creating the window if it was closed
+        nonlocal fig_interactive, axes_dict_interactive, renderer
         if fig_interactive is None or not plt.fignum_exists(fig_interactive.number):
             print("Plot window was closed or not initialized, re-creating for step-by-step display.")
             plt.ion() 
-            fig_interactive, axes_array_interactive = plt.subplots(2, 2, figsize=(16, 10))
-            axes_dict_interactive = {'hive': axes_array_interactive[0,0], 'property': axes_array_interactive[0,1],'nectar': axes_array_interactive[1,0]}
-            axes_array_interactive[1,1].axis('off')
-        axes_dict_interactive['hive'].clear()
-        axes_dict_interactive['property'].clear()
-        axes_dict_interactive['nectar'].clear()
-        # Set suptitle
-        fig_interactive.suptitle(f"Bee World - Timestep: {t+1}/{sim_params['simlength']}", fontsize=16, fontweight='bold')
-        bees_in_hive_list = [b for b in all_bees if b.get_inhive()]
-        plot_hive(hive_data, bees_in_hive_list, axes_dict_interactive['hive'], hive_layout_config)
-        bees_on_property_list = [b for b in all_bees if not b.get_inhive()]
-        plot_property(property_map_data, flowers_list, bees_on_property_list, property_config, axes_dict_interactive['property'])
-        plot_flowerNectar(flowers_list, axes_dict_interactive['nectar'], sim_params.get('flower_nectar_capacity_default', 5))
-        fig_interactive.tight_layout(rect=[0, 0, 1, 0.96])
-        fig_interactive.canvas.draw()
-        fig_interactive.canvas.flush_events()
-        try:
-            pause_duration = float(sim_params.get('interactive_pause', 0.1))
-        except ValueError:
-            pause_duration = 0.1
-        plt.pause(pause_duration)
+            fig_interactive, axes_dict_interactive = create_figure(plt)
+            renderer = None
+        if renderer is None:
+            plt.show(block=False)
+            renderer = beerender.FrameRenderer(fig_interactive, axes_dict_interactive, world, blit=True)
+        renderer.show(snap)
+        if not renderer.blit: # backend without blitting: full redraw
+            fig_interactive.canvas.draw()
+            fig_interactive.canvas.flush_events()
+
+    try:
+        if render_thread and not headless:
+            # The simulation runs in a worker thread and hands snapshots to this (GUI) thread through a bounded queue
+            frames = beerender.SnapshotQueue(frame_queue, frame_policy)
+            errors = []
+            stop = threading.Event() # set when the GUI thread leaves early (error, Ctrl-C)
+            def produce():
+                try:
+                    for t in range(start_t, simlength):
+                        if stop.is_set():
+                            break
+                        advance(t)
+                        if wants_frame(t):
+                            frames.put(beerender.take_snapshot(world, t))
+                except BaseException as e: # re-raised in the GUI thread
+                    errors.append(e)
+                finally:
+                    frames.close()
+            worker = threading.Thread(target=produce, name='beeworld-sim', daemon=True)
+            worker.start()
+            drawn = 0
+            try:
+                while not frames.finished():
+                    snap = frames.get(timeout=0)
+                    if snap is not None:
+                        PROF.follow_step(snap.t) # render / gui_wait spans are sampled by the drawn timestep
+                        with PROF.phase('render'):
+                            show_frame(snap)
+                        drawn += 1
+                    with PROF.phase('gui_wait'):
+                        fig_interactive.canvas.start_event_loop(pause_duration) # keeps the window responsive, caps the frame rate
+            finally:
+                stop.set()
+                frames.close()
+                worker.join() # the worker must be done with the output files before they are closed
+            if errors:
+                raise errors[0]
+            if frames.dropped:
+                print(f"Drew {drawn} frames, skipped {frames.dropped} stale ones (the simulation ran ahead of the window)")
+        else:
+            for t in range(start_t, simlength): ## Main for loop for the simulation
+                advance(t)
+                if not wants_frame(t):
+                    continue # Skip drawing this timestep
+                if headless:
+                    with PROF.phase('render'):
+                        if plt is None: # First frame that needs drawing
+                            plt = load_pyplot(headless=True)
+                            fig_interactive, axes_dict_interactive = create_figure(plt)
+                            renderer = beerender.FrameRenderer(fig_interactive, axes_dict_interactive, world, blit=False)
+                        renderer.update(world, t)
+                        if render_every > 0 and not (t == simlength - 1 and save_final_png):
+                            fig_interactive.savefig(os.path.join(out_dir, f'frame_{t+1:06d}.png'))
+                    continue
+                with PROF.phase('render'):
+                    show_frame(beerender.take_snapshot(world, t))
+                with PROF.phase('gui_wait'):
+                    fig_interactive.canvas.start_event_loop(pause_duration) # like plt.pause, without a full redraw
+    finally: # also after an error or Ctrl-C, so what was written so far can still be opened
+        if tracer is not None:
+            PROF.stop_trace()
+            tracer.save(trace_path)
+            print(f"Saved trace of {tracer.steps_sampled} timesteps to {trace_path} (open it in chrome://tracing or speedscope)"
+                  + (f", {tracer.dropped} oldest spans dropped" if tracer.dropped else ""))
+        if recorder is not None:
+            recorder.close()
+            print(f"Saved trajectory recording to {record_dir}")
+        if replay is not None:
+            replay.close()
+            print(f"Saved replay to {replay_dir} (render it with beereplay.py)")
+        if exporter is not None:
+            exporter.close()
+            print(f"Exported {exporter.frames} frames to {export_path}")
+        if memory is not None:
+            memory.stop()
+            print(memory.report())
+            if memory_json:
+                memory.save_json(memory_json)
+                print(f"Saved memory report to {memory_json}")
+    if profile or profile_json:
+        PROF.disable()
+        if profile:
+            print(PROF.report())
+        if profile_json:
+            PROF.save_json(profile_json)
+            print(f"Saved timing report to {profile_json}")
+    if renderer is not None:
+        renderer.stop_blitting() # the final savefig / plt.show draw everything normally
+    LOG.info('sim', "Navigation field cache: %s", world['nav'].stats())
+    LOG.flush() # write out any buffered events (e.g. --log-file)
+    if output_dir is not None or headless:
+        save_metrics(metrics_rows, os.path.join(out_dir, 'metrics.csv'))
+        print(f"Saved per-timestep metrics to {os.path.join(out_dir, 'metrics.csv')}")
+    if headless:
+        if fig_interactive is not None and save_final_png:
+            print(f"Saving final state of simulation to {final_png}")
+            fig_interactive.savefig(final_png)
+        if fig_interactive is not None:
+            plt.close(fig_interactive)
+        print("Simulation finished!")
+        return metrics_rows
     if not interactive_mode and fig_interactive and plt.fignum_exists(fig_interactive.number):
-        print("Saving final state of file-input based simulation to beeworld_simulation_end.png")
+        print(f"Saving final state of file-input based simulation to {final_png}")
         try:
             plt.figure(fig_interactive.number) # Ensure the interactive figure is the current figure
-            plt.savefig('beeworld_simulation_end.png')
+            plt.savefig(final_png)
         except Exception as e:
             print(f"Error saving final plot: {e}")
     # Handle the display of the plot window at the end of the simulation
@@ -479,14 +827,58 @@ def run_simulation(sim_params, property_map_data, flowers_list, property_config,
     else:
         print("Simulation finished!")
         if not interactive_mode: 
-             print("(Check for 'beeworld_simulation_end.png' if simulation ran to completion for final result")
+             print(f"(Check for '{final_png}' if simulation ran to completion for final result")
+    return metrics_rows
 
 def main(): # Main function to parse arguments and begin the simulation
     parser = argparse.ArgumentParser(description="Bee World Simulation") # Setup argument parser
     parser.add_argument("-i", "--interactive", action="store_true", help="Run in interactive mode.")
     parser.add_argument("-f", "--mapfile", type=str, default="map1.csv", help="Path to CSV for property map")
     parser.add_argument("-p", "--paramfile", type=str, default="para1.csv", help="Path to CSV for simulation parameters")
+    parser.add_argument("--headless", action="store_true", help="Batch run without a plot window (matplotlib only used to save PNGs).")
+    parser.add_argument("--render-every", type=int, default=None, help="Draw a frame every N timesteps (0 = final frame only). Default: 1, or 0 with --headless")
+    parser.add_argument("--final-only", action="store_true", help="Only draw the final frame (same as --render-every 0).")
+    parser.add_argument("-o", "--outdir", type=str, default=None, help="Directory for metrics.csv and the final PNG")
+    parser.add_argument("--engine", choices=["object", "swarm"], default=None, help="Bee engine: one object per bee, or NumPy columns (overrides 'engine' in the parameter file)")
+    parser.add_argument("--no-png", action="store_true", help="With --headless, skip the final PNG (metrics only).")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for every random choice in the run (overrides 'seed' in the parameter file)")
+    parser.add_argument("--log-level", choices=list(LEVELS), default=None, help="Lowest event level shown. Default: debug (every bee action), or warning with --headless")
+    parser.add_argument("--log-categories", type=str, default=None, help=f"Comma-separated event categories to keep ({', '.join(CATEGORIES)}; '' = none). Default: all")
+    parser.add_argument("--log-file", type=str, default=None, help="Write events as JSON lines to this file (buffered) instead of printing them")
+    parser.add_argument("--checkpoint-every", type=int, default=None, help="Save the full simulation state every N timesteps (checkpoint_NNNNNN.npz in the output directory)")
+    parser.add_argument("--record", type=str, default=None, help="Record every timestep (bee positions/states, flower nectar, hive changes) into this directory")
+    parser.add_argument("--replay", type=str, default=None, help="Write a seekable keyframe + delta replay into this directory (view it with beereplay.py)")
+    parser.add_argument("--keyframe-every", type=int, default=None, help=f"Timesteps between full keyframes in the replay (default {beereplay.KEYFRAME_EVERY})")
+    parser.add_argument("--export", type=str, default=None, help="Fast frame export without matplotlib: a directory (PNG frames) or a .gif / .mp4 file (needs ffmpeg)")
+    parser.add_argument("--export-every", type=int, default=1, help="Export a frame every N timesteps")
+    parser.add_argument("--export-scale", type=int, default=8, help="Pixels per map cell in exported frames")
+    parser.add_argument("--export-fps", type=int, default=10, help="Frames per second of an exported GIF / MP4")
+    parser.add_argument("--render-thread", action="store_true", help="Run the simulation in a worker thread so a slow window does not slow it down")
+    parser.add_argument("--frame-policy", choices=list(beerender.FRAME_POLICIES), default='latest', help="With --render-thread: 'latest' skips frames the window cannot keep up with, 'every' makes the simulation wait for the window")
+    parser.add_argument("--frame-queue", type=int, default=2, help="With --render-thread: snapshots waiting to be drawn at most")
+    parser.add_argument("--profile", action="store_true", help="Print where the run spent its time (per bee state, helper and loop phase)")
+    parser.add_argument("--profile-json", type=str, default=None, help="Save the timing report to this JSON file")
+    parser.add_argument("--trace", type=str, default=None, help="Save a timeline of timesteps, bee updates and rendering (Chrome Trace JSON for chrome://tracing or speedscope)")
+    parser.add_argument("--trace-every", type=int, default=1, help="With --trace: only trace every N-th timestep")
+    parser.add_argument("--trace-buffer", type=int, default=beetrace.TRACE_BUFFER, help="With --trace: spans kept at most (the oldest are dropped)")
+    parser.add_argument("--memory-every", type=int, default=None, help="Take a tracemalloc snapshot and measure bees, flowers, hive and map every N timesteps (slows the run)")
+    parser.add_argument("--memory-top", type=int, default=10, help="With --memory-every: allocation sites listed per snapshot")
+    parser.add_argument("--memory-json", type=str, default=None, help="With --memory-every: also save the memory report to this JSON file")
+    parser.add_argument("--resume", type=str, default=None, help="Continue a run from a checkpoint .npz file (map, flowers and seed come from the checkpoint)")
     args = parser.parse_args() 
+    render_every = args.render_every
+    if args.final_only:
+        render_every = 0
+    elif render_every is None:
+        render_every = 0 if args.headless else 1
+    log_level = args.log_level or ('warning' if args.headless else 'debug')
+    categories = [c.strip() for c in args.log_categories.split(',') if c.strip()] if args.log_categories is not None else None
+    try:
+        LOG.configure(level=log_level, categories=categories)
+    except ValueError as e: # e.g. --log-categories bees
+        parser.error(str(e))
+    if args.log_file:
+        LOG.configure(sinks=[FileSink(args.log_file)])
     sim_params = None 
     world_data = None       
     flowers_data = None     
@@ -496,7 +888,10 @@ def main(): # Main function to parse arguments and begin the simulation
         print(f"Running in INTERACTIVE mode: User inputs for parameters, random environment generation, step-by-step plotting.") ## Interactive - get parameters from user and generate environment randomly
         try:
             sim_params = loadInteractiveParameters() # Call new function for user parameter input
-            world_data, flowers_data, property_conf = generateInteractiveMap(sim_params) # Call new function for random environment
+            if args.seed is not None:
+                sim_params['seed'] = args.seed
+            rng = SimRNG(sim_params.get('seed'))
+            world_data, flowers_data, property_conf = generateInteractiveMap(sim_params, rng.spawn(1)[0]) # Call new function for random environment
         except Exception as e:
             print(f"An error occurred during interactive setup: {e}")
             import traceback
@@ -508,6 +903,9 @@ def main(): # Main function to parse arguments and begin the simulation
         try:
             sim_params = loadParameters(args.paramfile) # Load parameters from file
             world_data, flowers_data, property_conf = loadMap(args.mapfile, sim_params) # Load map from file
+            if args.seed is not None:
+                sim_params['seed'] = args.seed
+            rng = SimRNG(sim_params.get('seed'))
         except FileNotFoundError as e:
             print(f"Error: Required file not found for batch mode. {e}")
             print("Please ensure map and parameter files exist at specified paths or use defaults.")
@@ -517,9 +915,23 @@ def main(): # Main function to parse arguments and begin the simulation
             import traceback
             traceback.print_exc() 
             return
+    if sim_params and args.engine:
+        sim_params['engine'] = args.engine
     if sim_params and world_data is not None and flowers_data is not None and property_conf:
-        run_simulation(sim_params, world_data, flowers_data, property_conf, interactive_mode=args.interactive)
+        try:
+            run_simulation(sim_params, world_data, flowers_data, property_conf, interactive_mode=args.interactive,
+                           headless=args.headless, render_every=render_every, output_dir=args.outdir,
+                           save_final_png=not args.no_png, rng=rng, checkpoint_every=args.checkpoint_every, resume_from=args.resume,
+                           record_dir=args.record, replay_dir=args.replay, keyframe_every=args.keyframe_every,
+                           export_path=args.export, export_every=args.export_every, export_scale=args.export_scale, export_fps=args.export_fps,
+                           render_thread=args.render_thread, frame_policy=args.frame_policy, frame_queue=args.frame_queue,
+                           profile=args.profile, profile_json=args.profile_json,
+                           trace_path=args.trace, trace_every=args.trace_every, trace_buffer=args.trace_buffer,
+                           memory_every=args.memory_every, memory_top=args.memory_top, memory_json=args.memory_json)
+        except RuntimeError as e: # e.g. video export without ffmpeg
+            print(f"Error: {e}")
     else:
         print("Cannot run simulation.")
+    LOG.close()
 if __name__ == "__main__": 
-    main()
\ No newline at end of file
+    main()
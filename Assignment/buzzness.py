@@ -7,11 +7,17 @@
 #     2024-04-07 : Initial Version released
 #
 
-import random
+import heapq
 import argparse # Used for command-line argument parsing
 import csv      # Used for reading CSV files for map and parameters
 import numpy as np
-import matplotlib.pyplot as plt
+from beelog import LOG # print() replaced by the level/category-filtered event log
+from beenav import downhill_steps
+from beerng import default_rng # seedable SimRNG streams instead of the global random module
+
+BEE_STATES = ('IDLE_IN_HIVE', 'MOVING_TO_HIVE_EXIT', 'SEEKING_FLOWER', 'MOVING_TO_FLOWER', 'COLLECTING_NECTAR',
+              'RETURNING_TO_HIVE_ENTRANCE', 'MOVING_TO_COMB_BUILD_SITE', 'BUILDING_COMB',
+              'MOVING_TO_COMB_DEPOSIT_SITE', 'DEPOSITING_NECTAR', 'IDLE_ON_PROPERTY') # Every state a Bee can be in
 
 class Flower(): # 
     """
@@ -30,6 +36,7 @@ class Flower(): #
         regeneration_cooldown: timer for when a 'DEAD' flower can start refilling
         deadDuration: timesteps the flower stays dead after nectar depletion
         is_refilling: State to describe that the flower is in the process of refilling nectar
+        watchers: functions called with the flower whenever it becomes available / unavailable to bees
         """
         self.ID = ID
         self.pos = pos 
@@ -41,6 +48,11 @@ class Flower(): #
         self.regeneration_cooldown = 0
         self.deadDuration = dead_duration # How long the flower remains in the DEAD state
         self.is_refilling = False 
+        self.watchers = [] # e.g. FlowerIndex.update, so indexes never have to rescan every flower
+
+    def notify_watchers(self):
+        for watcher in self.watchers:
+            watcher(self)
 
     def get_pos(self):
         """
@@ -67,7 +79,8 @@ class Flower(): #
             self.state = 'DEAD' # Set flower state to "DEAD"
             self.regeneration_cooldown = self.deadDuration # Start "DEAD" state cooldown"
             self.is_refilling = False # No longer refilling if it is "DEAD:"
-            print(f"Flower {self.ID} ({self.name}) is now DEAD.")
+            LOG.debug('flower', "Flower %s (%s) is now DEAD.", self.ID, self.name)
+            self.notify_watchers()
         elif self.currentNectar > 0: 
             self.is_refilling = False # If nectar is taken but not depleted, it's not in the special "refilling from dead" state
         return taken
@@ -78,25 +91,378 @@ class Flower(): #
         rate:  amount of nectar to regenerate per timestep
         
         """
+        was_available = self.state == 'ALIVE' and self.currentNectar > 0
         if self.state == 'DEAD': 
             if self.regeneration_cooldown > 0:
                 self.regeneration_cooldown -= 1 # Countdown the cooldown timer
             else: 
                 self.state = 'ALIVE' # Flower gets "ALIVE" state once cooldown is finished. 
                 self.is_refilling = True # Enters a state of actively refilling its nectar from 0. 
-                print(f"Flower {self.ID} ({self.name}) is ALIVE and has started refilling  nectar.")
+                LOG.debug('flower', "Flower %s (%s) is ALIVE and has started refilling  nectar.", self.ID, self.name)
         if self.state == 'ALIVE' and self.is_refilling: # Only regenregenerates rates if it just became ALIVE or is explicitly refilling
             if self.currentNectar < self.nectarCapacity:
                 self.currentNectar = min(self.nectarCapacity, self.currentNectar + rate) 
                 if self.currentNectar == self.nectarCapacity:
                     self.is_refilling = False # Stop the special refilling state once full
-                    print(f"Flower {self.ID} ({self.name}) has maximum nectar.")
+                    LOG.debug('flower', "Flower %s (%s) has maximum nectar.", self.ID, self.name)
+        if not was_available and self.is_available_for_bees():
+            self.notify_watchers()
+
     def is_available_for_bees(self):
         """Returns: TRUE if flower is in the state = "ALIVE" and has nectar>0"""
         return self.state == 'ALIVE' and self.currentNectar > 0
 
+class FlowerScheduler():
+    """
+    Regenerates only the flowers that have something to do, with the same result as calling
+    Flower.regenerate_nectar on every flower every timestep.
+    A flower that dies is put on a heap with the step at which its cooldown ends (found out through
+    Flower.watchers, so take_nectar does not need to know about the scheduler); flowers that are refilling
+    are kept in a set and regenerated each step until they are full or a bee interrupts the refill.
+    """
+    def __init__(self, flowers_list, step=0):
+        """
+        flowers_list:   list of Flower objects (dead / refilling flowers are scheduled straight away)
+        step:   number of regenerate() calls already made (when resuming a run)
+        """
+        self.step = step # number of regenerate() calls so far
+        self.wake_heap = [] # (step, order, flower) for dead flowers, soonest first
+        self.wake_step = {} # flower ID -> step of the regenerate() call that revives it
+        self.sleeping = {} # flower ID -> dead flower waiting on the heap
+        self.refilling = {} # flower ID -> flower, for flowers that are ALIVE and refilling
+        self.pushed = 0 # tie-breaker for the heap, so flowers themselves are never compared
+        for f in flowers_list:
+            f.watchers.append(self.update)
+            self.update(f)
+
+    def update(self, flower):
+        """Flower watcher: schedules the wake-up of a flower that just died."""
+        if flower.state == 'DEAD':
+            if flower.ID not in self.wake_step:
+                # Each regenerate() call counts the cooldown down by one and the call after it reaches 0 revives the flower
+                wake = self.step + flower.regeneration_cooldown
+                self.wake_step[flower.ID] = wake
+                self.sleeping[flower.ID] = flower
+                heapq.heappush(self.wake_heap, (wake, self.pushed, flower))
+                self.pushed += 1
+            self.refilling.pop(flower.ID, None)
+        elif flower.is_refilling:
+            self.refilling[flower.ID] = flower
+
+    def regenerate(self, rate=1):
+        """One timestep of regeneration (replaces the loop over every flower)."""
+        for fid, f in list(self.refilling.items()):
+            if f.state == 'ALIVE' and f.is_refilling:
+                f.regenerate_nectar(rate)
+            if f.state != 'ALIVE' or not f.is_refilling: # full, or a bee took nectar and stopped the refill
+                del self.refilling[fid]
+        while self.wake_heap and self.wake_heap[0][0] <= self.step:
+            wake, _, f = heapq.heappop(self.wake_heap)
+            if self.wake_step.get(f.ID) != wake or f.state != 'DEAD':
+                continue # stale entry
+            del self.wake_step[f.ID], self.sleeping[f.ID]
+            f.regeneration_cooldown = 0
+            f.regenerate_nectar(rate) # revives the flower and gives it its first refill, as the per-step loop would
+            if f.state == 'ALIVE' and f.is_refilling:
+                self.refilling[f.ID] = f
+        self.step += 1
+
+    def sync(self):
+        """Writes the current regeneration_cooldown into the sleeping dead flowers (they are not counted down every step)."""
+        for fid, f in self.sleeping.items():
+            f.regeneration_cooldown = self.wake_step[fid] - self.step
+
+class FlowerIndex():
+    """
+    Uniform-grid spatial index of the flowers for "nearest available flower" queries.
+    Flowers stay in their bucket for the whole run; unavailable (dead/empty) flowers are skipped
+    using an availability flag that the flowers keep up to date through Flower.watchers.
+    """
+    def __init__(self, flowers_list, maxX, maxY, bucket_size=None):
+        """
+        flowers_list:   list of Flower objects
+        maxX, maxY:   property dimensions
+        bucket_size:   width/height of a bucket in cells (default: about 2 flowers per bucket)
+        """
+        self.flowers = flowers_list
+        n = len(flowers_list)
+        if bucket_size is None:
+            bucket_size = max(1, int(np.sqrt(2.0 * maxX * maxY / max(1, n))))
+        self.bucket_size = bucket_size
+        self.nbx = max(1, -(-maxX // bucket_size)) # number of buckets along x (ceiling division)
+        self.nby = max(1, -(-maxY // bucket_size))
+        self.index_of = {f.ID: i for i, f in enumerate(flowers_list)}
+        self.x = np.array([f.pos[0] for f in flowers_list], dtype=np.int64).reshape(n)
+        self.y = np.array([f.pos[1] for f in flowers_list], dtype=np.int64).reshape(n)
+        self.available = np.array([f.is_available_for_bees() for f in flowers_list], dtype=bool).reshape(n)
+        bucket = self._bucket_of(self.x, self.y)
+        self.order = np.argsort(bucket, kind='stable') # flower indices grouped by bucket
+        self.bucket_start = np.searchsorted(bucket[self.order], np.arange(self.nbx * self.nby + 1))
+        self.prefetched = {} # bee ID -> flower index found by prefetch() for this timestep
+        for f in flowers_list:
+            f.watchers.append(self.update)
+
+    def _bucket_of(self, x, y):
+        bx = np.clip(x // self.bucket_size, 0, self.nbx - 1)
+        by = np.clip(y // self.bucket_size, 0, self.nby - 1)
+        return bx * self.nby + by
+
+    def update(self, flower):
+        """Flower watcher: records whether the flower can currently be visited."""
+        self.available[self.index_of[flower.ID]] = flower.is_available_for_bees()
+
+    def _window(self, bx, by, r):
+        """Flower indices in the (2r+1) x (2r+1) block of buckets around bucket (bx, by)."""
+        y_lo, y_hi = max(0, by - r), min(self.nby - 1, by + r)
+        parts = []
+        for col in range(max(0, bx - r), min(self.nbx - 1, bx + r) + 1):
+            lo = self.bucket_start[col * self.nby + y_lo]
+            hi = self.bucket_start[col * self.nby + y_hi + 1]
+            parts.append(self.order[lo:hi])
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def nearest_batch(self, xs, ys, rng, avoided=None, available=None):
+        """
+        Nearest available flower for many positions at once, like Bee.seekFlower: flowers for which
+        avoided() is True are only used if no other flower is available. Equal distances are broken randomly.
+        xs, ys:   integer arrays of query positions
+        rng:   SimRNG or numpy.random.Generator of the run, for tie-breaking
+        avoided:   function(query_rows, flower_indices) -> bool matrix, or None
+        available:   availability flags to use instead of the tracked ones (e.g. from FlowerArrays)
+        Returns an array of flower indices (-1 where no flower is available).
+        """
+        if available is None:
+            available = self.available
+        xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+        result = np.full(len(xs), -1, dtype=np.int64)
+        if len(xs) == 0 or not available.any():
+            return result
+        home = self._bucket_of(xs, ys)
+        max_r = max(self.nbx, self.nby)
+        for b in np.unique(home): # queries from the same bucket share one window search
+            rows = np.nonzero(home == b)[0]
+            bx, by = divmod(int(b), self.nby)
+            r = 0
+            while True:
+                cand = self._window(bx, by, r)
+                cand = cand[available[cand]]
+                exhausted = r >= max_r
+                if len(cand):
+                    d2 = (xs[rows, None] - self.x[cand][None, :])**2 + (ys[rows, None] - self.y[cand][None, :])**2
+                    d2 = d2 + rng.random(d2.shape) * 0.5 # whole-number distances: this only breaks ties
+                    bad = avoided(rows, cand) if avoided is not None else np.zeros(d2.shape, dtype=bool)
+                    good = np.where(bad, np.inf, d2)
+                    best_good = good.min(axis=1)
+                    # Anything outside the window is at least (r * bucket_size + 1) cells away along one axis
+                    bound = (r * self.bucket_size + 1) ** 2
+                    if exhausted or (best_good < bound).all():
+                        use_good = np.isfinite(best_good)
+                        pick = np.where(use_good, good.argmin(axis=1), d2.argmin(axis=1)) # fallback: any available flower
+                        result[rows] = cand[pick]
+                        break
+                elif exhausted:
+                    break
+                r += 1
+        return result
+
+    def avoided_from_sets(self, avoid_sets):
+        """avoided() function for nearest_batch built from one set of avoided flower indices per query."""
+        def avoided(rows, cand):
+            bad = np.zeros((len(rows), len(cand)), dtype=bool)
+            for i, row in enumerate(rows):
+                if avoid_sets[row]:
+                    bad[i] = np.isin(cand, list(avoid_sets[row]))
+            return bad
+        return avoided
+
+    def prefetch(self, bees, current_timestep, rng):
+        """
+        Answers seekFlower for all the given bees with one batched query (call before the bees update).
+        During the bee phase of a timestep flowers only ever become unavailable, so a prefetched flower that
+        is still available when the bee gets its turn is still the right answer.
+        """
+        self.prefetched = {}
+        if not bees:
+            return
+        avoid_sets = [{self.index_of[fid] for fid, ts in b.recently_emptied_flowers.items()
+                       if current_timestep - ts <= b.empty_flower_avoiding_duration and fid in self.index_of} for b in bees]
+        found = self.nearest_batch([b.pos[0] for b in bees], [b.pos[1] for b in bees], rng, self.avoided_from_sets(avoid_sets))
+        for b, fidx in zip(bees, found):
+            self.prefetched[b.ID] = fidx
+
+    def nearest_for_bee(self, bee, current_timestep):
+        """seekFlower for one bee: uses the prefetched answer if it is still valid. Returns a Flower or None."""
+        fidx = self.prefetched.pop(bee.ID, None)
+        if fidx is None or (fidx >= 0 and not self.available[fidx]):
+            avoid = {self.index_of[fid] for fid in bee.recently_emptied_flowers if fid in self.index_of}
+            fidx = self.nearest_batch([bee.pos[0]], [bee.pos[1]], bee.rng, self.avoided_from_sets([avoid]))[0]
+        return self.flowers[fidx] if fidx >= 0 else None
+
+class OccupancyGrid():
+    """
+    Number of bees standing on each cell of one environment (the hive or the property).
+    Supports `(x, y) in grid`, so it can be handed to moveBee/moveRandomly as the set of occupied cells.
+    """
+    def __init__(self, maxX, maxY):
+        self.maxX = maxX
+        self.maxY = maxY
+        self.counts = np.zeros((maxX, maxY), dtype=np.int32) # counts rather than flags: bees can share a cell (e.g. at start)
+
+    def __contains__(self, pos):
+        x, y = pos
+        return 0 <= x < self.maxX and 0 <= y < self.maxY and self.counts[x, y] > 0
+
+    def add(self, pos):
+        x, y = pos
+        if 0 <= x < self.maxX and 0 <= y < self.maxY:
+            self.counts[x, y] += 1
+
+    def remove(self, pos):
+        x, y = pos
+        if 0 <= x < self.maxX and 0 <= y < self.maxY and self.counts[x, y] > 0:
+            self.counts[x, y] -= 1
+
+class BeeOccupancy():
+    """
+    Persistent occupancy grids for the hive and the property, updated in O(1) whenever a bee moves.
+    Replaces rebuilding a list of every other bee's position for each bee on every timestep.
+    """
+    def __init__(self, hive_size, property_size):
+        """
+        hive_size:   (max_x, max_y) of the hive
+        property_size:   (max_x, max_y) of the property
+        """
+        self.hive = OccupancyGrid(*hive_size)
+        self.property = OccupancyGrid(*property_size)
+
+    def grid(self, inhive):
+        """Returns the hive grid if inhive is True, otherwise the property grid."""
+        return self.hive if inhive else self.property
+
+    def add_bee(self, bee):
+        self.grid(bee.get_inhive()).add(bee.get_pos())
+
+    def move(self, old_pos, old_inhive, new_pos, new_inhive):
+        """Moves one bee's count from its old cell to its new cell (possibly between hive and property)."""
+        if old_pos == new_pos and old_inhive == new_inhive:
+            return
+        self.grid(old_inhive).remove(old_pos)
+        self.grid(new_inhive).add(new_pos)
+
+    def is_occupied(self, pos, inhive):
+        return pos in self.grid(inhive)
+
+class CellBag():
+    """
+    Set of (x, y) cells with O(1) add, remove and random choice (swap-with-last removal).
+    The live cells are xs[:size], ys[:size].
+    """
+    def __init__(self, slot_shape, capacity):
+        """
+        slot_shape:   shape of the grid the cells come from (holds each cell's slot, -1 when absent)
+        capacity:   maximum number of cells in the bag
+        """
+        self.xs = np.zeros(capacity, dtype=np.int64)
+        self.ys = np.zeros(capacity, dtype=np.int64)
+        self.slot = np.full(slot_shape, -1, dtype=np.int64)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, cell):
+        return self.slot[cell] >= 0
+
+    def add(self, cell):
+        if self.slot[cell] >= 0:
+            return
+        self.xs[self.size], self.ys[self.size] = cell
+        self.slot[cell] = self.size
+        self.size += 1
+
+    def remove(self, cell):
+        i = self.slot[cell]
+        if i < 0:
+            return
+        last = self.size - 1
+        lx, ly = self.xs[last], self.ys[last]
+        self.xs[i], self.ys[i] = lx, ly # move the last cell into the hole
+        self.slot[lx, ly] = i
+        self.slot[cell] = -1
+        self.size = last
+
+    def choice(self, rng):
+        i = rng.randrange(self.size)
+        return (int(self.xs[i]), int(self.ys[i]))
+
+class CombIndex():
+    """
+    Incremental index of the comb stripe: the unbuilt cells, and the built cells grouped by nectar level.
+    Answers buildFrames ("random free build cell") and depositNectar ("random least-filled cell") in O(1)
+    instead of scanning the stripe. Kept in hive_layout_config['comb_index'] and updated by every build/deposit.
+    """
+    def __init__(self, hiveData, hiveLayout):
+        """
+        hiveData:   numpy array of the hive state (read once to fill the index)
+        hiveLayout:   hive layout config (max_x, max_y, comb_stripe_width, max_nectar_per_cell)
+        """
+        combWidth = hiveLayout.get('comb_stripe_width', 3)
+        self.maxX, self.maxY = hiveLayout['max_x'], hiveLayout['max_y']
+        self.startX = max(0, self.maxX // 2 - combWidth // 2)
+        self.endX = min(self.maxX, self.startX + combWidth)
+        self.max_nectar_per_cell = hiveLayout.get('max_nectar_per_cell', 4)
+        n_cells = max(0, self.endX - self.startX) * self.maxY
+        grid = (self.maxX, self.maxY)
+        self.free = CellBag(grid, n_cells)
+        self.levels = [CellBag(grid, n_cells) for _ in range(self.max_nectar_per_cell)] # levels[n] = built cells holding n nectar
+        for x in range(self.startX, self.endX):
+            for y in range(self.maxY):
+                if hiveData[x, y, 0] == 0:
+                    self.free.add((x, y))
+                elif hiveData[x, y, 1] < self.max_nectar_per_cell:
+                    self.levels[max(0, hiveData[x, y, 1])].add((x, y))
+
+    def in_stripe(self, x, y):
+        return self.startX <= x < self.endX and 0 <= y < self.maxY
+
+    def least_level(self):
+        """Lowest nectar level among built cells that still have room, or None."""
+        for level, bag in enumerate(self.levels):
+            if len(bag):
+                return level
+        return None
+
+    def can_build(self):
+        return len(self.free) > 0
+
+    def can_deposit(self):
+        return self.least_level() is not None
+
+    def random_build_cell(self, rng):
+        return self.free.choice(rng) if len(self.free) else None
+
+    def random_deposit_cell(self, rng):
+        level = self.least_level()
+        return self.levels[level].choice(rng) if level is not None else None
+
+    def built(self, x, y):
+        """Record that comb was built at (x, y) (it starts with 0 nectar)."""
+        if self.in_stripe(x, y) and (x, y) in self.free:
+            self.free.remove((x, y))
+            if self.max_nectar_per_cell > 0:
+                self.levels[0].add((x, y))
+
+    def nectar_changed(self, x, y, old_level, new_level):
+        """Record that the built cell (x, y) went from old_level to new_level nectar."""
+        if not self.in_stripe(x, y):
+            return
+        if 0 <= old_level < self.max_nectar_per_cell:
+            self.levels[old_level].remove((x, y))
+        if 0 <= new_level < self.max_nectar_per_cell:
+            self.levels[new_level].add((x, y))
+
 class Bee(): 
-    def __init__(self, ID, initial_pos, hive_entrance_pos, max_nectarCarry=1, empty_flower_avoiding_duration=20, max_clogCount=5):
+    def __init__(self, ID, initial_pos, hive_entrance_pos, max_nectarCarry=1, empty_flower_avoiding_duration=20, max_clogCount=5, rng=None):
         """
         Initialises the Bee class.
         - ID: Identification for bees. 
@@ -106,6 +472,8 @@ class Bee():
         - empty_flower_avoiding_duration: no. of timesteps a bee avoids a flower it just emptied
         - clogCount: no. of timesteps a bee can be stuck before resetting its state/task
         - max_clogCount: no. of timesteps a bee can be stuck before resetting its task
+        - rng: this bee's SimRNG stream (spawned from the run's stream so runs can be repeated); only
+          Bees rebuilt for plotting leave it out and get the fixed-seed beerng.default_rng()
         """
         self.ID = ID
         self.pos = initial_pos 
@@ -122,8 +490,9 @@ class Bee():
         self.empty_flower_avoiding_duration = empty_flower_avoiding_duration # How long to avoid an emptied flower
         self.clogCount = 0 
         self.max_clogCount = max_clogCount # Maximum timesteps of being stuck
+        self.rng = rng if rng is not None else default_rng() # All of this bee's random choices come from here
 
-    def step_change(self, property_map_data, flowers_list, hive_data, hive_layout_config, property_config, current_timestep, other_bees_details_list): # Main update logic for the bee each timestep
+    def step_change(self, property_map_data, flowers_list, hive_data, hive_layout_config, property_config, current_timestep, occupancy, flower_index=None, nav=None): # Main update logic for the bee each timestep
         """
         Update Bee per new timestep taking into account both object's state and setting (property vs. hive)
         property_map_data:   numpy array of the main property terrain
@@ -132,7 +501,9 @@ class Bee():
         hive_layout_config:   dictionary with hive dimensions and fixed points
         property_config:   dictionary with property dimensions and hive location
         current_timestep:   the current simulation time
-        other_bees_details_list:   list of dicts with info about other bees for collision avoidance
+        occupancy:   BeeOccupancy grids of where every bee is, for collision avoidance (updated here when this bee moves)
+        flower_index:   optional FlowerIndex used by seekFlower instead of scanning every flower
+        nav:   optional beenav.NavFields - bees flying to a flower or back to the hive follow distance fields around obstacles
 
         **BEE STATES**
         - IDLE_IN_HIVE
@@ -148,11 +519,8 @@ class Bee():
         """
         self.age += 1 #Bee's timestep age
         moved_during_current_timestep = False 
-        occupiedPos = set() # for avoiding 2 bees occupying the same pos. 
-        if self.inhive: # if bee is in the hive
-            occupiedPos = {info['pos'] for info in other_bees_details_list if info['inhive']}
-        else: # If bee is on the property
-            occupiedPos = {info['pos'] for info in other_bees_details_list if not info['inhive']}
+        start_pos, start_inhive = self.pos, self.inhive # to update the occupancy grids once at the end of the step
+        occupiedPos = occupancy.grid(self.inhive) # for avoiding 2 bees occupying the same pos. 
         ## (1) BEE STATES
         if self.state == 'IDLE_IN_HIVE': # IDLE_IN_HIVE = bee is in the hive, no task. 
             self.clogCount = 0
@@ -162,29 +530,25 @@ class Bee():
                 if comb_build_target_pos: # if build pos is decided:
                     self.current_move_pos = comb_build_target_pos
                     self.state = 'MOVING_TO_COMB_BUILD_SITE' # MOVING_TO_COMB_BUILD_SITE = bee is moving to the determined pos to build comb
-                    print(f"Bee {self.ID} (in hive) is assigned to build comb at {self.current_move_pos}.")
+                    LOG.debug('bee', "Bee %s (in hive) is assigned to build comb at %s.", self.ID, self.current_move_pos)
                 else: 
                     comb_deposit_target = self.depositNectar(hive_data, hive_layout_config)
                     if comb_deposit_target: # If a nectar deposit site is found
                         self.current_move_pos = comb_deposit_target
                         self.state = 'MOVING_TO_COMB_DEPOSIT_SITE' # MOVING_TO_COMB_DEPOSIT_SITE = bee is moving to the determined pos to build comb. 
-                        print(f"Bee {self.ID} (in hive) is assigned to deposit nectar at {self.current_move_pos}.")
+                        LOG.debug('bee', "Bee %s (in hive) is assigned to deposit nectar at %s.", self.ID, self.current_move_pos)
                     elif self.nectarCarried < self.max_nectarCarry: # Has nectar, but everything too else too busy to build at current timestep. Therefore, collect more nectar from property. 
                         self.current_move_pos = hive_layout_config['hive_exit_cell_inside'] # Target internal hive exit
                         self.state = 'MOVING_TO_HIVE_EXIT' # MOVING_TO_HIVE_EXIT = bee is moving to twoards hive entrance to go collect more nectar
             elif self.nectarCarried < self.max_nectarCarry: 
                 self.current_move_pos = hive_layout_config['hive_exit_cell_inside'] 
                 self.state = 'MOVING_TO_HIVE_EXIT' 
-                print(f"Bee {self.ID} (in hive) needs more nectar, heading to property.")
+                LOG.debug('bee', "Bee %s (in hive) needs more nectar, heading to property.", self.ID)
         # Prventing clogging at the hive entrance
         elif self.state == 'MOVING_TO_HIVE_EXIT': # Bee is moving towards the exit pos of the hive
             if self.pos == self.current_move_pos: # if bee already at the hive exit pos
                 hive_exit_pos = self.hive_entrance_pos # = property entrace from the hive
-                property_entrace_into_hive = False # Check if another bee is blocking the property spohive entry pos.
-                for other_bee_info in other_bees_details_list:
-                    if not other_bee_info['inhive'] and other_bee_info['pos'] == hive_exit_pos:
-                        property_entrace_into_hive = True
-                        break
+                property_entrace_into_hive = occupancy.is_occupied(hive_exit_pos, False) # Check if another bee is blocking the property hive entry pos.
                 if property_entrace_into_hive: 
                     moved_during_current_timestep = self.moveRandomly(None, hive_layout_config['max_x'], hive_layout_config['max_y'], occupiedPos) # Jiggle inside near exit
                 else: 
@@ -193,20 +557,20 @@ class Bee():
                     self.state = 'SEEKING_FLOWER' # Change state to look for flowers
                     self.current_move_pos = None # Clear previous target
                     moved_during_current_timestep = True
-                    print(f"Bee {self.ID} has exited the hive at {self.pos}, destination: flower.")
+                    LOG.debug('bee', "Bee %s has exited the hive at %s, destination: flower.", self.ID, self.pos)
             else: # Not yet at internal exit cell, continue moving
                 moved_during_current_timestep = self.moveBee(None, hive_layout_config['max_x'], hive_layout_config['max_y'], occupiedPos, is_in_hive=True)
         elif self.state == 'SEEKING_FLOWER': 
             moved_during_current_timestep = True # Decision process is an "action"
-            self.current_move_object = self.seekFlower(flowers_list, current_timestep) # Find a suitable flower
+            self.current_move_object = self.seekFlower(flowers_list, current_timestep, flower_index) # Find a suitable flower
             if self.current_move_object: # If a flower is found
                 self.current_move_pos = self.current_move_object.get_pos()
                 self.state = 'MOVING_TO_FLOWER'
-                print(f"Bee {self.ID} (on property) decided on a flower {self.current_move_object.ID} at {self.current_move_pos}.")
+                LOG.debug('bee', "Bee %s (on property) decided on a flower %s at %s.", self.ID, self.current_move_object.ID, self.current_move_pos)
             else: 
                 self.state = 'IDLE_ON_PROPERTY' # Bee becomes idle on the property it didn't find a flower. 
                 self.current_move_pos = None
-                print(f"Bee {self.ID} (on property), now idle.")
+                LOG.debug('bee', "Bee %s (on property), now idle.", self.ID)
         elif self.state == 'MOVING_TO_FLOWER': # Bee is moving towards a targeted flower
             if self.current_move_object is None or not self.current_move_object.is_available_for_bees(): # If target flower becomes unavailable
                 if self.current_move_object: # If it had a target that's now gone/empty
@@ -218,9 +582,10 @@ class Bee():
             elif self.pos == self.current_move_pos: # If bee arrived at the flower
                 self.state = 'COLLECTING_NECTAR'
                 moved_during_current_timestep = True
-                print(f"Bee {self.ID} arrived at flower {self.current_move_object.ID}.")
+                LOG.debug('bee', "Bee %s arrived at flower %s.", self.ID, self.current_move_object.ID)
             else: 
-                moved_during_current_timestep = self.moveBee(property_map_data, property_config['max_x'], property_config['max_y'], occupiedPos, is_in_hive=False)
+                nav_field = nav.field(self.current_move_pos) if nav is not None else None # one field per flower, shared by every bee going there
+                moved_during_current_timestep = self.moveBee(property_map_data, property_config['max_x'], property_config['max_y'], occupiedPos, is_in_hive=False, nav_field=nav_field)
         elif self.state == 'COLLECTING_NECTAR':
             moved_during_current_timestep = True # Collecting costs a timestep
             if self.current_move_object and self.current_move_object.is_available_for_bees() and self.nectarCarried < self.max_nectarCarry:
@@ -233,15 +598,11 @@ class Bee():
                 self.current_move_pos = self.hive_entrance_pos # Set target to hive entrance
                 self.state = 'RETURNING_TO_HIVE_ENTRANCE'
                 self.current_move_object = None # No longer targeting the flower
-                print(f"Bee {self.ID} finished collecting, returning to hive. Carried: {self.nectarCarried}.")
+                LOG.debug('bee', "Bee %s finished collecting, returning to hive. Carried: %s.", self.ID, self.nectarCarried)
         elif self.state == 'RETURNING_TO_HIVE_ENTRANCE': # Bee is returning to the hive entrance on property
             if self.pos == self.current_move_pos: # If bee arrived at the external hive entrance
                 internal_entry_pos = hive_layout_config['hive_entry_cell_inside'] # Target the fixed internal entry point
-                hive_entry_occupied = False # Check if another bee is blocking the internal entry spot
-                for other_bee_info in other_bees_details_list: 
-                    if other_bee_info['inhive'] and other_bee_info['pos'] == internal_entry_pos:
-                        hive_entry_occupied = True
-                        break
+                hive_entry_occupied = occupancy.is_occupied(internal_entry_pos, True) # Check if another bee is blocking the internal entry spot
                 if hive_entry_occupied: # If internal entry is blocked
                     moved_during_current_timestep = self.moveRandomly(property_map_data, property_config['max_x'], property_config['max_y'], occupiedPos) # Jiggle outside entrance
                 else: # Internal entry is clear
@@ -250,9 +611,10 @@ class Bee():
                     self.state = 'IDLE_IN_HIVE' # Bee becomes idle inside the hive
                     self.current_move_pos = None
                     moved_during_current_timestep = True
-                    print(f"Bee {self.ID} entered hive at {self.pos}.")
+                    LOG.debug('bee', "Bee %s entered hive at %s.", self.ID, self.pos)
             else: # Not yet at hive entrance, continue moving
-                moved_during_current_timestep = self.moveBee(property_map_data, property_config['max_x'], property_config['max_y'], occupiedPos, is_in_hive=False)
+                nav_field = nav.field(self.current_move_pos) if nav is not None else None # computed once per map, shared by all bees
+                moved_during_current_timestep = self.moveBee(property_map_data, property_config['max_x'], property_config['max_y'], occupiedPos, is_in_hive=False, nav_field=nav_field)
         elif self.state == 'MOVING_TO_COMB_BUILD_SITE': # Bee is in hive, moving to a site to build comb
             if self.pos == self.current_move_pos: # If arrived at build site
                 self.state = 'BUILDING_COMB'
@@ -266,8 +628,10 @@ class Bee():
             if self.nectarCarried >= 1 and 0 <= x < hive_layout_config['max_x'] and 0 <= y < hive_layout_config['max_y'] and hive_data[x, y, 0] == 0: # 0=empty, 1=built comb
                 hive_data[x, y, 0] = 1 # 1 = comb built
                 hive_data[x, y, 1] = 0 
+                if 'comb_index' in hive_layout_config:
+                    hive_layout_config['comb_index'].built(x, y)
                 self.nectarCarried -= 1 # Cost 1 nectar to build comb
-                print(f"Bee {self.ID} built comb at {self.pos}. Nectar left: {self.nectarCarried}")
+                LOG.debug('bee', "Bee %s built comb at %s. Nectar left: %s", self.ID, self.pos, self.nectarCarried)
             self.state = 'IDLE_IN_HIVE' # Return to idle to decide next action
             self.current_move_pos = None
         elif self.state == 'MOVING_TO_COMB_DEPOSIT_SITE': # Bee is in hive, moving to a comb cell to deposit nectar
@@ -285,8 +649,10 @@ class Bee():
                 deposited_amount = min(self.nectarCarried, can_deposit) # Deposit what it can
                 if deposited_amount > 0:
                     hive_data[x,y,1] += deposited_amount
+                    if 'comb_index' in hive_layout_config:
+                        hive_layout_config['comb_index'].nectar_changed(x, y, hive_data[x,y,1] - deposited_amount, hive_data[x,y,1])
                     self.nectarCarried -= deposited_amount
-                    print(f"Bee {self.ID} deposited {deposited_amount} nectar at {self.pos}. Cell now has {hive_data[x,y,1]}. Nectar left: {self.nectarCarried}")
+                    LOG.debug('bee', "Bee %s deposited %s nectar at %s. Cell now has %s. Nectar left: %s", self.ID, deposited_amount, self.pos, hive_data[x,y,1], self.nectarCarried)
             self.state = 'IDLE_IN_HIVE' 
             self.current_move_pos = None
         elif self.state == 'IDLE_ON_PROPERTY': 
@@ -294,16 +660,17 @@ class Bee():
             if self.age % 10 == 0 : # if idel on property for too long, decide to return to hive (as natrual bees do)
                 self.current_move_pos = self.hive_entrance_pos
                 self.state = 'RETURNING_TO_HIVE_ENTRANCE'
-                print(f"Bee {self.ID} is idle on property, now returning to hive.")
+                LOG.debug('bee', "Bee %s is idle on property, now returning to hive.", self.ID)
             else: # else move randomly
                 moved_during_current_timestep = self.moveRandomly(property_map_data, property_config['max_x'], property_config['max_y'], occupiedPos)
+        occupancy.move(start_pos, start_inhive, self.pos, self.inhive)
         if moved_during_current_timestep:
             self.clogCount = 0 # if bee has done somtheing during current timestep, their inactivity counter returns to 0
         else: # Bee did not move or act
             self.clogCount += 1 # Increment stuck counter
-            print(f"Bee {self.ID} did not move or decide. Stuck: {self.clogCount}. State: {self.state}, pos: {self.pos}, Target: {self.current_move_pos}")
+            LOG.debug('bee', "Bee %s did not move or decide. Stuck: %s. State: %s, pos: %s, Target: %s", self.ID, self.clogCount, self.state, self.pos, self.current_move_pos)
         if self.clogCount > self.max_clogCount: # If bee is stuck for too long
-            print(f"Bee {self.ID} STUCK in state {self.state} at {self.pos} for {self.clogCount} (>{self.max_clogCount}) steps. Target: {self.current_move_pos}. Resetting task.")
+            LOG.info('bee', "Bee %s STUCK in state %s at %s for %s (>%s) steps. Target: %s. Resetting task.", self.ID, self.state, self.pos, self.clogCount, self.max_clogCount, self.current_move_pos)
             if self.current_move_object and isinstance(self.current_move_object, Flower):
                    self.recently_emptied_flowers[self.current_move_object.ID] = current_timestep 
             if self.inhive:# Reset state based on bee's current environment
@@ -314,13 +681,14 @@ class Bee():
             self.current_move_object = None
             self.clogCount = 0 # Reset stuck counter
 
-    def moveBee(self, mapData, maxX, maxY, occupied_cells, is_in_hive=False): # Private method for targeted movement
+    def moveBee(self, mapData, maxX, maxY, occupied_cells, is_in_hive=False, nav_field=None): # Private method for targeted movement
         """
         Moves the bee one step towards its current_move_pos, with collision avoidance.
         mapData:   terrain data (None if in hive)
         maxX, maxY:   boundaries of the current environment
-        occupied_cells:   set of (x,y) tuples of cells occupied by other bees
+        occupied_cells:   cells occupied by other bees (OccupancyGrid or a set of (x,y) tuples)
         is_in_hive:   boolean, True if bee is moving within the hive
+        nav_field:   optional distance field to current_move_pos (beenav) - preferred steps go downhill around obstacles
         Returns True if moved, False otherwise.
         """
         if self.current_move_pos is None or self.pos == self.current_move_pos: # If no target or already at target
@@ -348,6 +716,10 @@ class Bee():
             if step_tuple not in seen_steps_set:
                 unique_preferred_steps.append(step_tuple)
                 seen_steps_set.add(step_tuple)
+        if nav_field is not None and not is_in_hive:
+            downhill = downhill_steps(nav_field, self.pos, self.current_move_pos)
+            if downhill is not None: # None = target not reachable from here, keep the greedy steps
+                unique_preferred_steps = downhill
         ## Preferred first move
         for newX_float, newY_float in unique_preferred_steps:
             newX, newY = int(newX_float), int(newY_float) # Convert to int for grid indexing
@@ -356,12 +728,12 @@ class Bee():
             # Check terrain obstacles (only if outside hive and mapData is provided)
             if not is_in_hive and mapData is not None and mapData[newX, newY] != 0: continue # 0 is passable terrain
             if (newX, newY) in occupied_cells: continue # Check for collision with other bees
-            print(f"Bee {self.ID} moving from {self.pos} to {(newX, newY)} towards {self.current_move_pos}")
+            LOG.debug('bee', "Bee %s moving from %s to %s towards %s", self.ID, self.pos, (newX, newY), self.current_move_pos)
             self.pos = (newX, newY) # Valid move found
             return True 
         ## Jiggle method - whenever first preeferred move is not valid during next timestep, try to jiggle to a neighbouring cell. 
         jiggleMoves = [(0,1), (1,0), (0,-1), (-1,0), (1,1), (1,-1), (-1,1), (-1,-1)] # Moore nighbouring cells
-        random.shuffle(jiggleMoves) 
+        self.rng.shuffle(jiggleMoves) 
         for move_dx, move_dy in jiggleMoves:
             jiggle_x, jiggle_y = self.pos[0] + move_dx, self.pos[1] + move_dy    
             if (jiggle_x, jiggle_y) == originalPos : # Don't jiggle to the same spot
@@ -379,7 +751,7 @@ class Bee():
         Moves the bee one step randomly to an adjacent valid cell (von Neumann neighborhood). Used when bee is stuck or needs to make a idle move.
         """
         valid_random_moves = [(0,1), (1,0), (0,-1), (-1,0)] 
-        random.shuffle(valid_random_moves) # Try in random order
+        self.rng.shuffle(valid_random_moves) # Try in random order
         for move_dx, move_dy in valid_random_moves:
             newX = self.pos[0] + move_dx
             newY = self.pos[1] + move_dy
@@ -387,22 +759,25 @@ class Bee():
                 is_passable_terrain = mapData is None or mapData[newX, newY] == 0
                 is_occupied_by_other = (newX, newY) in occupied_cells # Check collision
                 if is_passable_terrain and not is_occupied_by_other:
-                    print(f"Bee {self.ID} making a random move from {self.pos} to {(newX, newY)}")
+                    LOG.debug('bee', "Bee %s making a random move from %s to %s", self.ID, self.pos, (newX, newY))
                     self.pos = (newX, newY)
                     return True 
         return False 
     
-    def seekFlower(self, flowerList, currentTimeStep): # Private method to find a suitable flower
+    def seekFlower(self, flowerList, currentTimeStep, flower_index=None): # Private method to find a suitable flower
         """
         Finds the closest available flower that the bee hasn't recently emptied. To introduce variety to bee's movements. 
         flowers_list:   list of all Flower objects
         currentTimeStep:   current simulation time, for checking recently_emptied_flowers
+        flower_index:   optional FlowerIndex - answers the same question without scanning every flower
         Returns a Flower object or None if no suitable flower is found.
         """
         toRemove = [fid for fid, ts in self.recently_emptied_flowers.items() if currentTimeStep - ts > self.empty_flower_avoiding_duration]  # Clear flowers from recently_emptied_flowers list if their empty_flower_avoiding_duration has passed
         for fid in toRemove:
             if fid in self.recently_emptied_flowers: 
                 del self.recently_emptied_flowers[fid]
+        if flower_index is not None:
+            return flower_index.nearest_for_bee(self, currentTimeStep)
         potentialFlowers = [] # List of flowers that are available and not have been recently depleted
         for flower in flowerList:
             if flower.is_available_for_bees() and flower.ID not in self.recently_emptied_flowers:
@@ -414,7 +789,7 @@ class Bee():
             potentialFlowers = fallbackFlowers # Use fallback list
         closest_flower = None
         min_dist_sq = float('inf') # Using squared distance to avoid sqrt calculation
-        random.shuffle(potentialFlowers) # Shuffle to vary choice among equally distant flowers over time
+        self.rng.shuffle(potentialFlowers) # Shuffle to vary choice among equally distant flowers over time
         for flower in potentialFlowers:
             dist_sq = (self.pos[0] - flower.get_pos()[0])**2 + \
                       (self.pos[1] - flower.get_pos()[1])**2
@@ -428,6 +803,8 @@ class Bee():
         Finds a random empty cell within the designated comb-building stripe to initialise a comb. 
         hiveData:   numpy array of the hive state
         """
+        if 'comb_index' in hiveLayout: # O(1) answer from the incremental stripe index
+            return hiveLayout['comb_index'].random_build_cell(self.rng)
         combWidth = hiveLayout.get('comb_stripe_width', 3) # width of the stripe of comb
         stripe_centerX = hiveLayout['max_x'] // 2
         startX = max(0, stripe_centerX - combWidth // 2) # start x of stripe
@@ -439,7 +816,7 @@ class Bee():
                     if hiveData[x, y, 0] == 0: # Layer 0 is comb status, 0 means no comb built yet
                         possible_build_cells.append((x, y))
         if possible_build_cells:
-            return random.choice(possible_build_cells) # Return a random valid build cell
+            return self.rng.choice(possible_build_cells) # Return a random valid build cell
         return None 
 
     def depositNectar(self, hiveData, hiveLayout): 
@@ -448,6 +825,8 @@ class Bee():
         Prefers cells with the least amount of nectar.
         hiveData:   numpy array of the hive state
         """
+        if 'comb_index' in hiveLayout:
+            return hiveLayout['comb_index'].random_deposit_cell(self.rng)
         combWidth = hiveLayout.get('comb_stripe_width', 3)
         stripe_center_x = hiveLayout['max_x'] // 2
         startX = max(0, stripe_center_x - combWidth // 2)
@@ -467,11 +846,14 @@ class Bee():
             min_nectar_level = possibleCells[0][1] # Get the lowest nectar level among available cells
             least_filled_cells_pos = [cell[0] for cell in possibleCells if cell[1] == min_nectar_level] # Filter for all cells that have this minimum nectar level
             if least_filled_cells_pos:
-                return random.choice(least_filled_cells_pos) # Choose randomly among the least filled combs
+                return self.rng.choice(least_filled_cells_pos) # Choose randomly among the least filled combs
         return None
 
     def build(self, hive_data, hive_layout_config): 
         """Checks if there's any available units in the stripe to build comb or deposit nectar."""
+        if 'comb_index' in hive_layout_config: # No random picks needed just to check
+            comb_index = hive_layout_config['comb_index']
+            return comb_index.can_build() or comb_index.can_deposit()
         if self.buildFrames(hive_data, hive_layout_config) is not None:
             return True
         if self.depositNectar(hive_data, hive_layout_config) is not None:
@@ -0,0 +1,73 @@
+#
+# test_beeswarm.py - the swarm engine must behave like the object model under the same scenario
+#
+# With a single bee there is nothing to resolve between bees, so a seeded run must follow exactly the same
+# trajectory in both engines. With many bees the engines draw their random numbers differently, so the same
+# seeds are run through both engines and the averages over the runs are compared: comb cells built, nectar
+# in the hive at the end and the share of time the bees spend in each state.
+# (BeeSwarm._resolve_moves lists where the swarm's order of events differs from the object model.)
+#
+# Usage:  python -m pytest test_beeswarm.py
+#
+
+import copy
+import numpy as np
+
+import beeworld
+from beesim import Simulation
+from buzzness import BEE_STATES
+from beelog import LOG
+from beeensemble import load_scenario, run_replica
+
+SEEDS = range(10)
+STATE_TOLERANCE = 0.015 # max difference in the mean share of bees in a state
+STATE_COLUMNS = slice(len(beeworld.METRIC_COLUMNS) - len(BEE_STATES), None)
+
+def _runs(engine):
+    old_level = LOG.level
+    LOG.configure(level='off')
+    try:
+        scenario = load_scenario('map1.csv', 'para1.csv', {'engine': engine})
+        return np.array([run_replica(scenario, seed) for seed in SEEDS]), scenario[0]['num_bees']
+    finally:
+        LOG.configure(level=old_level)
+
+def _column(name):
+    return beeworld.METRIC_COLUMNS.index(name)
+
+def test_swarm_matches_object_model_on_average():
+    objects, num_bees = _runs('object')
+    swarm, _ = _runs('swarm')
+    comb = _column('comb_cells')
+    assert objects[:, -1, comb].mean() == swarm[:, -1, comb].mean()
+    nectar = _column('total_hive_nectar')
+    a, b = objects[:, -1, nectar], swarm[:, -1, nectar]
+    stderr = np.sqrt(a.var(ddof=1) / len(a) + b.var(ddof=1) / len(b))
+    assert abs(a.mean() - b.mean()) <= 2 * stderr, (a.mean(), b.mean(), stderr)
+    share_objects = objects[:, :, STATE_COLUMNS].mean(axis=(0, 1)) / num_bees
+    share_swarm = swarm[:, :, STATE_COLUMNS].mean(axis=(0, 1)) / num_bees
+    for state, x, y in zip(BEE_STATES, share_objects, share_swarm):
+        assert abs(x - y) <= STATE_TOLERANCE, (state, x, y)
+
+def _trajectory(engine, seed):
+    old_level = LOG.level
+    LOG.configure(level='off')
+    try:
+        sim_params, property_map, flowers, property_config = load_scenario('map1.csv', 'para1.csv', {
+            'engine': engine, 'num_bees': 1, 'simlength': 400, 'hive_height': 1, 'comb_stripe_width': 1,
+            'max_nectar_per_cell': 1000})
+        flowers = [f for f in flowers if f.ID in ('F5', 'F6')] # two flowers that never run dry
+        for f in flowers:
+            f.nectarCapacity = f.currentNectar = 10**6
+        sim = Simulation(sim_params, property_map, copy.deepcopy(flowers), property_config, seed=seed)
+        return [(snap.bee_x[0], snap.bee_y[0], snap.bee_inhive[0], snap.bee_state[0], snap.bee_nectar[0],
+                 snap.hive[:, :, 1].sum()) for snap in sim.iterate()]
+    finally:
+        LOG.configure(level=old_level)
+
+def test_single_bee_follows_the_same_trajectory():
+    for seed in (3, 11):
+        objects, swarm = _trajectory('object', seed), _trajectory('swarm', seed)
+        assert len(objects) == len(swarm) == 400
+        for t, (a, b) in enumerate(zip(objects, swarm)):
+            assert a == b, (seed, t, a, b)
@@ -0,0 +1,54 @@
+#
+# test_buzzness.py - the flower regeneration schedulers must match the plain per-flower loop
+#
+# FlowerScheduler (object engine) and FlowerArrays (swarm engine) only touch the flowers that have work to do.
+# Both are run side by side with the old loop calling Flower.regenerate_nectar on every flower every timestep,
+# with bees taking nectar at random, and every flower's nectar, state, cooldown and refilling flag must agree
+# after every timestep.
+#
+# Usage:  python -m pytest test_buzzness.py
+#
+
+import copy
+import numpy as np
+import pytest
+
+from beeswarm import FlowerArrays
+from buzzness import Flower, FlowerScheduler
+
+STEPS = 400
+
+def _flowers(gen):
+    return [Flower(f"F{i}", (i, 0), 'Rose', 'Red', nectarCapacity=int(gen.integers(1, 6)), dead_duration=int(gen.integers(0, 6)))
+            for i in range(30)]
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_schedulers_match_the_per_flower_loop(seed):
+    gen = np.random.default_rng(seed)
+    plain = _flowers(gen)
+    scheduled = copy.deepcopy(plain)
+    scheduler = FlowerScheduler(scheduled)
+    arrays = FlowerArrays(copy.deepcopy(plain))
+    for t in range(STEPS):
+        # Bees only take from flowers that are available to them, as Bee.step_change and BeeSwarm._collect do
+        for i in gen.permutation(len(plain))[:int(gen.integers(0, 8))]:
+            if not plain[i].is_available_for_bees():
+                continue
+            amount = int(gen.integers(1, 3))
+            plain[i].take_nectar(amount)
+            scheduled[i].take_nectar(amount)
+            arrays.nectar[i] -= min(amount, arrays.nectar[i])
+            arrays.refilling[i] = False
+            if arrays.nectar[i] <= 0:
+                arrays.kill(np.array([i]))
+        for f in plain:
+            f.regenerate_nectar()
+        scheduler.regenerate()
+        arrays.regenerate()
+        scheduler.sync()
+        arrays.sync()
+        expected = [(f.currentNectar, f.state, f.regeneration_cooldown, f.is_refilling) for f in plain]
+        assert [(f.currentNectar, f.state, f.regeneration_cooldown, f.is_refilling) for f in scheduled] == expected, t
+        got = [(int(n), 'DEAD' if d else 'ALIVE', int(c), bool(r))
+               for n, d, c, r in zip(arrays.nectar, arrays.dead, arrays.cooldown, arrays.refilling)]
+        assert got == expected, t